@@ -1,47 +1,269 @@
 # python-can backend interface class for QuickCAN
 import can
 import threading
-import queue
+from can.broadcastmanager import LimitedDurationCyclicSendTaskABC, ModifiableCyclicTaskABC, RestartableCyclicTaskABC
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from quickcan.batch import FrameBatch
 from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, FLAG_BRS, FLAG_ESI, FLAG_FD, PROTOCOL_VERSION_FD
+from quickcan.server import QuickCANClient
+from quickcan.transport.ring_buffer import BLOCK, DROP_NEWEST, DROP_OLDEST
+
+_new = object.__new__
+_Message = can.Message
+
+
+def _to_message(frame: CANFrame, channel) -> can.Message:
+    """can.Message for a received frame, setting its slots directly instead of going through __init__"""
+    msg = _new(_Message)
+    msg.timestamp = frame.timestamp
+    msg.arbitration_id = frame.can_id
+    msg.is_extended_id = frame.extended
+    msg.is_remote_frame = False
+    msg.is_error_frame = False
+    msg.channel = channel
+    flags = frame.flags
+    msg.is_fd = bool(flags & FLAG_FD)
+    msg.is_rx = True
+    msg.bitrate_switch = bool(flags & FLAG_BRS)
+    msg.error_state_indicator = bool(flags & FLAG_ESI)
+    msg.data = bytearray(frame.data)
+    msg.dlc = len(frame.data)
+    return msg
+
+
+def _to_frame(msg: can.Message) -> CANFrame:
+    flags = (FLAG_FD if msg.is_fd else 0) | (FLAG_BRS if msg.bitrate_switch else 0)
+    return CANFrame(msg.arbitration_id, bytes(msg.data), msg.is_extended_id, flags)
+
+
+class _CyclicTask(LimitedDurationCyclicSendTaskABC, ModifiableCyclicTaskABC, RestartableCyclicTaskABC):
+    """python-can periodic task run by the adapter's PeriodicScheduler, not a thread of its own"""
+
+    def __init__(self, interface: QuickCAN, messages, period: float, duration: Optional[float],
+                 autostart: bool, modifier_callback: Optional[Callable[[can.Message], None]]):
+        super().__init__(messages, period, duration)
+        self._modifier_callback = modifier_callback
+        self._index = 0
+        self._task = interface.send_periodic([_to_frame(msg) for msg in self.messages], period, duration,
+                                             modifier=self._modify if modifier_callback else None,
+                                             start=autostart)
+
+    def _modify(self, frame: CANFrame) -> CANFrame:
+        # The modifier edits the messages in place, as with python-can's own tasks
+        msg = self.messages[self._index]
+        self._index = (self._index + 1) % len(self.messages)
+        self._modifier_callback(msg)
+        return _to_frame(msg)
+
+    def start(self):
+        self._task.start()
+
+    def stop(self):
+        self._task.stop()
+
+    def modify_data(self, messages):
+        super().modify_data(messages)
+        self._task.modify([_to_frame(msg) for msg in self.messages])
+
+
+class _FrameQueue:
+    """
+    Bounded deque guarded by a condition variable, filled a batch at a time
+    by QuickCAN's dispatcher thread and drained by any number of readers.
+    """
+
+    def __init__(self, capacity: int, overflow: str):
+        self.capacity = capacity
+        self.overflow = overflow
+        self.dropped = 0
+        self.closed = False
+        # With "drop-oldest" the deque's maxlen discards the oldest items
+        self._items = deque(maxlen=capacity if overflow == DROP_OLDEST else None)
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put_many(self, items: List):
+        with self._cond:
+            room = self.capacity - len(self._items)
+            if room < len(items):
+                if self.overflow == DROP_NEWEST:
+                    self.dropped += len(items) - room
+                    items = items[:room]
+                elif self.overflow == BLOCK:
+                    # Wait for readers, which holds back the dispatcher and the reader behind it
+                    while room < len(items) and not self.closed:
+                        self._items.extend(items[:room])
+                        items = items[room:]
+                        self._cond.notify_all()
+                        self._cond.wait(0.1)
+                        room = self.capacity - len(self._items)
+                else:
+                    self.dropped += len(items) - room
+            self._items.extend(items)
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float]):
+        with self._cond:
+            if not self._items and not self._cond.wait_for(self._ready, timeout):
+                return None
+            item = self._items.popleft() if self._items else None
+            self._cond.notify_all()
+            return item
+
+    def get_batch(self, max_items: int, timeout: Optional[float]) -> List:
+        with self._cond:
+            if not self._items and not self._cond.wait_for(self._ready, timeout):
+                return []
+            items = self._items
+            batch = [items.popleft() for _ in range(min(max_items, len(items)))]
+            self._cond.notify_all()
+            return batch
+
+    def _ready(self) -> bool:
+        return bool(self._items) or self.closed
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
 
 class QuickCANBus(can.BusABC):
-    def __init__(self, channel, bitrate=500000, *args, **kwargs):
-        self._interface = QuickCAN(channel)
-        self._recv_queue = queue.Queue()
-        self._shutdown = threading.Event()
+    """
+    python-can bus on a QuickCAN adapter.
+
+    QuickCAN's dispatcher thread hands over received frames a batch at a
+    time: CAN traffic goes to the queue read by recv()/recv_batch() and
+    python-can's Notifier, other commands (device replies nobody requested,
+    heartbeats) to a separate control queue read by recv_control() or
+    `control_callback(cmd, frame)`. can.Message objects are only built when
+    recv() hands one out.
 
-        self._interface.set_receive_callback(self._on_frame_received)
+    `channel="unix:/path/to.sock"` connects to a `quickcan-cli serve`
+    daemon instead of opening the adapter, so many buses can share it.
+
+    With `fd`, the adapter is switched to CAN FD (protocol version 3), or
+    can.CanInitializationError raised if it doesn't support it; a shared
+    daemon must have been started with `--fd`.
+
+    With `wait_ack`, send() waits for the adapter to ACK each frame, which
+    it must do for every frame; pass `ack_filters=False` for adapters that
+    don't ACK filter commands, so later ACKs aren't taken for theirs.
+
+    With `on_change`, only frames whose data changed since the last one of
+    their ID are received, at most one per `min_interval` seconds per ID;
+    `snapshot()` returns the latest message of every ID.
+    """
+
+    def __init__(self, channel, bitrate=500000, receive_buffer_size=4096,
+                 overflow="drop-oldest", can_filters=None, device_filters=8, wait_ack=False, fd=False,
+                 on_change=False, min_interval=0.0, ack_filters=True, *args, **kwargs):
+        if isinstance(channel, str) and channel.startswith("unix:"):
+            self._interface = QuickCANClient(channel[len("unix:"):])
+            if fd:
+                self._interface.protocol_version = PROTOCOL_VERSION_FD
+        else:
+            # wait_ack needs the adapter to ACK every frame, so the driver tracks them all
+            self._interface = QuickCAN(channel, ack_sends=wait_ack, ack_filters=ack_filters)
+        try:
+            if fd and isinstance(self._interface, QuickCAN) and \
+                    self._interface.negotiate_protocol() != PROTOCOL_VERSION_FD:
+                raise can.CanInitializationError(f"QuickCAN adapter on {channel} doesn't support CAN FD")
+            self._can_protocol = can.CanProtocol.CAN_FD if fd else can.CanProtocol.CAN_20
+            # recv_batch() payload stride
+            self._payload_size = 64 if fd else 8
+            self._channel = channel if isinstance(channel, str) else getattr(channel, "name", None)
+            self.channel_info = f"QuickCAN on {self._channel}"
+            self._frames = _FrameQueue(receive_buffer_size, overflow)
+            self._control = _FrameQueue(256, DROP_OLDEST)
+            self.control_callback: Optional[Callable[[Command, CANFrame], None]] = None
+            self._device_filters = device_filters
+            # Make send() wait for the adapter's ACK/NACK of each frame
+            self._wait_ack = wait_ack
 
-        self._recv_thread = threading.Thread(target=self._receive_loop, daemon=True)
-        self._recv_thread.start()
+            self._interface.set_receive_batch_callback(self._on_batch)
+            if on_change:
+                self._interface.set_on_change(min_interval=min_interval)
+            # Applies can_filters through _apply_filters, before any frame is read
+            super().__init__(channel, can_filters=can_filters, **kwargs)
+            # QuickCAN's reader thread blocks on the port, no polling loop needed
+            self._interface.start(buffer_size=receive_buffer_size, overflow=overflow)
+        except Exception as e:
+            # Don't leave the port and the driver's threads open behind a failed constructor
+            self._interface.close()
+            self._is_shutdown = True
+            if isinstance(e, can.CanInitializationError):
+                raise
+            raise can.CanInitializationError(f"QuickCAN adapter on {channel} failed to initialize: {e}") from e
+
+    @property
+    def interface(self) -> Union[QuickCAN, QuickCANClient]:
+        """The underlying QuickCAN, for device commands (ping(), config_get(), ...)"""
+        return self._interface
+
+    @property
+    def dropped_frames(self) -> int:
+        return self._interface.dropped_frames + self._frames.dropped
 
     def send(self, msg: can.Message, timeout=None):
-        data = list(msg.data)
-        self._interface.send(msg.arbitration_id, data, extended=msg.is_extended_id)
-
-    def _on_frame_received(self, frame):
-        print("🎯 Decoded Frame:", frame)
-        msg = can.Message(
-            arbitration_id=frame.can_id,
-            data=frame.data,
-            is_extended_id=frame.extended
-        )
-        self._recv_queue.put(msg)
-
-    def _receive_loop(self):
-        while not self._shutdown.is_set():
-            try:
-                self._interface.receive()
-            except Exception:
-                continue
-
-    def recv(self, timeout=None) -> can.Message:
+        data = bytes(msg.data)
         try:
-            return self._recv_queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
+            acked = self._interface.send(msg.arbitration_id, data, extended=msg.is_extended_id,
+                                         timeout=timeout, wait_ack=self._wait_ack, fd=msg.is_fd,
+                                         bitrate_switch=msg.bitrate_switch)
+        except TimeoutError as e:
+            raise can.CanOperationError(str(e)) from e
+        if acked is False:
+            raise can.CanOperationError(f"Adapter rejected frame 0x{msg.arbitration_id:X} (NACK)")
+
+    def _send_periodic_internal(self, msgs, period, duration=None, autostart=True, modifier_callback=None):
+        # Every task shares QuickCAN's timer thread; packets are encoded once, not per send
+        return _CyclicTask(self._interface, msgs, period, duration, autostart, modifier_callback)
+
+    def _on_batch(self, batch: List[Tuple[Command, CANFrame]]):
+        frames = [frame for cmd, frame in batch if cmd is Command.CAN_SEND]
+        if frames:
+            # Frames are queued as-is; recv() or recv_batch() picks the output type
+            self._frames.put_many(frames)
+        if len(frames) != len(batch):
+            control = [(cmd, frame) for cmd, frame in batch if cmd is not Command.CAN_SEND]
+            self._control.put_many(control)
+            if self.control_callback:
+                for cmd, frame in control:
+                    self.control_callback(cmd, frame)
+
+    def _apply_filters(self, filters):
+        # QuickCAN filters before frames are queued, so everything
+        # _recv_internal returns is already filtered
+        self._interface.set_filters(filters, device_filters=self._device_filters)
+
+    def _recv_internal(self, timeout):
+        frame = self._frames.get(timeout)
+        if frame is None:
+            return None, True
+        return _to_message(frame, self._channel), True
+
+    def recv_batch(self, max_frames=1024, timeout=None) -> FrameBatch:
+        """Receive up to max_frames already queued frames as a columnar FrameBatch"""
+        batch = FrameBatch(self._payload_size)
+        batch.extend(self._frames.get_batch(max_frames, timeout))
+        return batch
+
+    def snapshot(self) -> Dict[int, can.Message]:
+        """Latest message of every CAN ID received, by CAN ID (needs `on_change`)"""
+        return {can_id: _to_message(frame, self._channel) for can_id, frame in self._interface.snapshot().items()}
+
+    def recv_control(self, timeout=None) -> Optional[Tuple[Command, CANFrame]]:
+        """Next (cmd, frame) received for a command other than CAN_SEND, or None on timeout"""
+        return self._control.get(timeout)
 
     def shutdown(self):
-        self._shutdown.set()
-        self._recv_thread.join()
+        super().shutdown()
+        self._frames.close()
+        self._control.close()
         self._interface.close()
@@ -0,0 +1,106 @@
+# benchmarks/bench_aio_adapters.py
+#
+# One asyncio event loop driving many simulated adapters: aggregate receive
+# frames/sec, CPU per frame and ping round-trip time as adapter count grows.
+#
+#   PYTHONPATH=. python benchmarks/bench_aio_adapters.py
+
+import asyncio
+import logging
+import statistics
+import time
+
+from quickcan.aio import AsyncQuickCAN
+from quickcan.protocol import CANFrame, Command, encode_frame, decode_frame
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+DURATION = 2.0
+BURST = 50          # Frames per burst, like one USB transfer
+BURST_PERIOD = 0.005
+
+
+class SimulatedAdapter(asyncio.Transport):
+    """In-memory device: answers PING and streams bursts of CAN frames"""
+
+    def __init__(self, protocol, index: int):
+        super().__init__()
+        self.protocol = protocol
+        self.decoder = FrameStreamDecoder()
+        self.closed = False
+        self.burst = b"".join(
+            encode_frame(CANFrame(0x100 + index, [i & 0xFF] * 8)) for i in range(BURST)
+        )
+        protocol.connection_made(self)
+
+    def write(self, data):
+        loop = asyncio.get_running_loop()
+        for raw in self.decoder.feed_bytes(data):
+            cmd, frame = decode_frame(raw)
+            if cmd == Command.PING:
+                loop.call_soon(self.protocol.data_received, encode_frame(frame, cmd=cmd))
+
+    async def stream(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self.protocol.data_received(self.burst)
+            await asyncio.sleep(BURST_PERIOD)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.protocol.connection_lost(None)
+
+    def is_closing(self):
+        return self.closed
+
+
+async def consume(can: AsyncQuickCAN, counts: list, index: int):
+    async for _ in can.frames():
+        counts[index] += 1
+
+
+async def pinger(can: AsyncQuickCAN, rtts: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await can.ping()
+        rtts.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run(adapters: int):
+    stop = asyncio.Event()
+    counts = [0] * adapters
+    rtts = []
+    cans, devices, tasks = [], [], []
+    for i in range(adapters):
+        can = AsyncQuickCAN()
+        device = SimulatedAdapter(can.protocol, i)
+        cans.append(can)
+        devices.append(device)
+        tasks.append(asyncio.ensure_future(consume(can, counts, i)))
+        tasks.append(asyncio.ensure_future(device.stream(stop)))
+        tasks.append(asyncio.ensure_future(pinger(can, rtts, stop)))
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(DURATION)
+    stop.set()
+    for can in cans:
+        can.close()
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    frames = sum(counts)
+    print(f"{adapters:>8} {frames / wall:>14,.0f} {cpu / max(frames, 1) * 1e6:>12.2f} "
+          f"{statistics.median(rtts) * 1e3:>12.2f} {max(rtts) * 1e3:>12.2f}")
+
+
+def main():
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    print(f"{'adapters':>8} {'frames/s':>14} {'CPU us/frm':>12} {'p50 RTT ms':>12} {'max RTT ms':>12}")
+    for adapters in (1, 8, 32, 128):
+        asyncio.run(run(adapters))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_capture.py
+#
+# Sustained capture throughput: recording decoded (cmd, frame) batches the
+# way the receive path hands them to CaptureWriter.write_batch, then
+# reading the log back through the memory-mapped CaptureReader.
+#
+#   PYTHONPATH=. python benchmarks/bench_capture.py [FRAME_COUNT] [FILE]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from quickcan.capture import CaptureWriter, CaptureReader
+from quickcan.protocol import CANFrame, Command
+
+BATCH = 64
+
+
+def build_batches(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    frames = [(Command.CAN_SEND, CANFrame(rng.randint(0, 0x7FF), bytes(rng.randint(0, 255) for _ in range(8))))
+              for _ in range(min(count, 50_000))]
+    return [frames[i:i + BATCH] for i in range(0, len(frames), BATCH)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), "bench_capture.qcap")
+    batches = build_batches(count)
+
+    writer = CaptureWriter(path)
+    start = time.perf_counter()
+    while writer.count < count:
+        for batch in batches:
+            writer.write_batch(batch)
+    writer.close()
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"record  {writer.count / elapsed:>12,.0f} frames/s  {size / elapsed / 1e6:>8.1f} MB/s  "
+          f"({size / writer.count:.0f} B/frame)")
+
+    with CaptureReader(path) as reader:
+        start = time.perf_counter()
+        records = sum(1 for _ in reader.records())
+        elapsed = time.perf_counter() - start
+        print(f"records {records / elapsed:>12,.0f} frames/s")
+
+        start = time.perf_counter()
+        frames = sum(1 for _ in reader)
+        elapsed = time.perf_counter() - start
+        print(f"frames  {frames / elapsed:>12,.0f} frames/s")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_decode_frame.py
+#
+# Per-frame decode time (timeit) and allocations (tracemalloc) of
+# decode_frame() against the original copy-heavy implementation.
+#
+#   PYTHONPATH=. python benchmarks/bench_decode_frame.py
+
+import timeit
+import tracemalloc
+
+from quickcan.protocol import (
+    CANFrame, Command, encode_frame, decode_frame, START_BYTE, PROTOCOL_VERSION
+)
+from quickcan.utils.helpers import checksum, unescape_data
+
+NUMBER = 200_000
+
+
+def legacy_decode_frame(buf: bytes):
+    """decode_frame() as it was before the memoryview/struct fast path"""
+    if not buf or buf[0] != START_BYTE:
+        return None
+    try:
+        payload = unescape_data(buf[1:])
+        if len(payload) < 8:
+            return None
+        if payload[0] != PROTOCOL_VERSION:
+            return None
+        cmd = Command(payload[1])
+        can_id = (payload[2] << 24) | (payload[3] << 16) | (payload[4] << 8) | payload[5]
+        flags = payload[6]
+        dlc = flags & 0x0F
+        data = list(payload[7:7 + dlc])
+        if checksum(payload[:-1]) != payload[-1]:
+            return None
+        return cmd, CANFrame(can_id=can_id, data=data, extended=bool(flags & 0x80), flags=flags)
+    except Exception:
+        return None
+
+
+def per_frame_ns(fn, raw: bytes) -> float:
+    return timeit.timeit(lambda: fn(raw), number=NUMBER) / NUMBER * 1e9
+
+
+def peak_bytes(fn, raw: bytes) -> int:
+    """Peak bytes allocated while decoding one frame (temporaries included)"""
+    tracemalloc.start()
+    fn(raw)  # warm up caches and interned objects
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = fn(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak - base
+
+
+def main():
+    cases = {
+        "8 bytes, no escapes": CANFrame(0x123, [0x11, 0x22, 0x33, 0x44, 0x55, 0x66, 0x77, 0x01]),
+        "8 bytes, escaped": CANFrame(0x1AA, [0xAA, 0x22, 0xAB, 0x44, 0x55, 0x66, 0x77, 0x01]),
+        "0 bytes": CANFrame(0x7FF, []),
+    }
+    print(f"{'case':<22} {'impl':<8} {'ns/frame':>10} {'peak B/frame':>14}")
+    for name, frame in cases.items():
+        raw = encode_frame(frame)
+        assert legacy_decode_frame(raw) == decode_frame(raw)
+        for impl, fn in (("legacy", legacy_decode_frame), ("fast", decode_frame)):
+            print(f"{name:<22} {impl:<8} {per_frame_ns(fn, raw):>10.0f} "
+                  f"{peak_bytes(fn, raw):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/bench_end_to_end.py
+#
+# End-to-end receive benchmark against the pty-backed simulated adapter,
+# which runs in its own process so only the stack under test is measured.
+# Reports frames/sec, p50/p99 emission-to-delivery latency and CPU per
+# frame for QuickCAN, QuickCANBus and quickcan-cli --recv.
+#
+#   PYTHONPATH=. python benchmarks/bench_end_to_end.py [RATE] [DURATION]
+
+import ast
+import contextlib
+import io
+import logging
+import os
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command
+from quickcan.simulator import frame_latency_ns
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START_DELAY = 0.5  # Simulator waits for the host to open the port
+CLI_ENTRY = "from cli.quickcan_cli import main; main()"  # What the quickcan-cli script runs
+
+
+@contextlib.contextmanager
+def simulator(rate: float, count: int):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "quickcan.simulator", "--rate", str(rate), "--count", str(count),
+         "--timestamps", "--ids", "0x100,0x200,0x300", "--delay", str(START_DELAY)],
+        stdout=subprocess.PIPE, text=True, env=env,
+    )
+    try:
+        yield proc.stdout.readline().strip()
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait()
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(name, frames, wall, cpu, latencies):
+    lat_ms = [ns / 1e6 for ns in latencies]
+    print(f"{name:<14} {frames:>8} {frames / wall:>12,.0f} "
+          f"{percentile(lat_ms, 50):>9.2f} {percentile(lat_ms, 99):>9.2f} "
+          f"{cpu / max(frames, 1) * 1e6:>10.2f}")
+
+
+def bench_quickcan(rate, duration):
+    count = int(rate * duration)
+    latencies = []
+    done = threading.Event()
+
+    def on_receive(cmd, frame):
+        if cmd == Command.CAN_SEND:
+            latencies.append(frame_latency_ns(frame))
+            if len(latencies) == count:
+                done.set()
+
+    with simulator(rate, count) as port:
+        can = QuickCAN(port)
+        can.set_receive_callback(on_receive)
+        cpu = time.process_time()
+        can.start()
+        time.sleep(START_DELAY)
+        wall = time.perf_counter()
+        done.wait(duration * 3 + 5)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        can.close()
+    report("QuickCAN", len(latencies), wall, cpu, latencies)
+
+
+def bench_bus(rate, duration):
+    from backend.quickcan_bus import QuickCANBus
+
+    count = int(rate * duration)
+    latencies = []
+    with simulator(rate, count) as port, contextlib.redirect_stdout(io.StringIO()):
+        bus = QuickCANBus(port)
+        cpu = time.process_time()
+        time.sleep(START_DELAY)
+        wall = time.perf_counter()
+        deadline = time.monotonic() + duration * 3 + 5
+        while len(latencies) < count and time.monotonic() < deadline:
+            msg = bus.recv(timeout=0.5)
+            if msg is not None:
+                latencies.append(time.monotonic_ns() - int.from_bytes(msg.data, "big"))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        bus.shutdown()
+    report("QuickCANBus", len(latencies), wall, cpu, latencies)
+
+
+def bench_cli(rate, duration):
+    count = int(rate * duration)
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONUNBUFFERED="1")
+    with simulator(rate, count) as port:
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        proc = subprocess.Popen(
+            [sys.executable, "-c", CLI_ENTRY, "--port", port, "--recv"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env,
+        )
+        latencies = []
+        frame = False
+        wall = time.perf_counter()
+        deadline = time.monotonic() + START_DELAY + duration * 3 + 5
+        for line in proc.stdout:
+            # A CAN frame's "  Data       : [...]" line carries its emission timestamp
+            now = time.monotonic_ns()
+            text = line.decode(errors="replace").strip()
+            if text.startswith("Command"):
+                frame = Command.CAN_SEND.name in text
+            elif frame and text.startswith("Data"):
+                data = bytes(ast.literal_eval(text.split(":", 1)[1].strip()))
+                latencies.append(frame_latency_ns(CANFrame(0, data), now))
+                if len(latencies) == count:
+                    break
+            if time.monotonic() > deadline:
+                break
+        wall = time.perf_counter() - wall - START_DELAY
+        proc.send_signal(signal.SIGINT)
+        proc.communicate()
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime)
+    report("quickcan-cli", len(latencies), wall, cpu, latencies)
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        sys.exit("pty-backed simulator needs a POSIX system")
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    print(f"Simulated traffic: {rate:,.0f} frames/s for {duration:.1f} s")
+    print(f"{'stack':<14} {'frames':>8} {'frames/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'CPU us/frm':>10}")
+    bench_quickcan(rate, duration)
+    bench_bus(rate, duration)
+    bench_cli(rate, duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_fanout.py
+#
+# Fan-out through QuickCANServer: a simulated adapter delivers N frames as
+# fast as the server takes them, and 1-32 subscriber processes (each a
+# QuickCANClient) count them. Reports the time until every subscriber
+# has all frames, per-subscriber and aggregate frames/s, and drops.
+#
+#   PYTHONPATH=. python benchmarks/bench_fanout.py [FRAME_COUNT]
+
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.server import QuickCANServer, QuickCANClient
+from quickcan.simulator import SimulatedDevice, TrafficGenerator, LoopbackSerial
+
+CHUNK = 4096
+SUBSCRIBERS = (1, 2, 4, 8, 16, 32)
+
+
+def subscriber(path: str, count: int, ready, results):
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    client = QuickCANClient(path)
+    received = 0
+    done = threading.Event()
+
+    def on_batch(batch):
+        nonlocal received
+        received += len(batch)
+        if received + client.dropped_frames >= count:
+            done.set()
+
+    client.set_receive_batch_callback(on_batch)
+    client.start()
+    ready.release()
+    done.wait(120)
+    results.put((time.time(), received, client.dropped_frames))
+    client.close()
+
+
+def run(subscribers: int, stream: bytes, count: int):
+    path = os.path.join(tempfile.mkdtemp(), "quickcan.sock")
+    port = LoopbackSerial(SimulatedDevice())
+    can = QuickCAN(port)
+    server = QuickCANServer(can, path, client_buffer=64 << 20)
+    server.start(buffer_size=count)
+    ready = multiprocessing.Semaphore(0)
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=subscriber, args=(path, count, ready, results))
+             for _ in range(subscribers)]
+    for proc in procs:
+        proc.start()
+    for _ in procs:
+        ready.acquire()
+    while len(server.clients) < subscribers:
+        time.sleep(0.01)
+    start = time.time()
+    for i in range(0, len(stream), CHUNK):
+        port.feed(stream[i:i + CHUNK])
+    done = [results.get(timeout=180) for _ in procs]
+    elapsed = max(t for t, _, _ in done) - start
+    for proc in procs:
+        proc.join()
+    server.close()
+    can.close()
+    received = sum(n for _, n, _ in done)
+    dropped = sum(d for _, _, d in done)
+    print(f"{subscribers:>3} subscribers  {elapsed:6.2f} s  {count / elapsed:>9,.0f} frames/s each  "
+          f"{received / elapsed:>10,.0f} frames/s total  {dropped:>6} dropped")
+
+
+def main():
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    generator = TrafficGenerator(ids={0x100: 1, 0x200: 1, 0x7DF: 1}, dlc_weights={2: 1, 8: 3}, seed=1)
+    stream = SimulatedDevice().traffic(generator.frames(count))
+    print(f"{count} frames fanned out over a Unix socket ({os.cpu_count()} CPUs)")
+    for subscribers in SUBSCRIBERS:
+        run(subscribers, stream, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_fd.py
+#
+# Classic vs. CAN FD receive throughput over the pty-backed simulated
+# adapter (in its own process, started with --fd). The simulator emits
+# frames faster than the host can take them, so the host stack is the
+# bottleneck; FD runs negotiate protocol version 3 first. Reports frames/s,
+# payload MB/s, wire bytes per payload byte and CPU per payload KB.
+#
+#   PYTHONPATH=. python benchmarks/bench_fd.py [FRAMES]
+
+import contextlib
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import Command, PROTOCOL_VERSION, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START_DELAY = 1.0  # Simulator waits for the host to open the port and negotiate
+RATE = 1_000_000  # Frames per second asked of the simulator: more than the host keeps up with
+
+# name, protocol version, data length
+CASES = (
+    ("classic v1", PROTOCOL_VERSION, 8),
+    ("classic v2", PROTOCOL_VERSION_2, 8),
+    ("FD 16", PROTOCOL_VERSION_FD, 16),
+    ("FD 32", PROTOCOL_VERSION_FD, 32),
+    ("FD 64", PROTOCOL_VERSION_FD, 64),
+)
+
+
+@contextlib.contextmanager
+def simulator(count: int, length: int):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "quickcan.simulator", "--fd", "--rate", str(RATE), "--count", str(count),
+         "--dlc", str(length), "--ids", "0x100,0x200,0x300", "--delay", str(START_DELAY)],
+        stdout=subprocess.PIPE, text=True, env=env,
+    )
+    try:
+        yield proc.stdout.readline().strip()
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait()
+
+
+def bench(name, version, length, count):
+    received = [0, 0]
+    done = threading.Event()
+
+    def on_batch(batch):
+        for cmd, frame in batch:
+            if cmd == Command.CAN_SEND:
+                received[0] += 1
+                received[1] += len(frame.data)
+        if received[0] >= count:
+            done.set()
+
+    with simulator(count, length) as port:
+        can = QuickCAN(port)
+        can.set_receive_batch_callback(on_batch)
+        can.start()
+        negotiated = can.negotiate_protocol(max_version=version)
+        assert negotiated == version, f"simulator negotiated version {negotiated}"
+        # Traffic starts after START_DELAY; time from the first frame on
+        while not received[0]:
+            time.sleep(0.001)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        start_frames, start_bytes, start_read = received[0], received[1], can.stats.bytes_read
+        done.wait(60)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        frames, payload = received[0] - start_frames, received[1] - start_bytes
+        wire = can.stats.bytes_read - start_read
+        can.close()
+    print(f"{name:<11} {frames / wall:>10,.0f} {payload / wall / 1e6:>11.2f} "
+          f"{wire / max(payload, 1):>10.2f} {cpu / max(payload, 1) * 1024 * 1e6:>12.1f}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"{count} frames per run")
+    print(f"{'frames':<11} {'frames/s':>10} {'payload MB/s':>11} {'wire/byte':>10} {'CPU us/KB':>12}")
+    for name, version, length in CASES:
+        bench(name, version, length, count)
+
+
+if __name__ == "__main__":
+    main()
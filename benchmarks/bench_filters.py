@@ -0,0 +1,60 @@
+# benchmarks/bench_filters.py
+#
+# Receive-path cost when the application only wants ~5% of the bus:
+# filtering in the callback (every frame becomes a CANFrame first)
+# against the host FilterEngine checking raw headers before decode.
+#
+#   PYTHONPATH=. python benchmarks/bench_filters.py [FRAME_COUNT]
+
+import logging
+import random
+import sys
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, encode_frames
+from quickcan.simulator import LoopbackSerial
+
+WANTED = [0x100, 0x101, 0x180, 0x181, 0x1F0]
+FILTERS = [{"can_id": 0x100, "can_mask": 0x7FE, "extended": False},
+           {"can_id": 0x180, "can_mask": 0x7FE, "extended": False},
+           {"can_id": 0x1F0, "can_mask": 0x7FF, "extended": False}]
+
+
+def build_stream(count: int, seed: int = 1) -> bytes:
+    rng = random.Random(seed)
+    ids = [rng.choice(WANTED) if rng.random() < 0.05 else rng.randint(0x200, 0x7FF) for _ in range(count)]
+    return encode_frames([CANFrame(can_id, bytes(rng.randint(0, 255) for _ in range(8))) for can_id in ids])
+
+
+def run(stream: bytes, host_filters: bool) -> float:
+    port = LoopbackSerial(timeout=0)
+    can = QuickCAN(port)
+    kept = []
+    if host_filters:
+        can.set_filters(FILTERS, device_filters=0)
+        can.set_receive_callback(lambda cmd, frame: kept.append(frame))
+    else:
+        wanted = set(WANTED)
+        can.set_receive_callback(lambda cmd, frame: frame.can_id in wanted and kept.append(frame))
+    port.feed(stream)
+    start = time.perf_counter()
+    while port.in_waiting:
+        can.receive()
+    elapsed = time.perf_counter() - start
+    can.close()
+    return elapsed, len(kept)
+
+
+def main():
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    stream = build_stream(count)
+    print(f"{count} frames, ~5% wanted")
+    for name, host in (("callback filter", False), ("FilterEngine", True)):
+        elapsed, kept = run(stream, host)
+        print(f"{name:<16} {count / elapsed:>12,.0f} frames/s  {elapsed / count * 1e6:>6.2f} us/frame  kept {kept}")
+
+
+if __name__ == "__main__":
+    main()
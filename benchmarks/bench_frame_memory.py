@@ -0,0 +1,82 @@
+# benchmarks/bench_frame_memory.py
+#
+# Per-frame memory footprint of captured frames: the original
+# dataclass-with-list CANFrame, the slotted bytes CANFrame and FrameBatch.
+#
+#   PYTHONPATH=. python benchmarks/bench_frame_memory.py [FRAME_COUNT]
+
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List
+
+from quickcan.batch import FrameBatch
+from quickcan.protocol import CANFrame, encode_frame, decode_frame
+
+
+@dataclass
+class LegacyCANFrame:
+    """CANFrame as it was: __dict__ per instance and a list of boxed ints"""
+    can_id: int
+    data: List[int]
+    extended: bool = False
+    flags: int = 0
+    timestamp: float = 0.0
+
+
+def build_raw(count: int, seed: int = 1) -> List[bytes]:
+    rng = random.Random(seed)
+    return [
+        encode_frame(CANFrame(rng.randint(0, 0x7FF), bytes(rng.randint(0, 255) for _ in range(8))))
+        for _ in range(count)
+    ]
+
+
+def capture_legacy(raws):
+    frames = []
+    for raw in raws:
+        _, f = decode_frame(raw)
+        frames.append(LegacyCANFrame(f.can_id, list(f.data), f.extended, f.flags, time.time()))
+    return frames
+
+
+def capture_frames(raws):
+    frames = []
+    for raw in raws:
+        _, f = decode_frame(raw)
+        frames.append(f)
+    return frames
+
+
+def capture_batch(raws):
+    batch = FrameBatch()
+    for raw in raws:
+        batch.append_raw(raw, time.time())
+    return batch
+
+
+def measure(name: str, fn, raws):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(raws)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<28} {current / len(raws):>10.1f} B/frame  {current / 1e6:>8.1f} MB  "
+          f"{len(raws) / elapsed:>12,.0f} frames/s")
+    del result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    raws = build_raw(count)
+    print(f"{count} captured 8-byte frames")
+    measure("dataclass + List[int]", capture_legacy, raws)
+    measure("slotted CANFrame + bytes", capture_frames, raws)
+    measure("FrameBatch (columnar)", capture_batch, raws)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_group_scaling.py
+#
+# Receive CPU per frame as the number of adapters grows: one QuickCAN
+# (reader + dispatcher thread) per adapter against a single
+# QuickCANGroup. Each adapter is a pty-backed simulator in its own
+# process, so only the host side is measured.
+#
+#   PYTHONPATH=. python benchmarks/bench_group_scaling.py [RATE_PER_ADAPTER] [DURATION] [MAX_ADAPTERS]
+
+import contextlib
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.group import QuickCANGroup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START_DELAY = 1.0  # Simulators wait for the host to open every port
+
+
+@contextlib.contextmanager
+def simulators(count: int, rate: float, frames: int):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "quickcan.simulator", "--rate", str(rate), "--count", str(frames),
+             "--ids", f"0x{0x100 + i:X}", "--delay", str(START_DELAY)],
+            stdout=subprocess.PIPE, text=True, env=env,
+        )
+        for i in range(count)
+    ]
+    try:
+        yield [proc.stdout.readline().strip() for proc in procs]
+    finally:
+        for proc in procs:
+            proc.send_signal(signal.SIGINT)
+        for proc in procs:
+            proc.wait()
+
+
+class Counter:
+    def __init__(self, expected: int):
+        self.count = 0
+        self.expected = expected
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def add(self, n: int):
+        with self.lock:
+            self.count += n
+            if self.count >= self.expected:
+                self.done.set()
+
+
+def run_independent(ports, counter: Counter, timeout: float):
+    adapters = [QuickCAN(port) for port in ports]
+    for can in adapters:
+        can.set_receive_batch_callback(lambda batch: counter.add(len(batch)))
+        can.start()
+    counter.done.wait(timeout)
+    for can in adapters:
+        can.close()
+
+
+def run_group(ports, counter: Counter, timeout: float):
+    group = QuickCANGroup(ports)
+    group.set_receive_batch_callback(lambda batch: counter.add(len(batch)))
+    group.start()
+    counter.done.wait(timeout)
+    group.close()
+
+
+def measure(runner, adapters: int, rate: float, duration: float):
+    frames = int(rate * duration)
+    counter = Counter(adapters * frames)
+    with simulators(adapters, rate, frames) as ports:
+        cpu = time.process_time()
+        runner(ports, counter, START_DELAY + duration * 3 + 5)
+        cpu = time.process_time() - cpu
+    return counter.count, cpu
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        sys.exit("pty-backed simulators need a POSIX system")
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    max_adapters = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+
+    print(f"{rate:,.0f} frames/s per adapter for {duration:.1f} s")
+    print(f"{'adapters':>8} {'stack':<16} {'frames':>8} {'CPU s':>7} {'CPU us/frm':>11}")
+    adapters = 1
+    while adapters <= max_adapters:
+        for name, runner in (("QuickCAN each", run_independent), ("QuickCANGroup", run_group)):
+            frames, cpu = measure(runner, adapters, rate, duration)
+            print(f"{adapters:>8} {name:<16} {frames:>8} {cpu:>7.2f} {cpu / max(frames, 1) * 1e6:>11.1f}")
+        adapters *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_helpers.py
+#
+# checksum / escape_data / unescape_data from quickcan.utils.helpers
+# against the per-byte loops they replaced, and escape_into / unescape_into
+# writing into a preallocated buffer, across payload sizes and densities of
+# bytes that need escaping.
+#
+#   PYTHONPATH=. python benchmarks/bench_helpers.py [REPEAT]
+
+import random
+import sys
+import timeit
+
+from quickcan.utils.helpers import checksum, escape_data, unescape_data, escape_into, unescape_into
+
+SIZES = (8, 16, 64, 256, 4096)
+DENSITIES = (0.0, 0.02, 0.2)
+
+
+def loop_checksum(data):
+    return sum(data) % 256
+
+
+def loop_unescape(data):
+    result = bytearray()
+    it = iter(data)
+    for b in it:
+        if b == 0xAB:
+            next_byte = next(it, None)
+            if next_byte is None:
+                break
+            result.append(next_byte ^ 0x20)
+        else:
+            result.append(b)
+    return bytes(result)
+
+
+def payload(size: int, density: float, rng: random.Random) -> bytes:
+    return bytes(rng.choice((0xAA, 0xAB)) if rng.random() < density else rng.randrange(256) for _ in range(size))
+
+
+def ns(fn, arg, repeat: int) -> float:
+    number = max(1, 200_000 // (len(arg) + 16))
+    return min(timeit.repeat(lambda: fn(arg), number=number, repeat=repeat)) / number * 1e9
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = random.Random(1)
+    out = bytearray(2 * max(SIZES))
+    into_escape = lambda data: escape_into(data, out)
+    into_unescape = lambda data: unescape_into(data, out)
+    print(f"{'size':>5} {'escapes':>7} | {'checksum ns':>17} | {'escape ns':>17} | {'unescape ns':>26}")
+    print(f"{'':>5} {'':>7} | {'loop':>8} {'new':>8} | {'new':>8} {'into':>8} | {'loop':>8} {'new':>8} {'into':>8}")
+    for size in SIZES:
+        for density in DENSITIES:
+            data = payload(size, density, rng)
+            escaped = escape_data(data)
+            assert unescape_data(escaped) == loop_unescape(escaped) == data
+            assert out[:into_escape(data)] == escaped and out[:into_unescape(escaped)] == data
+            print(f"{size:>5} {density:>7.0%} | "
+                  f"{ns(loop_checksum, data, repeat):>8.0f} {ns(checksum, data, repeat):>8.0f} | "
+                  f"{ns(escape_data, data, repeat):>8.0f} {ns(into_escape, data, repeat):>8.0f} | "
+                  f"{ns(loop_unescape, escaped, repeat):>8.0f} {ns(unescape_data, escaped, repeat):>8.0f} "
+                  f"{ns(into_unescape, escaped, repeat):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_logging.py
+#
+# send() throughput into an in-memory serial sink with quickcan's logging
+# left unconfigured, configured at INFO, with frame tracing (rate-limited
+# and unlimited), and with the former per-frame f-string INFO message.
+# Records go to os.devnull, so the numbers are formatting and handler cost.
+#
+#   PYTHONPATH=. python benchmarks/bench_logging.py [FRAME_COUNT]
+
+import logging
+import math
+import os
+import sys
+import time
+
+import quickcan
+from quickcan.driver import QuickCAN, logger as driver_logger
+
+REPEAT = 3
+
+
+class NullSerial:
+    in_waiting = 0
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class FStringQuickCAN(QuickCAN):
+    """send() logging every frame at INFO, as before lazy logging"""
+
+    def send(self, can_id, data, extended=False, timeout=None, wait_ack=False):
+        result = super().send(can_id, data, extended, timeout, wait_ack)
+        driver_logger.info(f"Sent CAN frame: ID=0x{can_id:X}, Data={data}, Extended={extended}")
+        return result
+
+
+def reset_logging():
+    for name in ("quickcan", "quickcan.trace"):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    logging.getLogger("quickcan").removeHandler(quickcan.utils.log._handler)
+
+
+def run(cls, count: int, max_per_second: float = 100) -> float:
+    can = cls(NullSerial())
+    can.tracer.max_per_second = max_per_second
+    data = [0x11, 0x22, 0x33, 0x44, 0x55, 0x66, 0x77, 0x88]
+    start = time.perf_counter()
+    for i in range(count):
+        can.send(i & 0x7FF, data)
+    can.flush()
+    elapsed = time.perf_counter() - start
+    can.close()
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    devnull = open(os.devnull, "w")
+    cases = (
+        ("unconfigured", None, QuickCAN, 100),
+        ("INFO", dict(level=logging.INFO), QuickCAN, 100),
+        ("trace, 100/s", dict(level=logging.INFO, trace=True), QuickCAN, 100),
+        ("trace, unlimited", dict(level=logging.INFO, trace=True), QuickCAN, math.inf),
+        ("f-string INFO", dict(level=logging.INFO), FStringQuickCAN, 100),
+    )
+    print(f"{count} send() calls, best of {REPEAT}")
+    for name, config, cls, rate in cases:
+        reset_logging()
+        if config is not None:
+            quickcan.configure_logging(handler=logging.StreamHandler(devnull), **config)
+        best = min(run(cls, count, rate) for _ in range(REPEAT))
+        print(f"{name:<17} {count / best:>10,.0f} frames/s  {best / count * 1e6:>6.2f} us/frame")
+    reset_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_notifier.py
+#
+# python-can Notifier throughput on QuickCANBus: a simulated adapter
+# delivers N frames as fast as the host takes them and a Listener counts
+# them. Compared against the previous bus design (per-frame callback into
+# a queue.Queue, can.Message built through its keyword __init__), minus
+# its per-frame print.
+#
+#   PYTHONPATH=. python benchmarks/bench_notifier.py [FRAME_COUNT]
+
+import logging
+import queue
+import sys
+import threading
+import time
+
+import can
+
+from backend.quickcan_bus import QuickCANBus
+from quickcan.driver import QuickCAN
+from quickcan.protocol import Command
+from quickcan.simulator import SimulatedDevice, TrafficGenerator, LoopbackSerial
+
+CHUNK = 4096
+REPEAT = 3
+
+
+class QueueBus(can.BusABC):
+    """The former QuickCANBus receive path"""
+
+    def __init__(self, channel, receive_buffer_size=4096, **kwargs):
+        self._interface = QuickCAN(channel)
+        self._recv_queue = queue.Queue()
+        self._interface.set_receive_callback(self._on_frame_received)
+        super().__init__(channel, **kwargs)
+        self._interface.start(buffer_size=receive_buffer_size)
+
+    def _on_frame_received(self, cmd, frame):
+        if cmd != Command.CAN_SEND:
+            return
+        self._recv_queue.put(frame)
+
+    def _recv_internal(self, timeout):
+        try:
+            frame = self._recv_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None, True
+        return can.Message(timestamp=frame.timestamp, arbitration_id=frame.can_id,
+                           data=frame.data, is_extended_id=frame.extended), True
+
+    def send(self, msg, timeout=None):
+        pass
+
+    def shutdown(self):
+        super().shutdown()
+        self._interface.close()
+
+
+class Counter(can.Listener):
+    def __init__(self, expected: int):
+        self.count = 0
+        self.expected = expected
+        self.done = threading.Event()
+
+    def on_message_received(self, msg):
+        self.count += 1
+        if self.count == self.expected:
+            self.done.set()
+
+
+def run(bus_class, stream: bytes, count: int) -> float:
+    port = LoopbackSerial(SimulatedDevice())
+    # The buffers hold the whole burst, as it is fed faster than it is read
+    bus = bus_class(port, receive_buffer_size=count)
+    counter = Counter(count)
+    notifier = can.Notifier(bus, [counter], timeout=0.1)
+    start = time.perf_counter()
+    for i in range(0, len(stream), CHUNK):
+        port.feed(stream[i:i + CHUNK])
+    counter.done.wait(60)
+    elapsed = time.perf_counter() - start
+    notifier.stop()
+    bus.shutdown()
+    assert counter.count == count, f"{counter.count} of {count} frames"
+    return elapsed
+
+
+def main():
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    generator = TrafficGenerator(ids={0x100: 1, 0x200: 1, 0x7DF: 1}, dlc_weights={2: 1, 8: 3}, seed=1)
+    stream = SimulatedDevice().traffic(generator.frames(count))
+    print(f"{count} frames through can.Notifier, best of {REPEAT}")
+    for name, bus_class in (("queue.Queue bus", QueueBus), ("QuickCANBus", QuickCANBus)):
+        best = min(run(bus_class, stream, count) for _ in range(REPEAT))
+        print(f"{name:<16} {count / best:>10,.0f} msg/s  {best / count * 1e6:>6.1f} us/msg")
+
+
+if __name__ == "__main__":
+    main()
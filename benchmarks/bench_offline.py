@@ -0,0 +1,74 @@
+# benchmarks/bench_offline.py
+#
+# Offline decode of a raw serial dump: the single FrameStreamDecoder +
+# decode_frame loop against quickcan.offline.decode_dump with 1, 2, 4 ...
+# worker processes up to the CPU count.
+#
+#   PYTHONPATH=. python benchmarks/bench_offline.py [FRAME_COUNT] [DUMP_FILE]
+
+import os
+import sys
+import tempfile
+import time
+
+from quickcan.offline import decode_dump
+from quickcan.protocol import decode_frame
+from quickcan.simulator import SimulatedDevice, TrafficGenerator
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def write_dump(path: str, count: int):
+    device = SimulatedDevice()
+    generator = TrafficGenerator(ids={0x100: 1, 0x200: 1, 0x7DF: 1}, dlc_weights={2: 1, 8: 3},
+                                 escape_density=0.02, seed=1)
+    with open(path, "wb") as f:
+        for done in range(0, count, 100_000):
+            f.write(device.traffic(generator.frames(min(100_000, count - done))))
+
+
+def sequential(path: str) -> int:
+    decoder = FrameStreamDecoder()
+    frames = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            for raw in decoder.feed_bytes(chunk):
+                if decode_frame(raw):
+                    frames += 1
+    return frames
+
+
+def parallel(path: str, workers: int) -> int:
+    return sum(len(result.batch) for result in decode_dump(path, workers, CHUNK_SIZE))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), "bench_offline.bin")
+    write_dump(path, count)
+    size = os.path.getsize(path)
+    cpus = os.cpu_count() or 1
+    print(f"{count} frames, {size / 1e6:.1f} MB dump, {cpus} CPUs")
+
+    start = time.perf_counter()
+    frames = sequential(path)
+    base = time.perf_counter() - start
+    print(f"{'sequential loop':<18} {frames / base:>12,.0f} frames/s  {size / base / 1e6:>7.1f} MB/s")
+
+    workers = 1
+    while workers <= cpus:
+        start = time.perf_counter()
+        frames = parallel(path, workers)
+        elapsed = time.perf_counter() - start
+        print(f"{f'{workers} worker(s)':<18} {frames / elapsed:>12,.0f} frames/s  {size / elapsed / 1e6:>7.1f} MB/s"
+              f"  x{base / elapsed:.2f}")
+        workers *= 2
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_on_change.py
+#
+# On-change delivery on cyclic traffic: 40 IDs at 10-100 ms periods, half
+# of them static, a third with values changing about once a second and
+# the rest carrying a rolling counter. A recorded stream of BUS_SECONDS of
+# that traffic is fed through QuickCAN in 4 KiB reads, with a callback
+# decoding every frame it gets (quickcan.signals), delivering every frame
+# vs. only changes. Reports callbacks, frames decoded and CPU per
+# received frame.
+#
+#   PYTHONPATH=. python benchmarks/bench_on_change.py [BUS_SECONDS]
+
+import random
+import sys
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, encode_frame
+from quickcan.signals import Message, Signal, SignalDatabase
+from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+IDS = 40
+PERIODS = (0.01, 0.02, 0.05, 0.1)
+CHUNK_SIZE = 4096
+
+
+def build_stream(seconds: float, rng: random.Random):
+    """Raw bytes of the traffic, in transmission order, and its frame count"""
+    schedule = []
+    for i in range(IDS):
+        period = rng.choice(PERIODS)
+        kind = "static" if i % 6 < 3 else "slow" if i % 6 < 5 else "counter"
+        data = bytearray(rng.randbytes(8))
+        t = rng.random() * period
+        while t < seconds:
+            if kind == "counter":
+                data[7] = (data[7] + 1) & 0xFF
+            elif kind == "slow" and rng.random() < period:
+                data[0] = rng.randrange(256)
+            schedule.append((t, encode_frame(CANFrame(0x100 + i, bytes(data)))))
+            t += period
+    schedule.sort(key=lambda entry: entry[0])
+    return b"".join(packet for _, packet in schedule), len(schedule)
+
+
+def build_database() -> SignalDatabase:
+    signals = (Signal("A", 0, 8), Signal("B", 8, 16, scale=0.1), Signal("C", 31, 12, little_endian=False, signed=True),
+               Signal("Counter", 56, 8))
+    return SignalDatabase(Message(0x100 + i, f"M{i}", 8, signals) for i in range(IDS))
+
+
+def run(name, stream, frames, db, on_change):
+    port = LoopbackSerial(SimulatedDevice(), timeout=0)
+    can = QuickCAN(port)
+    decode = db.decode
+    calls = [0]
+
+    def on_receive(cmd, frame):
+        calls[0] += 1
+        decode(frame)
+
+    can.set_receive_callback(on_receive)
+    if on_change:
+        can.set_on_change()
+    cpu = time.process_time()
+    for i in range(0, len(stream), CHUNK_SIZE):
+        can._deliver(stream[i:i + CHUNK_SIZE])
+    cpu = time.process_time() - cpu
+    print(f"{name:<14} {calls[0]:>10,} {can.stats.frames_decoded:>10,} {can.stats.frames_unchanged:>10,} "
+          f"{cpu / frames * 1e9:>12,.0f}")
+    can.close()
+    return calls[0], cpu
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 120.0
+    rng = random.Random(1)
+    stream, frames = build_stream(seconds, rng)
+    db = build_database()
+    print(f"{frames:,} frames ({seconds:.0f} s of bus time, {IDS} IDs), {len(stream) / 1e6:.1f} MB")
+    print(f"{'delivery':<14} {'callbacks':>10} {'decoded':>10} {'unchanged':>10} {'CPU ns/frame':>12}")
+    calls_all, cpu_all = run("every frame", stream, frames, db, False)
+    calls, cpu = run("on change", stream, frames, db, True)
+    print(f"on change: {calls / calls_all:.1%} of the callbacks, {cpu / cpu_all:.1%} of the CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_resync.py
+#
+# FrameStreamDecoder under injected faults: bit flips, dropped bytes and
+# corrupted escapes at increasing rates in a 1 MB stream of v1/v2 frames
+# with escaped bytes. Reports valid frames recovered per second (framing
+# plus decode_fields, 4096-byte chunks), the share of the frames no fault
+# touched that were recovered (100% = one lost frame per fault; a little
+# more where a fault left its frame valid, e.g. an escape written over an
+# escape), resyncs by reason and the decoder's peak buffer and traced memory.
+#
+#   PYTHONPATH=. python benchmarks/bench_resync.py [STREAM_MB]
+
+import bisect
+import random
+import sys
+import time
+import tracemalloc
+
+from quickcan.protocol import CANFrame, decode_fields, encode_frame, ESCAPE_BYTE, PROTOCOL_VERSION_2, START_BYTE
+from quickcan.transport.stream_decoder import FrameStreamDecoder, MAX_FRAME_SIZE
+
+CHUNK_SIZE = 4096
+RATES = (0.0, 1e-5, 1e-4, 1e-3, 1e-2)
+FAULTS = ("flip", "drop", "escape", "mixed")
+
+
+def build_stream(size: int, rng: random.Random):
+    packets = []
+    total = 0
+    while total < size:
+        data = bytes(rng.choice((START_BYTE, ESCAPE_BYTE)) if rng.random() < 0.05 else rng.randrange(256)
+                     for _ in range(rng.randint(0, 8)))
+        packet = encode_frame(CANFrame(rng.randrange(0x800), data), version=rng.choice((1, PROTOCOL_VERSION_2)))
+        packets.append(packet)
+        total += len(packet)
+    return packets
+
+
+def inject(packets, fault: str, rate: float, rng: random.Random):
+    """Faulted stream, and the number of frames a fault touched"""
+    stream = bytearray(b"".join(packets))
+    ends = []
+    total = 0
+    for packet in packets:
+        total += len(packet)
+        ends.append(total)
+    positions = sorted(rng.sample(range(len(stream)), int(len(stream) * rate)), reverse=True)
+    hit = set()
+    for pos in positions:
+        hit.add(bisect.bisect_right(ends, pos))
+        kind = rng.choice(FAULTS[:3]) if fault == "mixed" else fault
+        if kind == "flip":
+            stream[pos] ^= 1 << rng.randrange(8)
+        elif kind == "drop":
+            del stream[pos]
+        else:
+            stream[pos] = ESCAPE_BYTE
+    return bytes(stream), len(hit)
+
+
+def decode(stream: bytes):
+    decoder = FrameStreamDecoder()
+    valid = 0
+    peak = 0
+    for i in range(0, len(stream), CHUNK_SIZE):
+        for raw in decoder.feed_bytes(stream[i:i + CHUNK_SIZE]):
+            if decode_fields(raw) is not None:
+                valid += 1
+        if len(decoder.buffer) > peak:
+            peak = len(decoder.buffer)
+    return valid, decoder, peak
+
+
+def main():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 1024 * 1024
+    rng = random.Random(1)
+    packets = build_stream(size, rng)
+    print(f"{len(packets)} frames, {size / 1e6:.1f} MB, {CHUNK_SIZE}-byte chunks, MAX_FRAME_SIZE {MAX_FRAME_SIZE}")
+    print(f"{'fault':<7} {'rate':>6} {'faults':>6} | {'frames/s':>9} {'recovered':>9} | "
+          f"{'truncated':>9} {'header':>6} {'overflow':>8} | {'peak buf':>8} {'traced KB':>9}")
+    for fault in FAULTS:
+        for rate in RATES:
+            if rate == 0.0 and fault != FAULTS[0]:
+                continue
+            stream, touched = inject(packets, fault, rate, rng)
+            start = time.perf_counter()
+            valid, decoder, peak = decode(stream)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            decode(stream)
+            traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            reasons = decoder.resync_reasons
+            print(f"{fault if rate else 'none':<7} {rate:>6.0e} {int(len(stream) * rate):>6} | "
+                  f"{valid / elapsed:>9,.0f} {valid / (len(packets) - touched):>9.2%} | "
+                  f"{reasons.get('truncated', 0):>9} {reasons.get('header', 0):>6} {reasons.get('overflow', 0):>8} | "
+                  f"{peak:>8} {traced / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_rpc.py
+#
+# Command round trips against a pty-backed simulator in its own process:
+# ping() RTT percentiles, then reading N config keys one request at a time
+# against config_get_many() with increasing pipelining depth.
+#
+#   PYTHONPATH=. python benchmarks/bench_rpc.py [KEYS] [PINGS]
+
+import contextlib
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from quickcan.driver import QuickCAN
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEPTHS = (4, 16, 64)
+
+
+@contextlib.contextmanager
+def simulator():
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.Popen([sys.executable, "-m", "quickcan.simulator"],
+                            stdout=subprocess.PIPE, text=True, env=env)
+    try:
+        yield proc.stdout.readline().strip()
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait()
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        sys.exit("pty-backed simulators need a POSIX system")
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    pings = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    with simulator() as port:
+        can = QuickCAN(port)
+        can.start()
+
+        rtts = sorted(can.ping() * 1e6 for _ in range(pings))
+        print(f"ping RTT over {pings}: p50 {rtts[len(rtts) // 2]:.0f} us  "
+              f"p99 {rtts[int(len(rtts) * 0.99)]:.0f} us  max {rtts[-1]:.0f} us")
+
+        start = time.perf_counter()
+        for key in range(keys):
+            can.config_get(key & 0xFF)
+        serial_time = time.perf_counter() - start
+        print(f"reading {keys} config keys")
+        print(f"{'one at a time':<20} {serial_time * 1e3:>8.1f} ms")
+
+        for depth in DEPTHS:
+            start = time.perf_counter()
+            values = can.config_get_many([key & 0xFF for key in range(keys)], max_in_flight=depth)
+            elapsed = time.perf_counter() - start
+            assert len(values) == min(keys, 256)
+            print(f"{f'{depth} in flight':<20} {elapsed * 1e3:>8.1f} ms  x{serial_time / elapsed:.1f}")
+        can.close()
+
+
+if __name__ == "__main__":
+    main()
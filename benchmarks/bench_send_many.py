@@ -0,0 +1,73 @@
+# benchmarks/bench_send_many.py
+#
+# Transmit frames/sec for 10k/100k-frame batches: one send() per frame vs.
+# a single send_many() per batch, writing into an in-memory serial sink.
+#
+#   PYTHONPATH=. python benchmarks/bench_send_many.py
+
+import logging
+import random
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame
+
+
+class NullSerial:
+    """Serial-like sink that counts written bytes and write calls"""
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.writes = 0
+        self.in_waiting = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self.writes += 1
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def build_frames(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        CANFrame(rng.randint(0, 0x7FF), [rng.randint(0, 255) for _ in range(rng.randint(0, 8))])
+        for _ in range(count)
+    ]
+
+
+def run_send(can: QuickCAN, frames):
+    for frame in frames:
+        can.send(frame.can_id, frame.data, frame.extended)
+
+
+def run_send_many(can: QuickCAN, frames):
+    can.send_many(frames)
+
+
+def report(name: str, fn, frames):
+    sink = NullSerial()
+    can = QuickCAN(sink)
+    start = time.perf_counter()
+    fn(can, frames)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {len(frames):>7} frames  {elapsed:7.3f} s  "
+          f"{len(frames) / elapsed:>12,.0f} frames/s  {sink.writes:>7} writes")
+    return elapsed
+
+
+def main():
+    # Keep the adapter's INFO messages out of the output
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+
+    for count in (10_000, 100_000):
+        frames = build_frames(count)
+        before = report("send()", run_send, frames)
+        after = report("send_many()", run_send_many, frames)
+        print(f"Speedup: {before / after:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_signals.py
+#
+# Signal decoding of recorded frames: 20 messages of 6 signals (both byte
+# orders, signed and scaled), every frame a known ID. Compares a generic
+# per-frame decoder walking the signal list (what receive callbacks do by
+# hand), SignalDatabase.decode() per frame (compiled per message) and
+# SignalDatabase.decode_batch() over a FrameBatch (NumPy, when installed).
+#
+#   PYTHONPATH=. python benchmarks/bench_signals.py [FRAMES]
+
+import random
+import sys
+import time
+
+from quickcan.batch import FrameBatch
+from quickcan.protocol import CANFrame
+from quickcan.signals import Message, Signal, SignalDatabase
+
+MESSAGES = 20
+
+
+def build_database(rng: random.Random) -> SignalDatabase:
+    messages = []
+    for i in range(MESSAGES):
+        signals = []
+        for j in range(6):
+            # Six signals of 8 to 10 bits, alternating byte order (big-endian ones start at a byte's MSB)
+            if j % 2:
+                signals.append(Signal(f"S{j}", j * 10 // 8 * 8 + 7, rng.randint(8, 10), little_endian=False,
+                                      signed=True, scale=0.1))
+            else:
+                signals.append(Signal(f"S{j}", j * 10, rng.randint(8, 10), offset=-40.0 if j else 0.0))
+        messages.append(Message(0x100 + i, f"M{i}", 8, tuple(signals)))
+    return SignalDatabase(messages)
+
+
+def decode_generic(messages, frame: CANFrame):
+    """Per-frame decoding without compilation: every signal interpreted from its fields"""
+    message = messages.get(frame.can_id)
+    if message is None:
+        return None
+    data = frame.data.ljust(message.length, b"\0")
+    values = {}
+    for signal in message.signals:
+        raw = int.from_bytes(data, "little" if signal.little_endian else "big")
+        raw = (raw >> signal.shift(message.length)) & ((1 << signal.length) - 1)
+        if signal.signed and raw & (1 << signal.length - 1):
+            raw -= 1 << signal.length
+        values[signal.name] = raw * signal.scale + signal.offset if signal.scaled else raw
+    return values
+
+
+def run(name, count, fn):
+    start = time.perf_counter()
+    cpu = time.process_time()
+    fn()
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    print(f"{name:<22} {count / wall:>12,.0f} {cpu / count * 1e9:>10,.0f}")
+    return wall
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(1)
+    db = build_database(rng)
+    batch = FrameBatch()
+    ids = [0x100 + i for i in range(MESSAGES)]
+    for i in range(count):
+        batch.append(rng.choice(ids), rng.randbytes(8), timestamp=i * 1e-4)
+    frames = list(batch)
+    messages = {m.frame_id: m for m in db}
+    print(f"{count} frames, {MESSAGES} messages x 6 signals")
+    print(f"{'decoder':<22} {'frames/s':>12} {'CPU ns/frame':>10}")
+
+    def generic():
+        for frame in frames:
+            decode_generic(messages, frame)
+
+    def compiled():
+        decode = db.decode
+        for frame in frames:
+            decode(frame)
+
+    base = run("per frame, generic", count, generic)
+    scalar = run("per frame, compiled", count, compiled)
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("decode_batch skipped: numpy is not installed")
+        return
+    vector = run("batch, NumPy columns", count, lambda: db.decode_batch(batch))
+    print(f"compiled {base / scalar:.1f}x, batch {base / vector:.1f}x the generic decoder")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_stats.py
+#
+# Cost of QuickCAN's receive statistics: per-frame decode time with the
+# always-on counters, with a stage hook added, and against the bare
+# FrameStreamDecoder + decode_frame loop, for small and large reads; plus
+# the per-batch cost of recording a callback duration.
+#
+#   PYTHONPATH=. python benchmarks/bench_stats.py [FRAME_COUNT]
+
+import logging
+import sys
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import decode_frame
+from quickcan.simulator import SimulatedDevice, TrafficGenerator, LoopbackSerial
+from quickcan.stats import ReceiveStats
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+CHUNK_SIZES = (64, 4096)
+REPEAT = 9
+
+
+def build_stream(count: int) -> bytes:
+    generator = TrafficGenerator(ids={0x100: 1, 0x200: 1, 0x7DF: 1}, dlc_weights={2: 1, 8: 3}, seed=1)
+    return SimulatedDevice().traffic(generator.frames(count))
+
+
+def plain(parts):
+    decoder = FrameStreamDecoder()
+    frames = 0
+    for chunk in parts:
+        for result in decoder.feed_bytes(chunk):
+            if decode_frame(result):
+                frames += 1
+    return frames
+
+
+def driver(parts, hook=None):
+    can = QuickCAN(LoopbackSerial(timeout=0))
+    can.set_stage_hook(hook)
+    frames = 0
+    for chunk in parts:
+        for _ in can._decode_chunk(chunk):
+            frames += 1
+    can.close()
+    return frames
+
+
+def with_hook(parts):
+    totals = {}
+
+    def hook(stage, duration_ns):
+        totals[stage] = totals.get(stage, 0) + duration_ns
+
+    return driver(parts, hook)
+
+
+def per_frame_ns(fn, parts) -> float:
+    start = time.perf_counter()
+    frames = fn(parts)
+    return (time.perf_counter() - start) / frames * 1e9
+
+
+def main():
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    stream = build_stream(count)
+    print(f"{count} frames, best of {REPEAT}")
+    for size in CHUNK_SIZES:
+        parts = [stream[i:i + size] for i in range(0, len(stream), size)]
+        results = {fn: [] for fn in (plain, driver, with_hook)}
+        # Interleaved so every variant sees the same machine noise
+        for _ in range(REPEAT):
+            for fn, timings in results.items():
+                timings.append(per_frame_ns(fn, parts))
+        base = min(results[plain])
+        print(f"{size:>5} byte reads: bare loop {base:>5.0f} ns/frame  "
+              f"QuickCAN + stats {min(results[driver]):>5.0f}  "
+              f"+ stage hook {min(results[with_hook]):>5.0f}")
+
+    stats = ReceiveStats()
+    batches = 1_000_000
+    start = time.perf_counter()
+    for i in range(batches):
+        stats.record_callback(i & 0xFFFF)
+    print(f"record_callback: {(time.perf_counter() - start) / batches * 1e9:.0f} ns per dispatched batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_stream_decoder.py
+#
+# Frames/second decoded from a multi-megabyte byte stream, per-byte feed()
+# vs. chunked feed_bytes().
+#
+#   PYTHONPATH=. python benchmarks/bench_stream_decoder.py [RAW_DUMP_FILE]
+
+import random
+import sys
+import time
+
+from quickcan.protocol import CANFrame, encode_frame, decode_frame
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+STREAM_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 4096  # Typical in_waiting on a busy USB-serial link
+
+
+def build_stream(size: int = STREAM_SIZE, seed: int = 1) -> bytes:
+    rng = random.Random(seed)
+    out = bytearray()
+    while len(out) < size:
+        dlc = rng.randint(0, 8)
+        frame = CANFrame(rng.randint(0, 0x7FF), [rng.randint(0, 255) for _ in range(dlc)])
+        out += encode_frame(frame)
+    return bytes(out)
+
+
+def run_per_byte(stream: bytes, decode: bool = True) -> int:
+    decoder = FrameStreamDecoder()
+    count = 0
+    for b in stream:
+        result = decoder.feed(b)
+        if result and (not decode or decode_frame(result)):
+            count += 1
+    return count
+
+
+def run_chunked(stream: bytes, decode: bool = True, chunk_size: int = CHUNK_SIZE) -> int:
+    decoder = FrameStreamDecoder()
+    count = 0
+    for i in range(0, len(stream), chunk_size):
+        for result in decoder.feed_bytes(stream[i:i + chunk_size]):
+            if not decode or decode_frame(result):
+                count += 1
+    return count
+
+
+def report(name: str, fn, stream: bytes, decode: bool):
+    start = time.perf_counter()
+    frames = fn(stream, decode)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {frames:>9} frames  {elapsed:7.3f} s  "
+          f"{frames / elapsed:>12,.0f} frames/s  {len(stream) / elapsed / 1e6:7.2f} MB/s")
+    return elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as f:
+            stream = f.read()
+    else:
+        stream = build_stream()
+
+    print(f"Stream: {len(stream) / 1e6:.1f} MB")
+    for decode in (False, True):
+        print("\n-- framing + decode_frame --" if decode else "-- framing only --")
+        before = report("feed() per byte", run_per_byte, stream, decode)
+        after = report(f"feed_bytes({CHUNK_SIZE})", run_chunked, stream, decode)
+        print(f"Speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_timestamps.py
+#
+# Per-frame cost of receive timestamps on a simulated stream read in
+# 4 KiB chunks: plain decode (no timestamps), QuickCAN's per-read clock
+# with interpolation, and device timestamps mapped through ClockSync.
+#
+#   PYTHONPATH=. python benchmarks/bench_timestamps.py [FRAME_COUNT]
+
+import logging
+import sys
+import time
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import decode_frame
+from quickcan.simulator import SimulatedDevice, TrafficGenerator, LoopbackSerial
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+CHUNK = 4096
+REPEAT = 9
+
+
+def build_stream(count: int, device_timestamps: bool) -> bytes:
+    device = SimulatedDevice(device_timestamps=device_timestamps)
+    generator = TrafficGenerator(ids={0x100: 1, 0x200: 1, 0x7DF: 1}, dlc_weights={2: 1, 8: 3}, seed=1)
+    return device.traffic(generator.frames(count))
+
+
+def chunks(stream: bytes):
+    return [stream[i:i + CHUNK] for i in range(0, len(stream), CHUNK)]
+
+
+def plain(parts):
+    decoder = FrameStreamDecoder()
+    frames = 0
+    for chunk in parts:
+        for result in decoder.feed_bytes(chunk):
+            if decode_frame(result):
+                frames += 1
+    return frames
+
+
+def timestamped(parts):
+    can = QuickCAN(LoopbackSerial(timeout=0))
+    frames = 0
+    for chunk in parts:
+        for _ in can._decode_chunk(chunk):
+            frames += 1
+    can.close()
+    return frames
+
+
+def per_frame_ns(fn, parts, timings):
+    start = time.perf_counter()
+    frames = fn(parts)
+    elapsed = (time.perf_counter() - start) / frames * 1e9
+    timings.append(elapsed)
+
+
+def main():
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{count} frames in {CHUNK} byte reads, best of {REPEAT}")
+    for name, device_timestamps in (("host read-time stamps", False), ("device stamps + sync", True)):
+        parts = chunks(build_stream(count, device_timestamps))
+        base, stamped = [], []
+        # Interleaved so both see the same machine noise
+        for _ in range(REPEAT):
+            per_frame_ns(plain, parts, base)
+            per_frame_ns(timestamped, parts, stamped)
+        print(f"{name:<24} {min(stamped):>8.0f} ns/frame  vs {min(base):>6.0f} without  "
+              f"(+{min(stamped) - min(base):.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_transmit.py
+#
+# Transmit throughput and send() latency with 1, 4 and 16 threads sending
+# concurrently to a pty-backed simulator in its own process: a locked
+# serial.write() per frame (the old send path, made thread safe) against
+# QuickCAN's transmit queue, and send(wait_ack=True) round trips.
+#
+#   PYTHONPATH=. python benchmarks/bench_transmit.py [FRAMES_PER_RUN]
+
+import contextlib
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import serial
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, encode_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SENDERS = (1, 4, 16)
+
+
+@contextlib.contextmanager
+def simulator(*options):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    proc = subprocess.Popen([sys.executable, "-m", "quickcan.simulator", *options],
+                            stdout=subprocess.PIPE, text=True, env=env)
+    try:
+        yield proc.stdout.readline().strip()
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait()
+
+
+def run_senders(send, senders: int, frames: int):
+    """Run `senders` threads sharing `frames` sends; returns (start time, sorted send() latencies in us)"""
+    latencies = [[] for _ in range(senders)]
+    per_sender = frames // senders
+
+    def worker(n):
+        record = latencies[n].append
+        clock = time.perf_counter
+        for i in range(per_sender):
+            start = clock()
+            send(0x100 + n, [i & 0xFF] * 8)
+            record((clock() - start) * 1e6)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(senders)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return start, sorted(x for part in latencies for x in part)
+
+
+def percentile(values, pct):
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+def report(name, senders, frames, elapsed, latencies, writes):
+    print(f"{name:<14} {senders:>7} {frames / elapsed:>10,.0f} {percentile(latencies, 50):>9.1f} "
+          f"{percentile(latencies, 99):>9.1f} {frames / max(writes, 1):>10.1f}")
+
+
+def direct(port: str, senders: int, frames: int):
+    ser = serial.Serial(port, 115200, timeout=0.1)
+    lock = threading.Lock()
+    writes = 0
+
+    def send(can_id, data):
+        nonlocal writes
+        packet = encode_frame(CANFrame(can_id, data), cmd=Command.CAN_SEND)
+        with lock:
+            ser.write(packet)
+            writes += 1
+
+    start, latencies = run_senders(send, senders, frames)
+    ser.flush()
+    elapsed = time.perf_counter() - start
+    ser.close()
+    report("locked write", senders, len(latencies), elapsed, latencies, writes)
+
+
+def queued(port: str, senders: int, frames: int):
+    can = QuickCAN(port)
+    start, latencies = run_senders(can.send, senders, frames)
+    can.flush()
+    elapsed = time.perf_counter() - start
+    report("tx queue", senders, len(latencies), elapsed, latencies, can.tx_queue.writes)
+    can.close()
+
+
+def acked(port: str, senders: int, frames: int):
+    can = QuickCAN(port)
+    can.start()
+    start, latencies = run_senders(lambda can_id, data: can.send(can_id, data, wait_ack=True),
+                                   senders, frames // 10)
+    elapsed = time.perf_counter() - start
+    report("tx queue + ACK", senders, len(latencies), elapsed, latencies, can.tx_queue.writes)
+    can.close()
+
+
+def main():
+    if not hasattr(os, "openpty"):
+        sys.exit("pty-backed simulators need a POSIX system")
+    logging.getLogger("quickcan").setLevel(logging.WARNING)
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 32_000
+    print(f"{frames} frames per run (ACK runs: {frames // 10})")
+    print(f"{'path':<14} {'senders':>7} {'frames/s':>10} {'p50 us':>9} {'p99 us':>9} {'frm/write':>10}")
+    for runner, options in ((direct, ()), (queued, ()), (acked, ("--ack-sends",))):
+        for senders in SENDERS:
+            with simulator(*options) as port:
+                runner(port, senders, frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,79 @@
 # cli/quickcan_cli.py
 
 import argparse
+import logging
+import time
+from quickcan.capture import CaptureWriter, replay
 from quickcan.driver import QuickCAN
-from quickcan.protocol import Command
+from quickcan.protocol import Command, PROTOCOL_VERSION_FD
+from quickcan.server import QuickCANServer, DEFAULT_SOCKET
+from quickcan.utils.log import configure_logging
 
 def on_receive(cmd, frame):
     print(f"\n📥 Received:")
     print(f"  Command    : {cmd.name} (0x{cmd.value:02X})")
     print(f"  CAN ID     : 0x{frame.can_id:X}")
-    print(f"  Data       : {frame.data}")
+    print(f"  Data       : {list(frame.data)}")
     print(f"  Extended ID: {frame.extended}")
 
+def wait_for_interrupt(can, show_stats: bool):
+    """Sleep until Ctrl+C, printing a stats line per second if asked"""
+    previous = can.stats.snapshot()
+    while True:
+        time.sleep(1)
+        if show_stats:
+            print(f"📊 {can.stats.summary(previous)}")
+            previous = can.stats.snapshot()
+
+def negotiate_fd(can):
+    version = can.negotiate_protocol()
+    if version != PROTOCOL_VERSION_FD:
+        print(f"⚠️ Adapter doesn't support CAN FD, using protocol version {version}")
+    return version == PROTOCOL_VERSION_FD
+
+def serve(args):
+    """Own the adapter and share its traffic with local clients until Ctrl+C"""
+    can = QuickCAN(args.port)
+    if args.fd:
+        negotiate_fd(can)
+    server = QuickCANServer(can, args.socket, client_buffer=args.client_buffer, mode=args.socket_mode)
+    server.start()
+    print(f"📡 Serving {args.port} on {args.socket} (clients: channel='unix:{args.socket}'). Press Ctrl+C to stop.")
+    try:
+        wait_for_interrupt(can, args.stats)
+    except KeyboardInterrupt:
+        print(f"\n👋 Served {server.frames_sent} frames ({server.sends_dropped} client SENDs dropped)")
+    finally:
+        server.close()
+        can.close()
+
 def main():
     parser = argparse.ArgumentParser(description="QuickCAN CLI Tool")
+    parser.add_argument('mode', nargs='?', choices=['serve'],
+                        help="serve: own the port and share its traffic over a Unix socket")
     parser.add_argument('--port', required=True, help="Serial port (e.g., COM3 or /dev/ttyUSB0)")
     
     parser.add_argument('--send', nargs='+', help="Send CAN frame: ID [DATA_BYTES...]")
     parser.add_argument('--recv', action='store_true', help="Receive mode")
+    parser.add_argument('--record', metavar='FILE', help="Record received CAN frames to a capture file")
+    parser.add_argument('--replay', metavar='FILE', help="Send the CAN frames of a capture file")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Replay timing factor (default 1.0, 0 = as fast as possible)")
+    parser.add_argument('--on-change', action='store_true',
+                        help="Only receive frames whose data changed since the last one of their ID")
+    parser.add_argument('--stats', action='store_true',
+                        help="Print receive statistics every second (alone: receive without printing frames)")
+    parser.add_argument('--log-level', default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="quickcan log level (default INFO)")
+    parser.add_argument('--trace', action='store_true',
+                        help="Log sent and received frames (sampled, at most 100 per second)")
+    parser.add_argument('--fd', action='store_true',
+                        help="Switch the adapter to CAN FD (protocol version 3); --send sends FD frames with BRS")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f"serve: socket path (default {DEFAULT_SOCKET})")
+    parser.add_argument('--socket-mode', type=lambda v: int(v, 8), default=0o600,
+                        help="serve: socket permissions, octal (default 600: owner only)")
+    parser.add_argument('--client-buffer', type=int, default=1 << 20,
+                        help="serve: unsent bytes held per client before its frames are dropped")
 
     # Extra commands
     parser.add_argument('--heartbeat', action='store_true', help="Send heartbeat frame")
@@ -28,15 +85,23 @@ def main():
     parser.add_argument('--config-set', nargs='+', help="Set config: KEY_ID VALUE1 [VALUE2 ...]")
 
     args = parser.parse_args()
+    configure_logging(getattr(logging, args.log_level), trace=args.trace)
+
+    if args.mode == 'serve':
+        serve(args)
+        return
 
     can = QuickCAN(args.port)
     can.set_receive_callback(on_receive)
+    fd = args.fd and negotiate_fd(can)
+    if args.on_change:
+        can.set_on_change()
 
     # Command mode
     if args.send:
         can_id = int(args.send[0], 16 if args.send[0].startswith("0x") else 10)
         data = [int(b, 16) for b in args.send[1:]]
-        can.send(can_id, data)
+        can.send(can_id, data, fd=fd, bitrate_switch=fd)
         print(f"✅ Sent CAN frame: ID=0x{can_id:X}, Data={data}")
 
     if args.heartbeat:
@@ -69,12 +134,37 @@ def main():
         can.send_config_set(key_id, values)
         print(f"✅ Sent CONFIG SET: key={key_id}, values={values}")
 
+    if args.replay:
+        speed = args.replay_speed or None
+        try:
+            sent = replay(can, args.replay, speed=speed)
+            print(f"✅ Replayed {sent} CAN frames from {args.replay}")
+        except KeyboardInterrupt:
+            print("\n👋 Replay interrupted")
+
+    if args.record:
+        writer = CaptureWriter(args.record, fd=fd)
+        can.set_receive_batch_callback(writer.write_batch)
+        # The capture replaces the per-frame printout
+        can.set_receive_callback(None)
+        print(f"⏺️ Recording CAN frames to {args.record}. Press Ctrl+C to stop.")
+        can.start()
+        try:
+            wait_for_interrupt(can, args.stats)
+        except KeyboardInterrupt:
+            can.stop()
+            writer.close()
+            print(f"\n👋 Recorded {writer.count} frames")
+
     # Listen for incoming frames
-    if args.recv:
+    elif args.recv or args.stats:
+        if not args.recv:
+            # Stats only: count frames without printing each one
+            can.set_receive_callback(None)
         print("🔍 Listening for CAN frames. Press Ctrl+C to exit.")
+        can.start()
         try:
-            while True:
-                can.receive()
+            wait_for_interrupt(can, args.stats)
         except KeyboardInterrupt:
             print("\n👋 Exiting...")
 
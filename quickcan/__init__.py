@@ -1,7 +1,7 @@
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="🔹 [%(asctime)s] [%(levelname)s] %(name)s: %(message)s",
-    datefmt="%H:%M:%S",
-)
\ No newline at end of file
+from quickcan.utils.log import configure_logging
+
+# Library logging: records go nowhere until the application configures
+# logging, or calls configure_logging()
+logging.getLogger(__name__).addHandler(logging.NullHandler())
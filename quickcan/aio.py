@@ -0,0 +1,190 @@
+# quickcan/aio.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Deque, Hashable, List, Optional
+
+from quickcan.protocol import encode_frame, decode_frame, response_key, CANFrame, Command, PROTOCOL_VERSION
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+logger = logging.getLogger(__name__)
+
+class QuickCANProtocol(asyncio.Protocol):
+    """asyncio Protocol feeding received bytes through FrameStreamDecoder"""
+
+    def __init__(self, owner: "AsyncQuickCAN"):
+        self._owner = owner
+        self.decoder = FrameStreamDecoder()
+
+    def connection_made(self, transport):
+        self._owner._connection_made(transport)
+
+    def data_received(self, data: bytes):
+        on_frame = self._owner._on_frame
+        timestamp = time.time()
+        for result in self.decoder.feed_bytes(data):
+            decoded = decode_frame(result, timestamp)
+            if decoded:
+                on_frame(*decoded)
+
+    def connection_lost(self, exc):
+        self._owner._connection_lost(exc)
+
+    def pause_writing(self):
+        self._owner._pause_writing()
+
+    def resume_writing(self):
+        self._owner._resume_writing()
+
+
+class AsyncQuickCAN:
+    """
+    QuickCAN adapter driven by an asyncio event loop, one of many per thread.
+
+    Use `await AsyncQuickCAN.open(port)` for a serial port, or attach
+    `can.protocol` to any other asyncio transport (socket, in-memory).
+    Responses to ping(), config_get() and device_info() resolve their
+    awaitables; CAN traffic is read with `async for frame in can.frames()`.
+    Other unsolicited commands go to `command_callback(cmd, frame)`.
+    """
+
+    def __init__(self, protocol_version: int = PROTOCOL_VERSION, max_queue: int = 4096):
+        self.protocol_version = protocol_version
+        self.protocol = QuickCANProtocol(self)
+        self.command_callback: Optional[Callable[[Command, CANFrame], None]] = None
+        self.dropped_frames = 0
+        self._frames: asyncio.Queue = asyncio.Queue(max_queue)
+        self._pending: Dict[Hashable, Deque[asyncio.Future]] = {}
+        self._transport: Optional[asyncio.BaseTransport] = None
+        self._writer: Optional[asyncio.WriteTransport] = None
+        self._write_ready = asyncio.Event()
+        self._write_ready.set()
+        self._closed = asyncio.Event()
+
+    @classmethod
+    async def open(cls, port: str, baudrate: int = 115200, **kwargs) -> "AsyncQuickCAN":
+        """Open a serial port and attach non-blocking pipe transports to its fd"""
+        import serial
+
+        can = cls(**kwargs)
+        ser = serial.Serial(port, baudrate, timeout=0)
+        loop = asyncio.get_running_loop()
+        await loop.connect_read_pipe(lambda: can.protocol, ser)
+        can._writer, _ = await loop.connect_write_pipe(lambda: can.protocol, ser)
+        logger.info("AsyncQuickCAN initialized on port %s @ %d bps", port, baudrate)
+        return can
+
+    # --- Transport callbacks ---
+
+    def _connection_made(self, transport):
+        self._transport = self._transport or transport
+        if self._writer is None and isinstance(transport, asyncio.WriteTransport):
+            self._writer = transport
+
+    def _connection_lost(self, exc):
+        self._closed.set()
+        for waiters in self._pending.values():
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_exception(ConnectionError("QuickCAN connection lost"))
+        self._pending.clear()
+
+    def _pause_writing(self):
+        self._write_ready.clear()
+
+    def _resume_writing(self):
+        self._write_ready.set()
+
+    def _on_frame(self, cmd: Command, frame: CANFrame):
+        waiters = self._pending.get(response_key(cmd, frame))
+        while waiters:
+            fut = waiters.popleft()
+            if not fut.done():
+                fut.set_result(frame)
+                return
+
+        if cmd == Command.CAN_SEND:
+            if self._frames.full():
+                self._frames.get_nowait()  # Drop oldest
+                self.dropped_frames += 1
+            self._frames.put_nowait(frame)
+        elif self.command_callback:
+            self.command_callback(cmd, frame)
+
+    # --- Sending ---
+
+    async def _write(self, packet: bytes):
+        if self._writer is None or self._closed.is_set():
+            raise ConnectionError("QuickCAN is not connected")
+        self._writer.write(packet)
+        await self._write_ready.wait()
+
+    async def send(self, can_id: int, data: List[int], extended: bool = False):
+        """Send standard CAN frame (CMD_CAN_SEND)"""
+        frame = CANFrame(can_id=can_id, data=data, extended=extended)
+        await self._write(encode_frame(frame, cmd=Command.CAN_SEND, version=self.protocol_version))
+
+    async def request(self, cmd: Command, data: List[int] = (), timeout: float = 1.0) -> CANFrame:
+        """Send a command frame and wait for the device's matching response"""
+        frame = CANFrame(0x00, list(data))
+        fut = asyncio.get_running_loop().create_future()
+        waiters = self._pending.setdefault(response_key(cmd, frame), deque())
+        waiters.append(fut)
+        try:
+            await self._write(encode_frame(frame, cmd=cmd, version=self.protocol_version))
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            if not fut.done() or fut.cancelled():
+                try:
+                    waiters.remove(fut)
+                except ValueError:
+                    pass
+
+    async def ping(self, timeout: float = 1.0) -> CANFrame:
+        return await self.request(Command.PING, timeout=timeout)
+
+    async def device_info(self, timeout: float = 1.0) -> CANFrame:
+        return await self.request(Command.DEVICE_INFO, timeout=timeout)
+
+    async def config_get(self, key_id: int, timeout: float = 1.0) -> bytes:
+        """Read a config value; returns the data following the echoed key"""
+        response = await self.request(Command.CONFIG_GET, [key_id], timeout=timeout)
+        return response.data[1:]
+
+    async def config_set(self, key_id: int, values: List[int], timeout: float = 1.0) -> CANFrame:
+        return await self.request(Command.CONFIG_SET, [key_id] + list(values), timeout=timeout)
+
+    # --- Receiving ---
+
+    async def recv(self, timeout: Optional[float] = None) -> Optional[CANFrame]:
+        """Next received CAN frame, or None on timeout"""
+        try:
+            return await asyncio.wait_for(self._frames.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def frames(self) -> AsyncIterator[CANFrame]:
+        """Iterate over received CAN frames until the connection closes"""
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            while True:
+                if not self._frames.empty():
+                    yield self._frames.get_nowait()
+                    continue
+                getter = asyncio.ensure_future(self._frames.get())
+                await asyncio.wait((getter, closed), return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    return
+                yield getter.result()
+        finally:
+            closed.cancel()
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+        if self._writer is not None and self._writer is not self._transport:
+            self._writer.close()
+        logger.info("AsyncQuickCAN closed")
@@ -0,0 +1,107 @@
+# quickcan/batch.py
+
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from quickcan.protocol import CANFrame, Command, decode_fields, _make_frame
+
+__all__ = ["FrameBatch", "decode_batch"]
+
+
+class FrameBatch:
+    """
+    Columnar storage for many frames.
+
+    Each field lives in its own contiguous array (`can_ids`, `flags`,
+    `dlcs`, `commands`, `timestamps`) and payloads share one bytearray
+    with a fixed `payload_size` stride, zero padded. All columns support
+    the buffer protocol, so NumPy can wrap them without copying
+    (see `to_numpy()`).
+    """
+
+    __slots__ = ("can_ids", "flags", "dlcs", "commands", "timestamps", "payloads", "payload_size")
+
+    def __init__(self, payload_size: int = 8):
+        self.can_ids = array("I")
+        self.flags = array("H")
+        self.dlcs = array("B")
+        self.commands = array("B")
+        self.timestamps = array("d")
+        self.payloads = bytearray()
+        self.payload_size = payload_size
+
+    def __len__(self):
+        return len(self.can_ids)
+
+    def append(self, can_id: int, data: bytes, flags: int = 0,
+               cmd: Command = Command.CAN_SEND, timestamp: float = 0.0):
+        size = len(data)
+        if size > self.payload_size:
+            raise ValueError(f"{size} data bytes exceed payload_size={self.payload_size}")
+        self.can_ids.append(can_id)
+        self.flags.append(flags)
+        self.dlcs.append(size)
+        self.commands.append(cmd)
+        self.timestamps.append(timestamp)
+        self.payloads += data
+        if size < self.payload_size:
+            self.payloads += bytes(self.payload_size - size)
+
+    def append_frame(self, frame: CANFrame, cmd: Command = Command.CAN_SEND):
+        flags = frame.flags | 0x80 if frame.extended else frame.flags
+        self.append(frame.can_id, frame.data, flags, cmd, frame.timestamp)
+
+    def append_raw(self, buf: bytes, timestamp: float = 0.0) -> Optional[Command]:
+        """Decode a raw frame straight into the columns; returns its command"""
+        fields = decode_fields(buf)
+        if fields is None:
+            return None
+        cmd, can_id, flags, data, _ = fields
+        self.append(can_id, data, flags, cmd, timestamp)
+        return cmd
+
+    def extend(self, frames: Iterable[CANFrame], cmd: Command = Command.CAN_SEND):
+        for frame in frames:
+            self.append_frame(frame, cmd)
+
+    def data(self, index: int) -> bytes:
+        start = index * self.payload_size
+        return bytes(self.payloads[start:start + self.dlcs[index]])
+
+    def __getitem__(self, index: int) -> CANFrame:
+        if index < 0:
+            index += len(self)
+        flags = self.flags[index]
+        return _make_frame(self.can_ids[index], self.data(index), bool(flags & 0x80),
+                           flags, self.timestamps[index])
+
+    def __iter__(self) -> Iterator[CANFrame]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def clear(self):
+        for column in (self.can_ids, self.flags, self.dlcs, self.commands, self.timestamps):
+            del column[:]
+        self.payloads.clear()
+
+    def to_numpy(self) -> dict:
+        """Zero-copy NumPy views of the columns (requires numpy)"""
+        import numpy as np
+
+        return {
+            "can_id": np.frombuffer(self.can_ids, dtype=np.uint32),
+            "flags": np.frombuffer(self.flags, dtype=np.uint16),
+            "dlc": np.frombuffer(self.dlcs, dtype=np.uint8),
+            "command": np.frombuffer(self.commands, dtype=np.uint8),
+            "timestamp": np.frombuffer(self.timestamps, dtype=np.float64),
+            "data": np.frombuffer(self.payloads, dtype=np.uint8).reshape(-1, self.payload_size),
+        }
+
+
+def decode_batch(raw_frames: Iterable[bytes], payload_size: int = 8) -> FrameBatch:
+    """Decode raw frames into a FrameBatch, skipping invalid ones"""
+    batch = FrameBatch(payload_size)
+    append_raw = batch.append_raw
+    for raw in raw_frames:
+        append_raw(raw)
+    return batch
@@ -0,0 +1,235 @@
+# quickcan/capture.py
+
+import mmap
+import struct
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from quickcan.batch import FrameBatch
+from quickcan.protocol import CANFrame, Command, _make_frame
+
+__all__ = ["CaptureWriter", "CaptureReader", "replay", "FILE_HEADER", "RECORD", "RECORD_FD"]
+
+MAGIC = b"QCAP"
+FORMAT_VERSION = 1
+# Format 2 holds CAN FD frames
+FORMAT_VERSION_FD = 2
+
+# magic, format version, record size
+FILE_HEADER = struct.Struct("<4sHH")
+# timestamp, can_id, flags, dlc, data (zero padded), 2 pad bytes: 24 bytes per frame
+RECORD = struct.Struct("<dIBB8s2x")
+MAX_DATA = 8
+# timestamp, can_id, flags (with the FD bits), length, data (zero padded), 1 pad byte: 80 bytes per frame
+RECORD_FD = struct.Struct("<dIHB64sx")
+MAX_DATA_FD = 64
+# Record layout, data bytes and flags limit of each format version
+_FORMATS = {FORMAT_VERSION: (RECORD, MAX_DATA, 0xFF), FORMAT_VERSION_FD: (RECORD_FD, MAX_DATA_FD, 0xFFFF)}
+
+
+class CaptureWriter:
+    """
+    Append frames to a capture log of fixed-size little-endian records.
+
+    Records are packed into a preallocated buffer and written out in
+    blocks of `block_records`, so recording costs one struct.pack_into per
+    frame plus one write() per block. Pass `writer.write_batch` to
+    `QuickCAN.set_receive_batch_callback()` to record from the receive path.
+    With `fd`, records hold CAN FD frames (80 instead of 24 bytes each);
+    classic captures reject them with ValueError.
+    """
+
+    def __init__(self, path: str, block_records: int = 4096, fd: bool = False):
+        self.path = path
+        self.fd = fd
+        self.count = 0
+        version = FORMAT_VERSION_FD if fd else FORMAT_VERSION
+        self._record, self.max_data, self._max_flags = _FORMATS[version]
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(MAGIC, version, self._record.size))
+        self._block = bytearray(self._record.size * block_records)
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _check(self, size: int, flags: int):
+        if size > self.max_data:
+            raise ValueError(f"{size} data bytes exceed the {self.max_data} byte capture record")
+        if flags > self._max_flags:
+            raise ValueError("CAN FD frames need a CaptureWriter(fd=True) capture")
+
+    def write(self, can_id: int, data: bytes, flags: int = 0, timestamp: Optional[float] = None):
+        size = len(data)
+        if size > self.max_data or flags > self._max_flags:
+            self._check(size, flags)
+        with self._lock:
+            self._record.pack_into(self._block, self._offset, time.time() if timestamp is None else timestamp,
+                                   can_id, flags, size, data)
+            self._offset += self._record.size
+            self.count += 1
+            if self._offset == len(self._block):
+                self._flush_block()
+
+    def write_frame(self, frame: CANFrame):
+        flags = frame.flags | 0x80 if frame.extended else frame.flags
+        self.write(frame.can_id, frame.data, flags, frame.timestamp or None)
+
+    def write_batch(self, batch: List[Tuple[Command, CANFrame]]):
+        """Record the CAN_SEND frames of a dispatched (cmd, frame) batch"""
+        now = time.time()
+        pack_into = self._record.pack_into
+        size = self._record.size
+        max_data = self.max_data
+        max_flags = self._max_flags
+        block = self._block
+        with self._lock:
+            for cmd, frame in batch:
+                if cmd != Command.CAN_SEND:
+                    continue
+                data = frame.data
+                flags = frame.flags | 0x80 if frame.extended else frame.flags
+                if len(data) > max_data or flags > max_flags:
+                    self._check(len(data), flags)
+                pack_into(block, self._offset, frame.timestamp or now, frame.can_id, flags, len(data), data)
+                self._offset += size
+                self.count += 1
+                if self._offset == len(block):
+                    self._flush_block()
+
+    def _flush_block(self):
+        self._file.write(memoryview(self._block)[:self._offset])
+        self._offset = 0
+
+    def flush(self):
+        with self._lock:
+            self._flush_block()
+            self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CaptureReader:
+    """
+    Memory-mapped view of a capture log.
+
+    `records()` unpacks (timestamp, can_id, flags, dlc, data) tuples
+    straight from the mapping, without reading the file into memory;
+    iterating the reader yields CANFrames. Classic and CAN FD (`fd`)
+    captures are both read. A record cut short by an interrupted recording
+    is ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not a QuickCAN capture") from None
+        if len(self._mmap) < FILE_HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a QuickCAN capture")
+        magic, version, record_size = FILE_HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version not in _FORMATS or record_size != _FORMATS[version][0].size:
+            self.close()
+            raise ValueError(f"{path} is not a QuickCAN capture (format {version})")
+        self.fd = version == FORMAT_VERSION_FD
+        self._record, self.max_data, _ = _FORMATS[version]
+        self._count = (len(self._mmap) - FILE_HEADER.size) // self._record.size
+
+    def __len__(self):
+        return self._count
+
+    def records(self) -> Iterator[Tuple[float, int, int, int, bytes]]:
+        view = memoryview(self._mmap)[FILE_HEADER.size:FILE_HEADER.size + self._count * self._record.size]
+        with view:
+            yield from self._record.iter_unpack(view)
+
+    def __iter__(self) -> Iterator[CANFrame]:
+        for timestamp, can_id, flags, dlc, data in self.records():
+            yield _make_frame(can_id, data[:dlc], bool(flags & 0x80), flags, timestamp)
+
+    def to_batch(self) -> FrameBatch:
+        """Load the whole capture into a columnar FrameBatch"""
+        batch = FrameBatch(self.max_data)
+        append = batch.append
+        for timestamp, can_id, flags, dlc, data in self.records():
+            append(can_id, data[:dlc], flags, Command.CAN_SEND, timestamp)
+        return batch
+
+    def close(self):
+        if hasattr(self, "_mmap"):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(can, source: Union[str, Iterable[CANFrame]], speed: Optional[float] = 1.0,
+           stop: Optional[threading.Event] = None, chunk: int = 256) -> int:
+    """
+    Send captured frames through `can` (a QuickCAN); returns the number sent.
+
+    With a `speed` factor the original inter-frame timing is reproduced
+    (2.0 replays twice as fast) via can.send(); with `speed=None` frames
+    are sent as fast as possible, `chunk` at a time through send_many().
+    `source` is a capture file path, a CaptureReader or any CANFrame iterable.
+    Returns once the sent frames have been written to the port.
+    """
+    reader = CaptureReader(source) if isinstance(source, str) else None
+    frames = reader if reader is not None else source
+    sent = 0
+    try:
+        if speed is None:
+            pending = []
+            for frame in frames:
+                pending.append(frame)
+                if len(pending) == chunk:
+                    if stop is not None and stop.is_set():
+                        break
+                    can.send_many(pending)
+                    sent += len(pending)
+                    pending = []
+            else:
+                if pending:
+                    can.send_many(pending)
+                    sent += len(pending)
+            return sent
+
+        first = None
+        start = time.perf_counter()
+        for frame in frames:
+            if first is None:
+                first = frame.timestamp
+            delay = start + (frame.timestamp - first) / speed - time.perf_counter()
+            if delay > 0:
+                if stop is not None:
+                    if stop.wait(delay):
+                        break
+                else:
+                    time.sleep(delay)
+            elif stop is not None and stop.is_set():
+                break
+            can.send(frame.can_id, frame.data, extended=frame.extended, fd=frame.is_fd,
+                     bitrate_switch=frame.bitrate_switch)
+            sent += 1
+        return sent
+    finally:
+        can.flush()
+        if reader is not None:
+            reader.close()
@@ -2,9 +2,10 @@
 # quickcan/commands/heartbeat.py
 
 import time
-from quickcan.protocol import CANFrame, CMD_HEARTBEAT, encode_frame
+from quickcan.commands.scheduler import PeriodicScheduler, PeriodicTask
+from quickcan.protocol import CANFrame, Command, PROTOCOL_VERSION, encode_frame
 
-def build_heartbeat_frame(counter: int = 0) -> bytes:
+def build_heartbeat_frame(counter: int = 0, version: int = PROTOCOL_VERSION) -> bytes:
     """
     Build a heartbeat frame with an incrementing counter (optional).
     The frame doesn't carry CAN ID meaning; it's a protocol command.
@@ -14,20 +15,30 @@ def build_heartbeat_frame(counter: int = 0) -> bytes:
         data=[counter & 0xFF],
         extended=False
     )
-    return encode_frame(frame, cmd=CMD_HEARTBEAT)
+    return encode_frame(frame, cmd=Command.HEARTBEAT, version=version)
+
+def _next_counter(frame: CANFrame) -> CANFrame:
+    return CANFrame(frame.can_id, [(frame.data[0] + 1) & 0xFF])
+
+def heartbeat_task(scheduler: PeriodicScheduler, interval: float = 1.0) -> PeriodicTask:
+    """
+    Send HEARTBEAT every `interval` seconds on `scheduler`'s timer thread,
+    with a counter counting up from 0.
+    """
+    # The counter is advanced before each send, including the first
+    return scheduler.add(CANFrame(0x00000000, [0xFF]), interval, cmd=Command.HEARTBEAT, modifier=_next_counter)
 
 def send_heartbeat(serial_port, interval=1.0):
     """
-    Continuously send heartbeat packets every `interval` seconds.
+    Continuously send heartbeat packets every `interval` seconds, until Ctrl+C.
     `serial_port` must be an open pyserial Serial instance.
     """
-    counter = 0
+    scheduler = PeriodicScheduler(serial_port.write)
+    task = heartbeat_task(scheduler, interval)
     try:
         while True:
-            packet = build_heartbeat_frame(counter)
-            serial_port.write(packet)
-            print(f"💓 Sent heartbeat #{counter}")
-            counter = (counter + 1) % 256
-            time.sleep(interval)
+            time.sleep(3600)
     except KeyboardInterrupt:
-        print("Heartbeat sending stopped.")
+        print(f"Heartbeat sending stopped after {task.sent} heartbeats.")
+    finally:
+        scheduler.close()
@@ -0,0 +1,232 @@
+# quickcan/commands/scheduler.py
+#
+# Cyclic transmission: every periodic task of an adapter (cyclic CAN
+# frames, heartbeats) lives in one heap ordered by due time, served by a
+# single timer thread. Packets are encoded when a task is created or
+# modified, not per send, and the packets of all tasks due within the same
+# tick (`resolution`) leave in one write.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from quickcan.protocol import encode_frame, CANFrame, Command, PROTOCOL_VERSION
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["PeriodicScheduler", "PeriodicTask"]
+
+
+class PeriodicTask:
+    """
+    A frame, or a cycle of frames sent one per period, created by
+    PeriodicScheduler.add(). `modifier(frame)` is called (on the timer
+    thread) before each send and returns the frame to send, which is also
+    what it gets passed next time round; None sends the frame unchanged.
+    """
+    __slots__ = ("period", "duration", "cmd", "modifier", "sent", "skipped",
+                 "_scheduler", "_cycle", "_index", "_end", "_entry")
+
+    def __init__(self, scheduler: "PeriodicScheduler", frames: Sequence[CANFrame], period: float,
+                 cmd: Command, duration: Optional[float], modifier: Optional[Callable[[CANFrame], Optional[CANFrame]]]):
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.duration = duration
+        self.cmd = cmd
+        self.modifier = modifier
+        self.sent = 0
+        self.skipped = 0  # Cycles missed while the timer thread was held up
+        self._scheduler = scheduler
+        self._index = 0
+        self._end: Optional[float] = None
+        self._entry: Optional[Tuple[float, int, "PeriodicTask"]] = None
+        self._set_frames(frames)
+
+    @property
+    def frames(self) -> List[CANFrame]:
+        return list(self._cycle[0])
+
+    @property
+    def running(self) -> bool:
+        return self._entry is not None
+
+    def start(self):
+        """(Re)start sending, the first frame right away; `duration` counts from now"""
+        self._scheduler._schedule(self)
+
+    def stop(self):
+        self._scheduler._unschedule(self)
+
+    def modify(self, frames: Union[CANFrame, Sequence[CANFrame]]):
+        """Replace the frames sent, keeping the timing"""
+        with self._scheduler._cond:
+            self._set_frames(frames)
+
+    def _set_frames(self, frames: Union[CANFrame, Sequence[CANFrame]]):
+        frames = [frames] if isinstance(frames, CANFrame) else list(frames)
+        if not frames:
+            raise ValueError("A periodic task needs at least one frame")
+        version = self._scheduler.protocol_version
+        packets = [encode_frame(frame, cmd=self.cmd, version=version) for frame in frames]
+        # One assignment, so the timer thread (which doesn't take the lock)
+        # always reads frames and packets of the same length
+        self._cycle = (frames, packets)
+
+    def _next_packet(self) -> bytes:
+        frames, packets = self._cycle
+        index = self._index % len(frames)
+        self._index = index + 1
+        self.sent += 1
+        if self.modifier is None:
+            return packets[index]
+        frame = self.modifier(frames[index])
+        if frame is None:
+            return packets[index]
+        frames[index] = frame
+        packet = packets[index] = encode_frame(frame, cmd=self.cmd, version=self._scheduler.protocol_version)
+        return packet
+
+
+class PeriodicScheduler:
+    """
+    Runs PeriodicTasks on one "quickcan-periodic" thread, started with the
+    first task. Tasks keep their phase (due times advance by whole
+    periods); cycles missed while writes block are skipped, not sent late
+    in a burst. `write(packet)` is the adapter's transmit path, such as
+    QuickCAN._write, so backpressure from a full transmit queue holds the
+    timer thread rather than growing a backlog.
+    """
+
+    def __init__(self, write: Callable[[bytes], object], protocol_version: int = PROTOCOL_VERSION,
+                 resolution: float = 0.001):
+        self.write = write
+        self.protocol_version = protocol_version
+        self.resolution = resolution
+        self.active = 0
+        self.ticks = 0
+        self.packets = 0
+        self.errors = 0
+        self.max_lateness = 0.0  # Worst delay of a tick behind its earliest due time, in seconds
+        self._heap: List[Tuple[float, int, PeriodicTask]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def __len__(self):
+        return self.active
+
+    def add(self, frames: Union[CANFrame, Sequence[CANFrame]], period: float, cmd: Command = Command.CAN_SEND,
+            duration: Optional[float] = None, modifier: Optional[Callable[[CANFrame], Optional[CANFrame]]] = None,
+            start: bool = True) -> PeriodicTask:
+        """
+        Send `frames` (one per period, cycling) every `period` seconds, for
+        `duration` seconds or until the task is stopped.
+        """
+        task = PeriodicTask(self, frames, period, cmd, duration, modifier)
+        if start:
+            self._schedule(task)
+        return task
+
+    def close(self, timeout: float = 1.0):
+        """Stop every task and the timer thread"""
+        with self._cond:
+            self._closed = True
+            for _, _, task in self._heap:
+                task._entry = None
+            self._heap.clear()
+            self.active = 0
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _schedule(self, task: PeriodicTask):
+        now = time.monotonic()
+        with self._cond:
+            if self._closed:
+                raise OSError("periodic scheduler is closed")
+            if task._entry is None:
+                self.active += 1
+            task._end = None if task.duration is None else now + task.duration
+            # Any previous entry stays in the heap, ignored, until it comes up
+            task._entry = (now, next(self._seq), task)
+            heapq.heappush(self._heap, task._entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quickcan-periodic", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _unschedule(self, task: PeriodicTask):
+        with self._cond:
+            if task._entry is not None:
+                task._entry = None
+                self.active -= 1
+
+    def _due_tasks(self) -> Optional[List[PeriodicTask]]:
+        """Wait for the next tick and reschedule its tasks; None once closed"""
+        heap = self._heap
+        cond = self._cond
+        with cond:
+            while True:
+                if self._closed:
+                    return None
+                if not heap:
+                    cond.wait()
+                    continue
+                wait = heap[0][0] - time.monotonic()
+                if wait <= 0:
+                    break
+                cond.wait(wait)
+            now = time.monotonic()
+            horizon = now + self.resolution
+            lateness = now - heap[0][0]
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+            tasks = []
+            while heap and heap[0][0] <= horizon:
+                entry = heapq.heappop(heap)
+                due, _, task = entry
+                if task._entry is not entry:
+                    continue  # Stopped or restarted since
+                tasks.append(task)
+                period = task.period
+                due += period
+                if due < now:
+                    missed = int((now - due) // period) + 1
+                    task.skipped += missed
+                    due += missed * period
+                if task._end is not None and due > task._end:
+                    task._entry = None
+                    self.active -= 1
+                    continue
+                task._entry = (due, next(self._seq), task)
+                heapq.heappush(heap, task._entry)
+            return tasks
+
+    def _run(self):
+        while True:
+            tasks = self._due_tasks()
+            if tasks is None:
+                return
+            # Modifiers run outside the lock, so they may start and stop tasks
+            packets = []
+            for task in tasks:
+                try:
+                    packets.append(task._next_packet())
+                except Exception:
+                    logger.exception("Modifier of periodic task failed, stopping it")
+                    task.stop()
+            if not packets:
+                continue
+            try:
+                self.write(packets[0] if len(packets) == 1 else b"".join(packets))
+            except Exception:
+                self.errors += 1
+                logger.exception("Periodic write of %d packets failed", len(packets))
+                continue
+            self.ticks += 1
+            self.packets += len(packets)
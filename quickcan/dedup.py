@@ -0,0 +1,117 @@
+# quickcan/dedup.py
+#
+# On-change delivery: cyclic traffic mostly repeats the last payload of its
+# CAN ID, so only CAN frames whose data differs from the last one delivered
+# for that ID reach the callbacks. A repeat is recognised from its raw bytes
+# (as produced by FrameStreamDecoder), before it is validated or decoded:
+# one dict probe on the leading header bytes and one bytes comparison.
+
+from typing import Dict, List, Mapping, Optional
+
+from quickcan.protocol import CANFrame, Command, _make_frame
+
+__all__ = ["ChangeFilter"]
+
+# Lookup keys carry the extended flag above the 32-bit CAN ID field (as in filters.py)
+_EXTENDED_KEY = 1 << 32
+# START_BYTE, version, cmd, CAN ID and flags of an unescaped header
+_PREFIX = 8
+
+
+class _Slot:
+    """A CAN ID's last delivered frame (and its raw bytes) and its latest value"""
+    __slots__ = ("raw", "frame", "due", "latest", "seen")
+
+    def __init__(self, raw: Optional[bytes], frame: CANFrame, due: float):
+        self.raw = raw
+        self.frame = frame
+        self.due = due
+        self.latest = frame
+        self.seen = frame.timestamp
+
+
+class ChangeFilter:
+    """
+    Per-ID deduplication of received CAN frames.
+
+    A frame is delivered when its data or flags differ from the last frame
+    delivered for its ID, and at least `min_interval` seconds (per ID from
+    `intervals`, by CAN ID) have passed since then; a change held back by
+    the interval goes out with the ID's next frame after it. Other commands
+    always pass. `snapshot()` returns the latest frame of every ID seen,
+    delivered or not, timestamped when it was last received.
+    """
+
+    def __init__(self, min_interval: float = 0.0, intervals: Optional[Mapping[int, float]] = None):
+        self.min_interval = min_interval
+        self.intervals: Dict[int, float] = dict(intervals or {})
+        self.delivered = 0
+        self.unchanged = 0
+        self.throttled = 0
+        self._slots: Dict[int, _Slot] = {}
+        # Raw header prefix -> slot of the frame last delivered with it
+        self._prefixes: Dict[bytes, _Slot] = {}
+
+    def __len__(self):
+        return len(self._slots)
+
+    def repeated_raw(self, raw: bytes, timestamp: float) -> bool:
+        """
+        True if a raw frame is byte for byte the last one delivered for its
+        ID, so it can be dropped without decoding. False means "decode it
+        and ask accept()"; it doesn't mean the data changed.
+        """
+        slot = self._prefixes.get(raw[:_PREFIX])
+        if slot is None or slot.raw != raw:
+            return False
+        slot.latest = slot.frame
+        slot.seen = timestamp
+        self.unchanged += 1
+        return True
+
+    def accept(self, cmd: Command, frame: CANFrame, raw: Optional[bytes] = None) -> bool:
+        """Whether to deliver a decoded frame; `raw` (its raw bytes) enables repeated_raw() for its repeats"""
+        if cmd is not Command.CAN_SEND:
+            return True
+        key = frame.can_id | _EXTENDED_KEY if frame.extended else frame.can_id
+        slot = self._slots.get(key)
+        timestamp = frame.timestamp
+        if slot is None:
+            slot = self._slots[key] = _Slot(raw, frame, timestamp + self.intervals.get(frame.can_id, self.min_interval))
+        else:
+            slot.latest = frame
+            slot.seen = timestamp
+            delivered = slot.frame
+            if frame.data == delivered.data and frame.flags == delivered.flags:
+                self.unchanged += 1
+                return False
+            if timestamp < slot.due:
+                self.throttled += 1
+                return False
+            slot.raw = raw
+            slot.frame = frame
+            slot.due = timestamp + self.intervals.get(frame.can_id, self.min_interval)
+        if raw is not None:
+            self._prefixes[raw[:_PREFIX]] = slot
+        self.delivered += 1
+        return True
+
+    def filter(self, batch: List) -> List:
+        """The (cmd, frame) pairs of a decoded batch to deliver"""
+        accept = self.accept
+        return [(cmd, frame) for cmd, frame in batch if accept(cmd, frame)]
+
+    def snapshot(self) -> Dict[int, CANFrame]:
+        """Latest frame of every CAN ID seen, by CAN ID"""
+        frames = {}
+        for slot in list(self._slots.values()):
+            frame, seen = slot.latest, slot.seen
+            if frame.timestamp != seen:
+                frame = _make_frame(frame.can_id, frame.data, frame.extended, frame.flags, seen)
+            frames[frame.can_id] = frame
+        return frames
+
+    def clear(self):
+        """Forget every ID, so the next frame of each is delivered"""
+        self._slots = {}
+        self._prefixes = {}
@@ -1,45 +1,628 @@
 # quickcan/driver.py
 
 import serial
+import heapq
 import logging
-from typing import Callable
+import re
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
-from quickcan.protocol import encode_frame, decode_frame, CANFrame, Command
+from quickcan.commands.heartbeat import heartbeat_task
+from quickcan.commands.scheduler import PeriodicScheduler, PeriodicTask
+from quickcan.dedup import ChangeFilter
+from quickcan.filters import FilterEngine
+from quickcan.protocol import (
+    encode_frame, encode_frames, decode_fields, reject_reason, response_key, CANFrame, Command, PROTOCOL_VERSION,
+    PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD, CONFIG_PROTOCOL, START_BYTE, FLAG_FD, FLAG_BRS, _make_frame
+)
+from quickcan.stats import ReceiveStats
 from quickcan.transport.stream_decoder import FrameStreamDecoder
+from quickcan.transport.ring_buffer import FrameRingBuffer, DROP_OLDEST
+from quickcan.transport.tx_queue import TransmitQueue
+from quickcan.utils.clock import ClockSync
+from quickcan.utils.log import FrameTracer
 
 logger = logging.getLogger(__name__)
 
+# Device replies to CAN frames (with ack_sends), filter commands and RESET
+_ACK_COMMANDS = (Command.ACK, Command.NACK)
+_VERSIONS = bytes([PROTOCOL_VERSION, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD])
+ACK_TIMEOUT = 1.0
+REQUEST_TIMEOUT = 1.0
+
+
+class _Request:
+    """A command awaiting its response: the packet to (re)send and its Future"""
+    __slots__ = ("key", "packet", "timeout", "retries", "future")
+
+    def __init__(self, key: Hashable, packet: bytes, timeout: float, retries: int):
+        self.key = key
+        self.packet = packet
+        self.timeout = timeout
+        self.retries = retries
+        self.future = Future()
+
+
+def _acked_frames(commands: Iterable[Command]) -> "re.Pattern[bytes]":
+    """Pattern matching the start of every frame of `commands` in an encoded packet"""
+    # Version and command bytes are never escaped, so they follow START_BYTE as-is
+    return re.compile(re.escape(bytes([START_BYTE])) + b"[" + re.escape(_VERSIONS) + b"]["
+                      + re.escape(bytes(commands)) + b"]")
+
+
 class QuickCAN:
-    def __init__(self, port: str, baudrate: int = 115200):
-        self.serial = serial.Serial(port, baudrate, timeout=0.1)
+    def __init__(self, port, baudrate: int = 115200, protocol_version: int = PROTOCOL_VERSION,
+                 tx_buffer_size: int = 65536, coalesce_bytes: int = 4096, coalesce_latency: float = 0.0,
+                 ack_sends: bool = False, ack_filters: bool = True):
+        # `port` is a port name, or an already open serial-like object
+        if isinstance(port, str):
+            self.serial = serial.Serial(port, baudrate, timeout=0.1)
+        else:
+            self.serial = port
+        # Every send goes through one writer thread (see TransmitQueue)
+        self.tx_queue = TransmitQueue(self.serial.write, tx_buffer_size, coalesce_bytes, coalesce_latency)
+        self._scheduler: Optional[PeriodicScheduler] = None
+        # Futures (None for unawaited commands) in the order their ACK/NACK is due.
+        # The adapter answers RESET, SET_FILTER/CLEAR_FILTER unless `ack_filters`
+        # is False, and every CAN_SEND frame if `ack_sends` (needed for wait_ack)
+        self.ack_sends = ack_sends
+        commands = [Command.RESET]
+        if ack_filters:
+            commands += [Command.SET_FILTER, Command.CLEAR_FILTER]
+        if ack_sends:
+            commands.append(Command.CAN_SEND)
+        self._acked = _acked_frames(commands)
+        self._acks = deque()
+        self._ack_lock = threading.Lock()
+        # Requests by response key, oldest first; deadlines are kept by the quickcan-rpc thread
+        self._pending: Dict[Hashable, Deque[_Request]] = {}
+        self._deadlines: List[Tuple[float, int, _Request]] = []
+        self._rpc_cond = threading.Condition()
+        self._rpc_thread: Optional[threading.Thread] = None
+        self._rpc_seq = 0
+        self._closed = False
         self.callback: Callable[[Command, CANFrame], None] = None
+        self.batch_callback: Callable[[List[Tuple[Command, CANFrame]]], None] = None
         self.decoder = FrameStreamDecoder()
-        logger.info(f"QuickCAN initialized on port {port} @ {baudrate} bps")
+        self.filters = FilterEngine()
+        # On-change delivery, off unless set_on_change() is called
+        self.on_change: Optional[ChangeFilter] = None
+        self.protocol_version = protocol_version
+        self.rx_buffer: Optional[FrameRingBuffer] = None
+        self.stats = ReceiveStats()
+        self.stats._decoder = self.decoder
+        # Sampled DEBUG log of sent and received frames, off unless "quickcan.trace" logs DEBUG
+        self.tracer = FrameTracer()
+        # Receive timestamps are time.time() seconds, taken from the monotonic clock
+        self.clock_sync = ClockSync()
+        self._epoch_ns = time.time_ns() - time.monotonic_ns()
+        self._byte_ns = 10_000_000_000 // baudrate  # 8N1: 10 bits per byte
+        self._last_read_ns = time.monotonic_ns()
+        self._running = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # The QuickCANGroup whose reader thread reads this port, if any
+        self._group = None
+        logger.info("QuickCAN initialized on port %s @ %d bps", port, baudrate)
 
     def set_receive_callback(self, callback: Callable[[Command, CANFrame], None]):
         """Register callback for incoming frames"""
         self.callback = callback
         logger.debug("Receive callback set")
 
-    def send(self, can_id: int, data: list[int], extended: bool = False):
-        """Send standard CAN frame (CMD_CAN_SEND)"""
-        frame = CANFrame(can_id=can_id, data=data, extended=extended)
-        packet = encode_frame(frame, cmd=Command.CAN_SEND)
-        self.serial.write(packet)
-        logger.info(f"Sent CAN frame: ID=0x{can_id:X}, Data={data}, Extended={extended}")
+    def set_receive_batch_callback(self, callback: Callable[[List[Tuple[Command, CANFrame]]], None]):
+        """Register callback receiving each dispatched batch of (cmd, frame) pairs"""
+        self.batch_callback = callback
+        logger.debug("Receive batch callback set")
+
+    def set_stage_hook(self, hook: Optional[Callable[[str, int], None]]):
+        """Register hook(stage, duration_ns) timing the "decode" and "dispatch" stages; None disables"""
+        self.stats.stage_hook = hook
+
+    def send(self, can_id: int, data: list[int], extended: bool = False, timeout: Optional[float] = None,
+             wait_ack: bool = False, fd: bool = False, bitrate_switch: bool = False) -> Optional[bool]:
+        """
+        Send standard CAN frame (CMD_CAN_SEND).
+
+        `fd` sends a CAN FD frame (implied by more than 8 data bytes) and
+        `bitrate_switch` sets its BRS flag; both need protocol version 3,
+        see negotiate_protocol().
+
+        The frame is queued for the writer thread; `timeout` bounds the wait
+        for room in a full transmit queue (TimeoutError). With `wait_ack`,
+        also wait for the device's ACK (True) or NACK (False) within
+        `timeout` (default ACK_TIMEOUT); this needs an adapter that answers
+        every frame (`ack_sends`). Responses are read by the background
+        receive threads, so start() them first.
+        """
+        if wait_ack and not self.ack_sends:
+            raise ValueError("wait_ack needs an adapter that ACKs every CAN frame (ack_sends=True)")
+        flags = (FLAG_FD if fd else 0) | (FLAG_BRS if bitrate_switch else 0)
+        frame = CANFrame(can_id=can_id, data=data, extended=extended, flags=flags)
+        packet = encode_frame(frame, cmd=Command.CAN_SEND, version=self.protocol_version)
+        if self.tracer.enabled:
+            self.tracer.trace("TX", Command.CAN_SEND, frame)
+        if not wait_ack:
+            self._write(packet, timeout)
+            return None
+        deadline = time.monotonic() + (ACK_TIMEOUT if timeout is None else timeout)
+        ack = Future()
+        self._write(packet, timeout, ack)
+        try:
+            acked = ack.result(max(deadline - time.monotonic(), 0))
+        except futures.TimeoutError:  # Not the builtin TimeoutError before Python 3.11
+            # Stays queued so a late reply can't be taken for the next frame's
+            if ack.cancel():
+                raise TimeoutError(f"No ACK for CAN frame 0x{can_id:X}") from None
+            acked = ack.result()  # The reply arrived just now
+        return acked
+
+    def send_many(self, frames: Iterable[CANFrame], timeout: Optional[float] = None) -> int:
+        """Send a batch of CAN frames (CMD_CAN_SEND) with a single write"""
+        tracer = self.tracer
+        if tracer.enabled:
+            frames = list(frames)
+            for frame in frames:
+                tracer.trace("TX", Command.CAN_SEND, frame)
+        packet = encode_frames(frames, cmd=Command.CAN_SEND, version=self.protocol_version)
+        if packet:
+            self._write(packet, timeout)
+        return len(packet)
+
+    @property
+    def scheduler(self) -> PeriodicScheduler:
+        """Timer thread of the periodic tasks, created on first use"""
+        if self._scheduler is None:
+            self._scheduler = PeriodicScheduler(self._write, self.protocol_version)
+        return self._scheduler
+
+    def send_periodic(self, frames: Union[CANFrame, Sequence[CANFrame]], period: float,
+                      duration: Optional[float] = None,
+                      modifier: Optional[Callable[[CANFrame], Optional[CANFrame]]] = None,
+                      start: bool = True) -> PeriodicTask:
+        """
+        Send a CAN frame (or a cycle of frames, one per period) every
+        `period` seconds until the returned task is stopped or `duration`
+        has passed. `modifier(frame)` returns the next frame to send.
+        """
+        return self.scheduler.add(frames, period, Command.CAN_SEND, duration, modifier, start)
+
+    def start_heartbeat(self, interval: float = 1.0) -> PeriodicTask:
+        """Send HEARTBEAT every `interval` seconds, with a counter"""
+        return heartbeat_task(self.scheduler, interval)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything sent so far has been written to the port"""
+        return self.tx_queue.flush(timeout)
+
+    def _write(self, packet: bytes, timeout: Optional[float] = None, ack: Optional[Future] = None):
+        """Queue a packet; `ack` waits for the ACK/NACK of its single CAN frame"""
+        expected = len(self._acked.findall(packet))
+        if not expected:
+            queued = self.tx_queue.put(packet, timeout)
+        else:
+            # ACKs carry no reference to their frame, so every frame the adapter
+            # answers queues its waiter, or a None placeholder, in write order.
+            # They are queued before the packet, whose ACK may be read as soon
+            # as the writer thread has it.
+            if not self._ack_lock.acquire(timeout=-1 if timeout is None else timeout):
+                raise TimeoutError("Transmit queue full")
+            acks = self._acks
+            queued = False
+            try:
+                if ack is not None:
+                    acks.append(ack)
+                    acks.extend([None] * (expected - 1))
+                else:
+                    acks.extend([None] * expected)
+                queued = self.tx_queue.put(packet, timeout)
+            finally:
+                if not queued:
+                    # Still the newest entries: nothing answers an unsent packet
+                    for _ in range(expected):
+                        acks.pop()
+                self._ack_lock.release()
+        if not queued:
+            raise TimeoutError("Transmit queue full")
+
+    def _on_ack(self, cmd: Command) -> bool:
+        """Hand an ACK/NACK to the oldest frame expecting one; False if none is"""
+        try:
+            ack = self._acks.popleft()
+        except IndexError:
+            return False
+        if ack is not None and ack.set_running_or_notify_cancel():
+            ack.set_result(cmd == Command.ACK)
+        return True
 
     def receive(self):
-        """Poll and decode frames from serial"""
-        while self.serial.in_waiting:
-            byte = self.serial.read(1)
-            if not byte:
-                continue  # Skip empty reads
-            result = self.decoder.feed(byte[0])
-            if result:
-                decoded = decode_frame(result)
-                if decoded and self.callback:
-                    cmd, frame = decoded
-                    self.callback(cmd, frame)
+        """Poll and decode frames from serial (one bulk read per call)"""
+        waiting = self.serial.in_waiting
+        if not waiting:
+            return
+        chunk = self.serial.read(waiting)
+        if not chunk:
+            return  # Skip empty reads
+        self._deliver(chunk)
+
+    def _deliver(self, chunk: bytes):
+        callback = self.callback
+        for cmd, frame in self._decode_chunk(chunk):
+            if callback:
+                callback(cmd, frame)
+
+    def _decode_chunk(self, chunk: bytes) -> Iterator[Tuple[Command, CANFrame]]:
+        """
+        Decode and timestamp the frames of one read.
+
+        The clock is read once per chunk. Its frames arrived over the time
+        the chunk took on the wire (at most since the previous read), so
+        their timestamps are spread evenly over that span, ending now.
+        Frames carrying a device timestamp are placed relative to the first
+        one in the chunk, which is mapped onto the host clock by
+        `clock_sync` (one clock sample per read).
+        """
+        now = time.monotonic_ns()
+        stats = self.stats
+        stats.reads += 1
+        stats.bytes_read += len(chunk)
+        results = list(self.decoder.feed_bytes(chunk))
+        span = min(now - self._last_read_ns, len(chunk) * self._byte_ns)
+        self._last_read_ns = now
+        if not results:
+            return
+        step = span / len(results) / 1e9
+        timestamp = (now - span + self._epoch_ns) / 1e9
+        filters = self.filters
+        anchor = None
+        acks = self._acks
+        pending = self._pending
+        tracer = self.tracer if self.tracer.enabled else None
+        on_change = self.on_change
+        decoded = filtered = unchanged = 0
+        try:
+            for result in results:
+                timestamp += step
+                if not filters.accept_all and not filters.accepts_raw(result):
+                    filtered += 1
+                    continue
+                if on_change is not None and on_change.repeated_raw(result, timestamp):
+                    unchanged += 1
+                    continue
+                fields = decode_fields(result)
+                if fields is None:
+                    stats.reject(reject_reason(result) or "malformed")
+                    continue
+                decoded += 1
+                cmd, can_id, flags, data, device_time = fields
+                if acks and cmd in _ACK_COMMANDS and self._on_ack(cmd):
+                    continue  # Expected replies skip the receive callbacks
+                if device_time is None:
+                    frame = _make_frame(can_id, data, bool(flags & 0x80), flags, timestamp)
+                    if pending and cmd is not Command.CAN_SEND and self._on_response(cmd, frame):
+                        continue
+                    if on_change is not None and not on_change.accept(cmd, frame, result):
+                        unchanged += 1
+                        continue
+                    if tracer:
+                        tracer.trace("RX", cmd, frame)
+                    yield cmd, frame
+                    continue
+                if anchor is None:
+                    clock = self.clock_sync
+                    read_time = (now + self._epoch_ns) / 1e9
+                    anchor, anchor_time = device_time, clock.update(device_time, read_time)
+                    wrap, scale = clock.wrap, clock.tick * (1 + clock.drift)
+                delta = (device_time - anchor) % wrap
+                if delta > wrap >> 1:
+                    delta -= wrap
+                device_timestamp = anchor_time + delta * scale
+                if device_timestamp > read_time:
+                    device_timestamp = read_time
+                frame = _make_frame(can_id, data, bool(flags & 0x80), flags, device_timestamp)
+                if pending and cmd is not Command.CAN_SEND and self._on_response(cmd, frame):
+                    continue
+                if on_change is not None and not on_change.accept(cmd, frame, result):
+                    unchanged += 1
+                    continue
+                if tracer:
+                    tracer.trace("RX", cmd, frame)
+                yield cmd, frame
+        finally:
+            stats.frames_decoded += decoded
+            stats.frames_filtered += filtered
+            stats.frames_unchanged += unchanged
+            if stats.stage_hook is not None:
+                stats.stage_hook("decode", time.monotonic_ns() - now)
+
+    # --- Request/Response ---
+
+    def submit(self, cmd: Command, data: Sequence[int] = (), timeout: float = REQUEST_TIMEOUT,
+               retries: int = 0) -> Future:
+        """
+        Send a command frame; the returned Future resolves to the device's
+        response (same command, and same key byte for CONFIG_GET/CONFIG_SET).
+
+        Each attempt waits `timeout` seconds, and the request is resent up
+        to `retries` times before the Future fails with TimeoutError. Any
+        number of requests can be in flight. Responses are matched by the
+        background receive threads (or a running QuickCANGroup's), or by
+        request() polling the port when they aren't running; matched
+        responses skip the receive callbacks.
+        """
+        frame = CANFrame(0x00, data)
+        request = _Request(response_key(cmd, frame), encode_frame(frame, cmd=cmd, version=self.protocol_version),
+                           timeout, retries)
+        with self._rpc_cond:
+            if self._closed:
+                raise OSError("QuickCAN is closed")
+            if self._rpc_thread is None:
+                self._rpc_thread = threading.Thread(target=self._timeout_loop, name="quickcan-rpc", daemon=True)
+                self._rpc_thread.start()
+            self._pending.setdefault(request.key, deque()).append(request)
+            self._schedule(request)
+        self._write(request.packet)
+        return request.future
+
+    def request(self, cmd: Command, data: Sequence[int] = (), timeout: float = REQUEST_TIMEOUT,
+                retries: int = 0) -> CANFrame:
+        """Send a command frame and wait for the device's response (see submit)"""
+        return self._wait(self.submit(cmd, data, timeout, retries))
+
+    def ping(self, timeout: float = REQUEST_TIMEOUT, retries: int = 0) -> float:
+        """Round-trip time of a PING, in seconds"""
+        start = time.perf_counter()
+        self.request(Command.PING, timeout=timeout, retries=retries)
+        return time.perf_counter() - start
+
+    def device_info(self, timeout: float = REQUEST_TIMEOUT, retries: int = 0) -> bytes:
+        return self.request(Command.DEVICE_INFO, timeout=timeout, retries=retries).data
+
+    def config_get(self, key_id: int, timeout: float = REQUEST_TIMEOUT, retries: int = 0) -> bytes:
+        """Read a config value; returns the data following the echoed key"""
+        return self.request(Command.CONFIG_GET, [key_id], timeout, retries).data[1:]
+
+    def config_set(self, key_id: int, values: List[int], timeout: float = REQUEST_TIMEOUT,
+                   retries: int = 0) -> CANFrame:
+        return self.request(Command.CONFIG_SET, [key_id] + list(values), timeout, retries)
+
+    def config_get_many(self, key_ids: Iterable[int], timeout: float = REQUEST_TIMEOUT, retries: int = 0,
+                        max_in_flight: int = 32) -> Dict[int, bytes]:
+        """Read many config values pipelined, at most `max_in_flight` requests outstanding"""
+        values = {}
+        in_flight: Deque[Tuple[int, Future]] = deque()
+        for key_id in key_ids:
+            if len(in_flight) >= max_in_flight:
+                key, future = in_flight.popleft()
+                values[key] = self._wait(future).data[1:]
+            in_flight.append((key_id, self.submit(Command.CONFIG_GET, [key_id], timeout, retries)))
+        for key, future in in_flight:
+            values[key] = self._wait(future).data[1:]
+        return values
+
+    def negotiate_protocol(self, max_version: int = PROTOCOL_VERSION_FD, timeout: float = REQUEST_TIMEOUT,
+                           retries: int = 0) -> int:
+        """
+        Switch the device's traffic and our sends to the newest protocol
+        version, up to `max_version`, listed by the device's CONFIG_PROTOCOL
+        key; returns the version in use. Devices without the key keep the
+        current version.
+        """
+        supported = [v for v in self.config_get(CONFIG_PROTOCOL, timeout, retries) if v <= max_version]
+        if not supported:
+            return self.protocol_version
+        reply = self.config_set(CONFIG_PROTOCOL, [max(supported)], timeout, retries)
+        if len(reply.data) > 1:
+            self.protocol_version = reply.data[1]
+            if self._scheduler is not None:
+                self._scheduler.protocol_version = self.protocol_version
+        logger.info("Using protocol version %d", self.protocol_version)
+        return self.protocol_version
+
+    def _wait(self, future: Future) -> CANFrame:
+        # Until some other thread reads the port, read it here for the response
+        ser = self.serial
+        while not future.done() and not self._read_elsewhere():
+            chunk = ser.read(ser.in_waiting or 1)
+            if chunk:
+                self._deliver(chunk)
+        return future.result()
+
+    def _read_elsewhere(self) -> bool:
+        """Whether our receive threads or a QuickCANGroup's reader read the port"""
+        return self.running or (self._group is not None and self._group.running)
+
+    def _on_response(self, cmd: Command, frame: CANFrame) -> bool:
+        """Resolve the oldest request waiting for this response; False if there is none"""
+        with self._rpc_cond:
+            waiters = self._pending.get(response_key(cmd, frame))
+            while waiters:
+                request = waiters.popleft()
+                if request.future.set_running_or_notify_cancel():
+                    request.future.set_result(frame)
+                    return True
+        return False
+
+    def _schedule(self, request: _Request):
+        self._rpc_seq += 1
+        heapq.heappush(self._deadlines, (time.monotonic() + request.timeout, self._rpc_seq, request))
+        self._rpc_cond.notify()
+
+    def _timeout_loop(self):
+        cond = self._rpc_cond
+        deadlines = self._deadlines
+        while True:
+            resend, expired = [], []
+            with cond:
+                while not self._closed and (not deadlines or deadlines[0][0] > time.monotonic()):
+                    cond.wait(deadlines[0][0] - time.monotonic() if deadlines else None)
+                if self._closed:
+                    return
+                now = time.monotonic()
+                while deadlines and deadlines[0][0] <= now:
+                    request = heapq.heappop(deadlines)[2]
+                    if request.future.done():
+                        continue
+                    if request.retries > 0:
+                        request.retries -= 1
+                        self._schedule(request)
+                        resend.append(request)
+                    else:
+                        self._pending[request.key].remove(request)
+                        expired.append(request)
+            for request in resend:
+                logger.debug("Retrying request %s", request.key)
+                try:
+                    self._write(request.packet)
+                except OSError:
+                    logger.exception("Retry of request %s failed", request.key)
+            for request in expired:
+                if request.future.set_running_or_notify_cancel():
+                    request.future.set_exception(TimeoutError(f"No response to {request.key[0].name}"))
+
+    # --- Filtering ---
+
+    def set_filters(self, filters: Optional[Iterable[Mapping]] = None, device_filters: int = 8):
+        """
+        Only deliver CAN frames matching python-can style filters
+        (`{"can_id", "can_mask", "extended"}` dicts); None or [] accepts all.
+
+        Frames are checked on their raw header, before a CANFrame is built.
+        Up to `device_filters` SET_FILTER slots are also programmed on the
+        adapter so it can drop traffic before it crosses the serial link
+        (0 leaves the adapter's filters alone). Responses to commands are
+        never filtered. Returns once the filter commands have been written.
+        """
+        self.filters = FilterEngine(filters)
+        if device_filters <= 0:
+            return
+        entries = self.filters.device_filters(device_filters)
+        frames = [CANFrame(can_id, can_mask.to_bytes(4, "big"), ext) for can_id, can_mask, ext in entries]
+        packet = encode_frame(CANFrame(0x00, []), cmd=Command.CLEAR_FILTER, version=self.protocol_version)
+        packet += encode_frames(frames, cmd=Command.SET_FILTER, version=self.protocol_version)
+        # _write queues placeholders for their ACKs, unless the adapter doesn't send them
+        self._write(packet)
+        self.flush()
+        logger.info("Filters set: %d on host, %d on device", len(self.filters.filters), len(entries))
+
+    def set_on_change(self, enabled: bool = True, min_interval: float = 0.0,
+                      intervals: Optional[Mapping[int, float]] = None) -> Optional[ChangeFilter]:
+        """
+        Only deliver CAN frames whose data changed since the last one
+        delivered for their ID, at most one per `min_interval` seconds per ID
+        (or `intervals[can_id]`); see ChangeFilter. Repeats are dropped from
+        their raw bytes, before decoding, and counted in
+        `stats.frames_unchanged`. `enabled=False` delivers every frame again.
+        """
+        self.on_change = ChangeFilter(min_interval, intervals) if enabled else None
+        return self.on_change
+
+    def snapshot(self) -> Dict[int, CANFrame]:
+        """Latest frame of every CAN ID received since set_on_change(), by CAN ID"""
+        if self.on_change is None:
+            raise RuntimeError("snapshot() needs on-change delivery, see set_on_change()")
+        return self.on_change.snapshot()
+
+    # --- Background Receive ---
+
+    def start(self, buffer_size: int = 4096, overflow: str = DROP_OLDEST, batch_size: int = 64):
+        """
+        Start the background reader and dispatcher threads.
+
+        The reader blocks on the serial port (up to its timeout) instead of
+        polling, decodes every chunk into a bounded ring buffer, and the
+        dispatcher hands buffered frames to the callbacks in batches of up
+        to `batch_size`. `overflow` is the ring buffer policy when the
+        callbacks fall behind: "drop-oldest", "drop-newest" or "block".
+        Don't call receive() while the threads are running.
+        """
+        if self._running.is_set():
+            return
+        self.rx_buffer = FrameRingBuffer(buffer_size, overflow)
+        self.stats._rx_buffer = self.rx_buffer
+        self._batch_size = batch_size
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._read_loop, name="quickcan-reader", daemon=True),
+            threading.Thread(target=self._dispatch_loop, name="quickcan-dispatcher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.debug("Background receive started")
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the background threads, dispatching frames already buffered"""
+        if not self._running.is_set():
+            return
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.debug("Background receive stopped")
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    @property
+    def dropped_frames(self) -> int:
+        """Frames lost to ring buffer overflow"""
+        return self.rx_buffer.dropped if self.rx_buffer else 0
+
+    def _read_loop(self):
+        ser = self.serial
+        put = self.rx_buffer.put
+        while self._running.is_set():
+            try:
+                # Block for the first byte, then take whatever else is waiting
+                chunk = ser.read(ser.in_waiting or 1)
+            except (serial.SerialException, OSError):
+                logger.exception("Serial read failed, stopping reader")
+                break
+            if not chunk:
+                continue
+            for decoded in self._decode_chunk(chunk):
+                put(decoded)
+
+    def _dispatch_loop(self):
+        rx_buffer = self.rx_buffer
+        stats = self.stats
+        while self._running.is_set() or len(rx_buffer):
+            batch = rx_buffer.get_batch(self._batch_size, timeout=0.1)
+            if not batch:
+                continue
+            depth = len(batch) + len(rx_buffer)
+            if depth > stats.max_queue_depth:
+                stats.max_queue_depth = depth
+            start = time.perf_counter_ns()
+            errors = 0
+            if self.batch_callback:
+                try:
+                    self.batch_callback(batch)
+                except Exception:
+                    errors += 1
+                    logger.exception("Receive batch callback failed")
+            callback = self.callback
+            if callback:
+                # A failing frame doesn't cost the rest of the batch; one traceback per batch
+                logged = False
+                for cmd, frame in batch:
+                    try:
+                        callback(cmd, frame)
+                    except Exception:
+                        errors += 1
+                        if not logged:
+                            logged = True
+                            logger.exception("Receive callback failed")
+            if errors:
+                stats.callback_errors += errors
+            elapsed = time.perf_counter_ns() - start
+            stats.record_callback(elapsed)
+            if stats.stage_hook is not None:
+                stats.stage_hook("dispatch", elapsed)
 
     # --- Command-Specific Send Helpers ---
 
@@ -60,23 +643,37 @@ class QuickCAN:
 
     def send_config_get(self, key_id: int):
         frame = CANFrame(0x00, [key_id])
-        packet = encode_frame(frame, cmd=Command.CONFIG_GET)
-        self.serial.write(packet)
-        logger.info(f"Sent CONFIG_GET for key_id={key_id}")
+        packet = encode_frame(frame, cmd=Command.CONFIG_GET, version=self.protocol_version)
+        self._write(packet)
+        logger.debug("Sent CONFIG_GET for key_id=%d", key_id)
 
     def send_config_set(self, key_id: int, values: list[int]):
         frame = CANFrame(0x00, [key_id] + values)
-        packet = encode_frame(frame, cmd=Command.CONFIG_SET)
-        self.serial.write(packet)
-        logger.info(f"Sent CONFIG_SET: key_id={key_id}, values={values}")
+        packet = encode_frame(frame, cmd=Command.CONFIG_SET, version=self.protocol_version)
+        self._write(packet)
+        logger.debug("Sent CONFIG_SET: key_id=%d, values=%s", key_id, values)
 
     def _send_simple_command(self, cmd: Command):
         """Helper for sending command-only frames"""
         frame = CANFrame(0x00, [])
-        packet = encode_frame(frame, cmd=cmd)
-        self.serial.write(packet)
-        logger.info(f"Sent command: {cmd.name} (0x{cmd:02X})")
+        packet = encode_frame(frame, cmd=cmd, version=self.protocol_version)
+        self._write(packet)
+        logger.debug("Sent command: %s (0x%02X)", cmd.name, cmd)
 
     def close(self):
-        self.serial.close()
-        logger.info("Serial port closed")
+        if self._scheduler is not None:
+            self._scheduler.close()
+        self.stop()
+        with self._rpc_cond:
+            self._closed = True
+            pending = [request for waiters in self._pending.values() for request in waiters]
+            self._pending.clear()
+            self._rpc_cond.notify()
+        for request in pending:
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(ConnectionError("QuickCAN closed"))
+        try:
+            self.tx_queue.close()  # Raises the first failed write, if any
+        finally:
+            self.serial.close()
+            logger.info("Serial port closed")
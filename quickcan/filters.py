@@ -0,0 +1,118 @@
+# quickcan/filters.py
+
+import struct
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from quickcan.protocol import Command, ESCAPE_BYTE
+from quickcan.utils.helpers import unescape_data
+
+__all__ = ["FilterEngine", "STANDARD_MASK", "EXTENDED_MASK"]
+
+STANDARD_MASK = 0x7FF
+EXTENDED_MASK = 0x1FFFFFFF
+
+# Lookup keys carry the extended flag above the 32-bit CAN ID field
+_EXTENDED_KEY = 1 << 32
+# cmd, can_id, flags: the same offsets (after START_BYTE and version) in every version
+_CMD_ID_FLAGS = struct.Struct(">BIB")
+
+
+class FilterEngine:
+    """
+    python-can style filter list compiled for fast acceptance checks.
+
+    Each filter is a mapping with "can_id", "can_mask" and an optional
+    "extended" key; a frame is accepted when
+    `frame_id & can_mask == can_id & can_mask` for at least one filter
+    (and its extended flag matches, if given). Filters whose mask covers
+    the whole ID go into a set of exact IDs, the rest are grouped into one
+    set per mask, so a lookup costs one set probe per distinct mask
+    rather than one comparison per filter. No filters accepts everything.
+    """
+
+    def __init__(self, filters: Optional[Iterable[Mapping]] = None):
+        self.filters: List[dict] = [dict(f) for f in filters or ()]
+        self.accept_all = not self.filters
+        self._exact: Set[int] = set()
+        buckets: Dict[int, Set[int]] = {}
+
+        for f in self.filters:
+            can_id, can_mask = f["can_id"], f["can_mask"]
+            extended = f.get("extended")
+            for ext in ((False, True) if extended is None else (bool(extended),)):
+                id_bits = EXTENDED_MASK if ext else STANDARD_MASK
+                flag = _EXTENDED_KEY if ext else 0
+                if can_mask & id_bits == id_bits:
+                    self._exact.add((can_id & can_mask) | flag)
+                else:
+                    buckets.setdefault(can_mask | _EXTENDED_KEY, set()).add((can_id & can_mask) | flag)
+
+        self._buckets: Tuple[Tuple[int, frozenset], ...] = tuple(
+            (mask, frozenset(ids)) for mask, ids in buckets.items()
+        )
+
+    def matches(self, can_id: int, extended: bool = False) -> bool:
+        """True if a frame with this ID passes the filters"""
+        if self.accept_all:
+            return True
+        key = can_id | _EXTENDED_KEY if extended else can_id
+        if key in self._exact:
+            return True
+        for mask, ids in self._buckets:
+            if key & mask in ids:
+                return True
+        return False
+
+    def accepts_raw(self, buf: bytes) -> bool:
+        """
+        Check a raw frame (as produced by FrameStreamDecoder) from its header
+        bytes, before it's validated or turned into a CANFrame. Frames other
+        than CAN_SEND, and frames too short to judge, are always accepted.
+        """
+        if self.accept_all:
+            return True
+        header = buf
+        offset = 2
+        if ESCAPE_BYTE in buf[:8]:
+            header = unescape_data(buf[1:15])
+            offset = 1
+        if len(header) < offset + _CMD_ID_FLAGS.size:
+            return True
+        cmd, can_id, flags = _CMD_ID_FLAGS.unpack_from(header, offset)
+        if cmd != Command.CAN_SEND:
+            return True
+        return self.matches(can_id, flags & 0x80)
+
+    def device_filters(self, max_filters: int) -> List[Tuple[int, int, bool]]:
+        """
+        (can_id, can_mask, extended) entries for the device's SET_FILTER
+        slots. They always accept a superset of what the host filters
+        accept: if the filter list doesn't fit in `max_filters`, filters are
+        merged into one covering mask per ID type, and if even that doesn't
+        fit, the device is left unfiltered (empty list).
+        """
+        if self.accept_all or max_filters <= 0:
+            return []
+
+        entries = []
+        for f in self.filters:
+            can_mask = f["can_mask"]
+            extended = f.get("extended")
+            for ext in ((False, True) if extended is None else (bool(extended),)):
+                entries.append((f["can_id"] & can_mask, can_mask, ext))
+        entries = list(dict.fromkeys(entries))
+        if len(entries) <= max_filters:
+            return entries
+
+        merged = []
+        for ext in (False, True):
+            group = [(can_id, can_mask) for can_id, can_mask, e in entries if e == ext]
+            if not group:
+                continue
+            base = group[0][0]
+            can_mask = EXTENDED_MASK if ext else STANDARD_MASK
+            for can_id, mask in group:
+                # Keep only bits every filter checks and all agree on
+                can_mask &= mask & ~(can_id ^ base)
+            merged.append((base & can_mask, can_mask, ext))
+        return merged if len(merged) <= max_filters else []
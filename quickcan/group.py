@@ -0,0 +1,190 @@
+# quickcan/group.py
+
+import heapq
+import logging
+import os
+import selectors
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple, Union
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, PROTOCOL_VERSION
+from quickcan.transport.ring_buffer import FrameRingBuffer, DROP_OLDEST
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["QuickCANGroup"]
+
+READ_SIZE = 65536
+
+
+class QuickCANGroup:
+    """
+    Many QuickCAN adapters served by one reader thread.
+
+    `ports` is a sequence of port names (used as channel names) or a
+    mapping of channel to port name / open serial port; ports must have a
+    fileno() (POSIX serial ports and ptys). A single `selectors` loop
+    reads whichever ports are ready, each port keeps its own decoder,
+    filters and clock, and frames from all ports are delivered as one
+    stream ordered by timestamp and tagged with their channel:
+    `callback(channel, cmd, frame)`.
+
+    Frames are held back for `reorder_window` seconds so one read from a
+    slower port can't put older frames behind newer ones from another.
+    Per-channel access (send helpers, filters, requests such as ping(),
+    answered through the group's reader once started) is `group[channel]`.
+    """
+
+    def __init__(self, ports: Union[Iterable[str], Mapping[Hashable, Any]], baudrate: int = 115200,
+                 protocol_version: int = PROTOCOL_VERSION, reorder_window: float = 0.005):
+        if not isinstance(ports, Mapping):
+            ports = {port: port for port in ports}
+        self.adapters: Dict[Hashable, QuickCAN] = {}
+        self.reorder_window = reorder_window
+        self.callback: Optional[Callable[[Hashable, Command, CANFrame], None]] = None
+        self.batch_callback: Optional[Callable[[List[Tuple[Hashable, Command, CANFrame]]], None]] = None
+        self.rx_buffer: Optional[FrameRingBuffer] = None
+        # Exceptions raised by the callbacks (each is logged and skipped)
+        self.callback_errors = 0
+        self._running = threading.Event()
+        self._threads: List[threading.Thread] = []
+        try:
+            for channel, port in ports.items():
+                self.adapters[channel] = QuickCAN(port, baudrate, protocol_version)
+        except Exception:
+            self.close()
+            raise
+        # One time base for all channels, so their timestamps compare
+        epoch_ns = time.time_ns() - time.monotonic_ns()
+        for adapter in self.adapters.values():
+            adapter._epoch_ns = epoch_ns
+            # Once started, our reader thread reads the port: request() mustn't read it too
+            adapter._group = self
+        self._epoch_ns = epoch_ns
+        logger.info("QuickCANGroup initialized with %d adapters", len(self.adapters))
+
+    def __getitem__(self, channel: Hashable) -> QuickCAN:
+        return self.adapters[channel]
+
+    def __len__(self):
+        return len(self.adapters)
+
+    @property
+    def channels(self) -> List[Hashable]:
+        return list(self.adapters)
+
+    def set_receive_callback(self, callback: Callable[[Hashable, Command, CANFrame], None]):
+        """Register callback(channel, cmd, frame) for frames from every adapter"""
+        self.callback = callback
+
+    def set_receive_batch_callback(self, callback: Callable[[List[Tuple[Hashable, Command, CANFrame]]], None]):
+        """Register callback receiving each dispatched batch of (channel, cmd, frame)"""
+        self.batch_callback = callback
+
+    def send(self, channel: Hashable, can_id: int, data: List[int], extended: bool = False):
+        self.adapters[channel].send(can_id, data, extended)
+
+    # --- Background Receive ---
+
+    def start(self, buffer_size: int = 16384, overflow: str = DROP_OLDEST, batch_size: int = 256):
+        """Start the shared reader and dispatcher threads (see QuickCAN.start)"""
+        if self._running.is_set():
+            return
+        self.rx_buffer = FrameRingBuffer(buffer_size, overflow)
+        self._batch_size = batch_size
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._read_loop, name="quickcan-group-reader", daemon=True),
+            threading.Thread(target=self._dispatch_loop, name="quickcan-group-dispatcher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.debug("Group background receive started")
+
+    def stop(self, timeout: float = 1.0):
+        if not self._running.is_set():
+            return
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.debug("Group background receive stopped")
+
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.rx_buffer.dropped if self.rx_buffer else 0
+
+    def _read_loop(self):
+        selector = selectors.DefaultSelector()
+        for channel, adapter in self.adapters.items():
+            selector.register(adapter.serial.fileno(), selectors.EVENT_READ, (channel, adapter))
+        put = self.rx_buffer.put
+        window = self.reorder_window
+        pending = []
+        seq = 0
+        try:
+            while self._running.is_set() and selector.get_map():
+                timeout = min(window, 0.1) if pending else 0.1
+                for key, _ in selector.select(timeout):
+                    channel, adapter = key.data
+                    try:
+                        chunk = os.read(key.fd, READ_SIZE)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        logger.exception("Read from channel %s failed, dropping it", channel)
+                        selector.unregister(key.fd)
+                        continue
+                    for cmd, frame in adapter._decode_chunk(chunk):
+                        heapq.heappush(pending, (frame.timestamp, seq, channel, cmd, frame))
+                        seq += 1
+
+                # Release frames old enough that no read can still sort before them
+                horizon = (time.monotonic_ns() + self._epoch_ns) / 1e9 - window
+                while pending and pending[0][0] <= horizon:
+                    _, _, channel, cmd, frame = heapq.heappop(pending)
+                    put((channel, cmd, frame))
+        finally:
+            selector.close()
+            while pending:
+                _, _, channel, cmd, frame = heapq.heappop(pending)
+                put((channel, cmd, frame))
+
+    def _dispatch_loop(self):
+        rx_buffer = self.rx_buffer
+        reader = self._threads[0]
+        # Runs until the reader has released its held-back frames
+        while reader.is_alive() or len(rx_buffer):
+            batch = rx_buffer.get_batch(self._batch_size, timeout=0.1)
+            if not batch:
+                continue
+            if self.batch_callback:
+                try:
+                    self.batch_callback(batch)
+                except Exception:
+                    self.callback_errors += 1
+                    logger.exception("Receive batch callback failed")
+            callback = self.callback
+            if callback:
+                # A failing frame doesn't cost the rest of the batch; one traceback per batch
+                logged = False
+                for channel, cmd, frame in batch:
+                    try:
+                        callback(channel, cmd, frame)
+                    except Exception:
+                        self.callback_errors += 1
+                        if not logged:
+                            logged = True
+                            logger.exception("Receive callback failed")
+
+    def close(self):
+        self.stop()
+        for adapter in self.adapters.values():
+            adapter.close()
+        logger.info("QuickCANGroup closed")
@@ -0,0 +1,164 @@
+# quickcan/offline.py
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from quickcan.batch import FrameBatch
+from quickcan.protocol import START_BYTE, reject_reason
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+__all__ = ["ChunkResult", "split_points", "decode_range", "decode_dump", "decode_dump_to_batch", "write_columns"]
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# (column, file suffix) of write_columns() output, in native byte order
+COLUMNS = (
+    ("can_ids", "can_id.u32"),
+    ("flags", "flags.u16"),
+    ("dlcs", "dlc.u8"),
+    ("commands", "command.u8"),
+    ("timestamps", "timestamp.f64"),
+    ("payloads", "data.u8"),
+)
+
+
+@dataclass
+class ChunkResult:
+    """Frames decoded from dump[start:stop] and what had to be rejected"""
+    index: int
+    start: int
+    stop: int
+    batch: FrameBatch
+    checksum_errors: int = 0
+    malformed: int = 0
+
+    @property
+    def corrupt(self) -> int:
+        return self.checksum_errors + self.malformed
+
+
+def split_points(buf, chunk_size: int = CHUNK_SIZE) -> List[int]:
+    """
+    Chunk boundaries of a raw dump, each at a START_BYTE.
+
+    Escaping turns every START_BYTE inside a frame into an ESCAPE_BYTE pair,
+    so a START_BYTE always begins a frame and no frame spans a boundary.
+    The list starts at 0 and ends at len(buf).
+    """
+    size = len(buf)
+    points = [0]
+    target = chunk_size
+    while target < size:
+        pos = buf.find(bytes([START_BYTE]), target)
+        if pos < 0:
+            break
+        points.append(pos)
+        target = pos + chunk_size
+    points.append(size)
+    return points
+
+
+def decode_range(path: str, start: int, stop: int, index: int = 0, payload_size: int = 8) -> ChunkResult:
+    """
+    Decode dump[start:stop] into a columnar FrameBatch (runs in worker
+    processes). Frames with more data than `payload_size` (64 for CAN FD
+    dumps) count as malformed.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunk = mm[start:stop]
+
+    result = ChunkResult(index, start, stop, FrameBatch(payload_size))
+    append_raw = result.batch.append_raw
+    decoder = FrameStreamDecoder()
+    for raw in decoder.feed_bytes(chunk):
+        try:
+            cmd = append_raw(raw)
+        except ValueError:
+            cmd = None  # Too long for payload_size
+        if cmd is None:
+            if reject_reason(raw) == "checksum":
+                result.checksum_errors += 1
+            else:
+                result.malformed += 1
+    # Whatever is left ran into the end of the dump without completing
+    leftover = decoder.flush()
+    if leftover is not None:
+        try:
+            cmd = append_raw(leftover)
+        except ValueError:
+            cmd = None
+        if cmd is None:
+            result.malformed += 1
+    # Junk the decoder dropped without yielding it
+    result.malformed += decoder.resync_reasons.get("header", 0) + decoder.resync_reasons.get("overflow", 0)
+    return result
+
+
+def decode_dump(path: str, workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE,
+                payload_size: int = 8) -> Iterator[ChunkResult]:
+    """
+    Decode a raw serial dump in parallel, yielding ChunkResults in file order.
+
+    The dump is memory-mapped to find chunk boundaries; each worker maps
+    and decodes its own byte range, so only decoded columns cross process
+    boundaries. At most two chunks per worker are in flight. `workers=1`
+    decodes in this process.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            points = split_points(mm, chunk_size)
+    ranges = list(zip(points, points[1:]))
+
+    if workers == 1:
+        for index, (start, stop) in enumerate(ranges):
+            yield decode_range(path, start, stop, index, payload_size)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight = 2 * workers
+        futures = []
+        for index, (start, stop) in enumerate(ranges):
+            futures.append(pool.submit(decode_range, path, start, stop, index, payload_size))
+            if len(futures) >= in_flight:
+                yield futures.pop(0).result()
+        for future in futures:
+            yield future.result()
+
+
+def decode_dump_to_batch(path: str, workers: Optional[int] = None,
+                         chunk_size: int = CHUNK_SIZE, payload_size: int = 8) -> FrameBatch:
+    """Decode a whole dump into one FrameBatch (`payload_size=64` for CAN FD)"""
+    batch = FrameBatch(payload_size)
+    for result in decode_dump(path, workers, chunk_size, payload_size):
+        for column, _ in COLUMNS:
+            getattr(batch, column).extend(getattr(result.batch, column))
+    return batch
+
+
+def write_columns(path: str, output_prefix: str, workers: Optional[int] = None,
+                  chunk_size: int = CHUNK_SIZE, payload_size: int = 8) -> dict:
+    """
+    Decode a dump straight into one raw file per column
+    (`<prefix>.can_id.u32`, `<prefix>.data.u8`, ...) that numpy.fromfile or
+    numpy.memmap can load; data rows are `payload_size` bytes (64 for CAN
+    FD). Returns totals of frames and rejects.
+    """
+    files = {column: open(f"{output_prefix}.{suffix}", "wb") for column, suffix in COLUMNS}
+    totals = {"frames": 0, "checksum_errors": 0, "malformed": 0}
+    try:
+        for result in decode_dump(path, workers, chunk_size, payload_size):
+            for column, f in files.items():
+                f.write(getattr(result.batch, column))
+            totals["frames"] += len(result.batch)
+            totals["checksum_errors"] += result.checksum_errors
+            totals["malformed"] += result.malformed
+    finally:
+        for f in files.values():
+            f.close()
+    return totals
@@ -1,5 +1,6 @@
+import struct
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from typing import Hashable, Iterable, Optional, Tuple
 from enum import IntEnum
 
 from quickcan.utils.helpers import checksum, escape_data, unescape_data
@@ -7,12 +8,43 @@ from quickcan.utils.helpers import checksum, escape_data, unescape_data
 START_BYTE = 0xAA
 ESCAPE_BYTE = 0xAB
 PROTOCOL_VERSION = 0x01
+# Version 2 adds an explicit data length byte after flags
+PROTOCOL_VERSION_2 = 0x02
+# Version 3 (CAN FD): the low nibble of flags is a CAN FD DLC code, and a
+# second flags byte after it carries the FD frame format, BRS and ESI bits
+PROTOCOL_VERSION_FD = 0x03
+# Flag: a 32-bit device timestamp (microseconds) follows the data
+FLAG_DEVICE_TIMESTAMP = 0x40
+# CANFrame.flags bits above the wire flags byte: version 3's second flags byte, shifted by 8
+FLAG_FD = 0x100
+FLAG_BRS = 0x200
+FLAG_ESI = 0x400
+_FD_FLAGS = FLAG_FD | FLAG_BRS | FLAG_ESI
+
+# Data length of each CAN FD DLC code
+FD_LENGTHS = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
+# Smallest DLC code holding each data length up to 64
+_FD_DLCS = bytes(next(dlc for dlc, size in enumerate(FD_LENGTHS) if size >= length) for length in range(65))
+
+# Config key of the protocol versions a device supports (CONFIG_GET) and
+# the one it uses for its traffic (CONFIG_SET)
+CONFIG_PROTOCOL = 0xF0
 
 __all__ = [
-    "CANFrame", "Command", "encode_frame", "decode_frame",
-    "START_BYTE", "ESCAPE_BYTE", "PROTOCOL_VERSION"
+    "CANFrame", "Command", "encode_frame", "encode_frames", "decode_frame",
+    "decode_fields", "payload_size", "START_BYTE", "ESCAPE_BYTE", "PROTOCOL_VERSION", "PROTOCOL_VERSION_2",
+    "PROTOCOL_VERSION_FD", "FLAG_DEVICE_TIMESTAMP", "FLAG_FD", "FLAG_BRS", "FLAG_ESI", "FD_LENGTHS",
+    "CONFIG_PROTOCOL", "len_to_dlc", "reject_reason", "response_key"
 ]
 
+# version, cmd, can_id, flags
+HEADER = struct.Struct(">BBIB")
+# version, cmd, can_id, flags, length
+HEADER_V2 = struct.Struct(">BBIBB")
+# version, cmd, can_id, flags, FD flags
+HEADER_FD = struct.Struct(">BBIBB")
+DEVICE_TIME = struct.Struct(">I")
+
 # --- Command Types ---
 class Command(IntEnum):
     CAN_SEND        = 0x01
@@ -28,65 +60,231 @@ class Command(IntEnum):
     CLEAR_FILTER    = 0x42
 
 
-@dataclass
+_COMMANDS = {cmd.value: cmd for cmd in Command}
+
+@dataclass(frozen=True, slots=True)
 class CANFrame:
+    """Immutable CAN frame; `data` is stored as bytes (lists are converted)"""
     can_id: int
-    data: List[int]
+    data: bytes
     extended: bool = False
     flags: int = 0
     timestamp: float = 0.0
 
+    def __post_init__(self):
+        if type(self.data) is not bytes:
+            object.__setattr__(self, "data", bytes(self.data))
+
+    @property
+    def is_fd(self) -> bool:
+        return bool(self.flags & FLAG_FD)
+
+    @property
+    def bitrate_switch(self) -> bool:
+        return bool(self.flags & FLAG_BRS)
+
+    @property
+    def error_state_indicator(self) -> bool:
+        return bool(self.flags & FLAG_ESI)
+
+
+def len_to_dlc(length: int) -> int:
+    """CAN FD DLC code of the smallest frame holding `length` data bytes"""
+    if not 0 <= length <= 64:
+        raise ValueError(f"CAN FD frames carry at most 64 data bytes, not {length}")
+    return _FD_DLCS[length]
 
-def encode_frame(frame: CANFrame, cmd: Command = Command.CAN_SEND) -> bytes:
-    dlc = len(frame.data)
-    flags = dlc & 0x0F
+
+_new = object.__new__
+_set_can_id = CANFrame.can_id.__set__
+_set_data = CANFrame.data.__set__
+_set_extended = CANFrame.extended.__set__
+_set_flags = CANFrame.flags.__set__
+_set_timestamp = CANFrame.timestamp.__set__
+
+
+def _make_frame(can_id: int, data: bytes, extended: bool, flags: int, timestamp: float = 0.0) -> CANFrame:
+    """Build a CANFrame from already validated fields, skipping the frozen __init__"""
+    frame = _new(CANFrame)
+    _set_can_id(frame, can_id)
+    _set_data(frame, data)
+    _set_extended(frame, extended)
+    _set_flags(frame, flags)
+    _set_timestamp(frame, timestamp)
+    return frame
+
+
+def _build_payload(frame: CANFrame, cmd: Command, version: int, device_time: Optional[int] = None) -> bytes:
+    """Unescaped payload: header, data, optional device timestamp and trailing checksum"""
+    data = bytes(frame.data)
+    if version == PROTOCOL_VERSION_FD:
+        # Padded with zeros to the next length a DLC code stands for
+        dlc = len_to_dlc(len(data))
+        data += bytes(FD_LENGTHS[dlc] - len(data))
+        fd_flags = frame.flags >> 8 & 0x07
+        if dlc > 8:
+            fd_flags |= FLAG_FD >> 8
+        flags = dlc
+    elif frame.flags & _FD_FLAGS:
+        raise ValueError("CAN FD frames need protocol version 3 (PROTOCOL_VERSION_FD)")
+    elif version == PROTOCOL_VERSION and len(data) > 15:
+        raise ValueError(f"Protocol version 1 carries at most 15 data bytes, not {len(data)}")
+    else:
+        flags = len(data) & 0x0F
+    length = len(data)
     if frame.extended:
         flags |= 0x80
+    if device_time is not None:
+        flags |= FLAG_DEVICE_TIMESTAMP
+        data += DEVICE_TIME.pack(device_time & 0xFFFFFFFF)
+
+    if version == PROTOCOL_VERSION_2:
+        payload = HEADER_V2.pack(version, cmd, frame.can_id & 0xFFFFFFFF, flags, length) + data
+    elif version == PROTOCOL_VERSION_FD:
+        payload = HEADER_FD.pack(version, cmd, frame.can_id & 0xFFFFFFFF, flags, fd_flags) + data
+    else:
+        payload = HEADER.pack(version, cmd, frame.can_id & 0xFFFFFFFF, flags) + data
+    return payload + bytes([checksum(payload)])
+
+
+def encode_frame(frame: CANFrame, cmd: Command = Command.CAN_SEND,
+                 version: int = PROTOCOL_VERSION, device_time: Optional[int] = None) -> bytes:
+    return bytes([START_BYTE]) + escape_data(_build_payload(frame, cmd, version, device_time))
+
 
-    payload = bytearray([
-        PROTOCOL_VERSION,
-        cmd,
-        (frame.can_id >> 24) & 0xFF,
-        (frame.can_id >> 16) & 0xFF,
-        (frame.can_id >> 8) & 0xFF,
-        frame.can_id & 0xFF,
-        flags
-    ])
-    payload.extend(frame.data)
-    payload.append(checksum(payload))
+def encode_frames(frames: Iterable[CANFrame], cmd: Command = Command.CAN_SEND,
+                  version: int = PROTOCOL_VERSION, device_time: Optional[int] = None) -> bytes:
+    """Encode a batch of frames into one contiguous buffer for a single write"""
+    packets = [escape_data(_build_payload(frame, cmd, version, device_time)) for frame in frames]
+    if not packets:
+        return b""
+    # Escaped data never contains START_BYTE, so packets are simply joined on it
+    start = bytes([START_BYTE])
+    return start + start.join(packets)
 
-    return bytes([START_BYTE]) + escape_data(payload)
 
+def payload_size(header: bytes) -> Optional[int]:
+    """
+    Unescaped payload length (header, data and checksum) announced by the
+    first bytes of a payload, or None if unknown from what is available.
+    """
+    if len(header) >= HEADER.size and header[0] == PROTOCOL_VERSION:
+        flags = header[6]
+        return HEADER.size + (flags & 0x0F) + (DEVICE_TIME.size + 1 if flags & FLAG_DEVICE_TIMESTAMP else 1)
+    if len(header) >= HEADER_V2.size and header[0] == PROTOCOL_VERSION_2:
+        extra = DEVICE_TIME.size + 1 if header[6] & FLAG_DEVICE_TIMESTAMP else 1
+        return HEADER_V2.size + header[7] + extra
+    if len(header) >= HEADER_FD.size and header[0] == PROTOCOL_VERSION_FD:
+        flags = header[6]
+        return HEADER_FD.size + FD_LENGTHS[flags & 0x0F] + (DEVICE_TIME.size + 1 if flags & FLAG_DEVICE_TIMESTAMP else 1)
+    return None
 
-def decode_frame(buf: bytes) -> Optional[Tuple[Command, CANFrame]]:
+
+def decode_fields(buf: bytes) -> Optional[Tuple[Command, int, int, bytes, Optional[int]]]:
+    """
+    Validate a raw frame and return its (cmd, can_id, flags, data,
+    device_time) fields; device_time is None unless the frame carries one.
+    """
     if not buf or buf[0] != START_BYTE:
         return None
 
     try:
-        payload = unescape_data(buf[1:])
-        if len(payload) < 8:
+        # Fast path: most frames carry no escaped bytes, so skip unescaping
+        # and unpack the header in place from the received buffer.
+        if ESCAPE_BYTE in buf:
+            payload = unescape_data(buf[1:])
+            offset = 0
+        else:
+            payload = buf
+            offset = 1
+        if len(payload) - offset < 8:
             return None
 
-        version = payload[0]
-        if version != PROTOCOL_VERSION:
+        version = payload[offset]
+        if version == PROTOCOL_VERSION:
+            version, cmd, can_id, flags = HEADER.unpack_from(payload, offset)
+            start = offset + HEADER.size
+            length = flags & 0x0F
+        elif version == PROTOCOL_VERSION_2:
+            version, cmd, can_id, flags, length = HEADER_V2.unpack_from(payload, offset)
+            start = offset + HEADER_V2.size
+            extra = DEVICE_TIME.size + 1 if flags & FLAG_DEVICE_TIMESTAMP else 1
+            if len(payload) - start != length + extra:
+                return None
+        elif version == PROTOCOL_VERSION_FD:
+            version, cmd, can_id, flags, fd_flags = HEADER_FD.unpack_from(payload, offset)
+            start = offset + HEADER_FD.size
+            length = FD_LENGTHS[flags & 0x0F]
+            extra = DEVICE_TIME.size + 1 if flags & FLAG_DEVICE_TIMESTAMP else 1
+            if len(payload) - start != length + extra:
+                return None
+            flags |= (fd_flags & 0x07) << 8
+        else:
             return None
 
-        cmd = Command(payload[1])
-        can_id = (payload[2] << 24) | (payload[3] << 16) | (payload[4] << 8) | payload[5]
-        flags = payload[6]
-        dlc = flags & 0x0F
-        data = list(payload[7:7 + dlc])
+        cmd = _COMMANDS.get(cmd)
+        if cmd is None:
+            return None
 
-        if checksum(payload[:-1]) != payload[-1]:
+        if checksum(payload[offset:-1]) != payload[-1]:
             return None
 
-        frame = CANFrame(
-            can_id=can_id,
-            data=data,
-            extended=bool(flags & 0x80),
-            flags=flags
-        )
-        return cmd, frame
+        end = start + length
+        if flags & FLAG_DEVICE_TIMESTAMP:
+            return cmd, can_id, flags, bytes(payload[start:end]), DEVICE_TIME.unpack_from(payload, end)[0]
+        return cmd, can_id, flags, bytes(payload[start:end]), None
 
     except Exception:
         return None
+
+
+def reject_reason(buf: bytes) -> Optional[str]:
+    """
+    Why decode_fields() rejects a raw frame: "start", "short", "version",
+    "length", "command", "checksum" or "error"; None if it is valid.
+    Repeats the checks step by step, so only call it for rejected frames.
+    """
+    if not buf or buf[0] != START_BYTE:
+        return "start"
+    try:
+        payload = unescape_data(buf[1:]) if ESCAPE_BYTE in buf else bytes(buf[1:])
+        if len(payload) < 8:
+            return "short"
+        if payload[0] == PROTOCOL_VERSION:
+            flags, start, length = payload[6], HEADER.size, payload[6] & 0x0F
+        elif payload[0] == PROTOCOL_VERSION_2:
+            flags, start, length = payload[6], HEADER_V2.size, payload[7]
+        elif payload[0] == PROTOCOL_VERSION_FD:
+            flags, start, length = payload[6], HEADER_FD.size, FD_LENGTHS[payload[6] & 0x0F]
+        else:
+            return "version"
+        extra = DEVICE_TIME.size + 1 if flags & FLAG_DEVICE_TIMESTAMP else 1
+        if len(payload) - start < length + extra or \
+                (payload[0] != PROTOCOL_VERSION and len(payload) - start != length + extra):
+            return "length"
+        if payload[1] not in _COMMANDS:
+            return "command"
+        if checksum(payload[:-1]) != payload[-1]:
+            return "checksum"
+    except Exception:
+        return "error"
+    return None if decode_fields(buf) is not None else "error"
+
+
+def decode_frame(buf: bytes, timestamp: float = 0.0) -> Optional[Tuple[Command, CANFrame]]:
+    fields = decode_fields(buf)
+    if fields is None:
+        return None
+    cmd, can_id, flags, data, _ = fields
+    return cmd, _make_frame(can_id, data, bool(flags & 0x80), flags, timestamp)
+
+
+# Commands whose responses echo the config key as their first data byte
+_KEYED_COMMANDS = (Command.CONFIG_GET, Command.CONFIG_SET)
+
+
+def response_key(cmd: Command, frame: CANFrame) -> Hashable:
+    """Key matching a response to the request that caused it"""
+    if cmd in _KEYED_COMMANDS:
+        return cmd, frame.data[0] if frame.data else None
+    return cmd, None
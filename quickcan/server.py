@@ -0,0 +1,568 @@
+# quickcan/server.py
+#
+# Shared-adapter daemon: one process owns the serial port and its QuickCAN,
+# decodes once, and fans the received frames out to any number of local
+# subscribers over a Unix domain socket.
+#
+# Wire format, both directions: messages of a 5-byte header (kind, payload
+# length; little-endian) and a payload.
+#   FRAMES  (server -> client) the client's cumulative dropped-frame count
+#           (u64), then one record per frame: timestamp (f64), CAN ID (u32),
+#           command (u8), flags (u16, 0x80 = extended ID, CAN FD bits above
+#           the wire flags byte), data length (u8),
+#           data. One message carries a whole dispatched batch.
+#   ERROR   (server -> client) UTF-8 text of the error that made the
+#           adapter fail a SEND of this client (e.g. its port went away);
+#           sent once, the client raises it from every later send.
+#   FILTERS (client -> server) JSON list of python-can style filters for
+#           the CAN frames this client receives; [] receives everything.
+#   SEND    (client -> server) encoded serial packets, written to the
+#           adapter as they are (so clients can use send_many, periodic
+#           tasks and any other command). They must be whole frames; a
+#           client sending anything else is disconnected.
+
+import errno
+import json
+import logging
+import os
+import selectors
+import socket
+import stat
+import struct
+import threading
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from quickcan.commands.scheduler import PeriodicScheduler, PeriodicTask
+from quickcan.dedup import ChangeFilter
+from quickcan.driver import QuickCAN
+from quickcan.filters import FilterEngine
+from quickcan.protocol import (
+    encode_frame, encode_frames, CANFrame, Command, PROTOCOL_VERSION, FLAG_FD, FLAG_BRS, _COMMANDS, _make_frame
+)
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["QuickCANServer", "QuickCANClient", "DEFAULT_SOCKET"]
+
+DEFAULT_SOCKET = "/tmp/quickcan.sock"
+
+FRAMES = 0x01
+ERROR = 0x02
+FILTERS = 0x10
+SEND = 0x11
+
+_HEADER = struct.Struct("<BI")
+_DROPPED = struct.Struct("<Q")
+_RECORD = struct.Struct("<dIBHB")
+_EXTENDED = 0x80
+READ_SIZE = 262144
+# sendmsg() takes at most IOV_MAX (1024 on Linux) buffers at once
+_MAX_IOV = 512
+
+
+def encode_records(batch: Iterable[Tuple[Command, CANFrame]]) -> List[bytes]:
+    """One wire record per (cmd, frame)"""
+    pack = _RECORD.pack
+    return [pack(frame.timestamp, frame.can_id, cmd, frame.flags | _EXTENDED if frame.extended else frame.flags,
+                 len(frame.data)) + frame.data
+            for cmd, frame in batch]
+
+
+def decode_records(payload, offset: int = 0) -> List[Tuple[Command, CANFrame]]:
+    """(cmd, frame) pairs of the records in `payload` from `offset` on"""
+    unpack_from = _RECORD.unpack_from
+    size = _RECORD.size
+    end = len(payload)
+    batch = []
+    append = batch.append
+    while offset < end:
+        timestamp, can_id, cmd, flags, length = unpack_from(payload, offset)
+        offset += size
+        data = bytes(payload[offset:offset + length])
+        offset += length
+        append((_COMMANDS[cmd], _make_frame(can_id, data, bool(flags & _EXTENDED), flags, timestamp)))
+    return batch
+
+
+def _remove_stale_socket(path: str):
+    """Unlink a socket file left by a server that is gone; refuse live ones and other files"""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise FileExistsError(errno.EEXIST, "Not a socket", path)
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)  # Nobody listening: a previous server's socket file
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, "A QuickCAN server is already serving", path)
+
+
+class _Client:
+    """A subscriber: its filters and the messages waiting to be written to it"""
+    __slots__ = ("sock", "filters", "out", "pending", "dropped", "sends_dropped", "sends_failed", "writing",
+                 "inbuf")
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.filters = FilterEngine()
+        self.out = deque()
+        self.pending = 0  # Bytes in `out`
+        self.dropped = 0
+        self.sends_dropped = 0
+        self.sends_failed = 0
+        self.writing = False  # Registered for EVENT_WRITE
+        self.inbuf = bytearray()
+
+
+class QuickCANServer:
+    """
+    Serve a QuickCAN adapter to local clients on the Unix socket `path`.
+
+    Frames are encoded once per dispatched batch and queued for every
+    client whose filters let them through; a client holding more than
+    `client_buffer` unsent bytes loses whole batches (counted and reported
+    to it) instead of slowing down the adapter or the other clients. One
+    "quickcan-server" thread accepts clients, reads their requests and
+    writes their data. Clients' SEND packets go through the adapter's
+    transmit queue without waiting for room: when the serial link is
+    saturated they are dropped (counted in `sends_dropped`) rather than
+    holding up that thread and every client with it. SENDs the adapter
+    fails to write (counted in `sends_failed`) are reported to their
+    client, which stays connected.
+
+    The socket is created with permissions `mode` (owner only by default),
+    replacing a stale socket file but never one a live server listens on.
+    """
+
+    def __init__(self, can: QuickCAN, path: str = DEFAULT_SOCKET, client_buffer: int = 1 << 20,
+                 mode: int = 0o600):
+        _remove_stale_socket(path)
+        self.can = can
+        self.path = path
+        self.client_buffer = client_buffer
+        self.clients: Dict[int, _Client] = {}
+        self.frames_sent = 0
+        self.sends_dropped = 0
+        self.sends_failed = 0
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._woken = False
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(path)
+        # Before listen(), so nobody connects while the mode is still the umask's
+        os.chmod(path, mode)
+        self._listener.listen()
+        self._listener.setblocking(False)
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        can.set_receive_batch_callback(self._on_batch)
+
+    def start(self, buffer_size: int = 65536, **kwargs):
+        """Start serving, and the adapter's receive threads (see QuickCAN.start)"""
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._serve_loop, name="quickcan-server", daemon=True)
+        self._thread.start()
+        self.can.start(buffer_size=buffer_size, **kwargs)
+        logger.info("Serving %s on %s", getattr(self.can.serial, "name", "adapter"), self.path)
+
+    def close(self):
+        """Disconnect every client and remove the socket; the adapter stays open"""
+        self.can.stop()
+        self._running.clear()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+        for client in list(self.clients.values()):
+            self._drop(client)
+        self._selector.close()
+        self._listener.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _on_batch(self, batch: List[Tuple[Command, CANFrame]]):
+        """Queue a dispatched batch for every client (QuickCAN's dispatcher thread)"""
+        records = None
+        message = None
+        with self._lock:
+            for client in self.clients.values():
+                if records is None:
+                    records = encode_records(batch)
+                if client.filters.accept_all:
+                    if message is None:
+                        message = b"".join(records)
+                    payload, count = message, len(batch)
+                else:
+                    matches = client.filters.matches
+                    selected = [record for record, (cmd, frame) in zip(records, batch)
+                                if cmd is not Command.CAN_SEND or matches(frame.can_id, frame.extended)]
+                    if not selected:
+                        continue
+                    payload, count = b"".join(selected), len(selected)
+                size = len(payload) + _HEADER.size + _DROPPED.size
+                if client.pending + size > self.client_buffer:
+                    client.dropped += count
+                    continue
+                # The payload is shared by the clients; sendmsg() writes header and payload together
+                client.out.append(_HEADER.pack(FRAMES, len(payload) + _DROPPED.size) + _DROPPED.pack(client.dropped))
+                client.out.append(payload)
+                client.pending += size
+                self.frames_sent += count
+            if records is not None and not self._woken:
+                self._woken = True
+                self._wake()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # Already woken, or closing
+
+    def _serve_loop(self):
+        selector = self._selector
+        while self._running.is_set():
+            for key, events in selector.select(timeout=1.0):
+                sock = key.fileobj
+                if sock is self._listener:
+                    self._accept()
+                elif sock is self._wake_r:
+                    self._on_wake()
+                else:
+                    client = key.data
+                    if events & selectors.EVENT_READ and not self._read(client):
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self._flush(client)
+
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = _Client(sock)
+        with self._lock:
+            self.clients[sock.fileno()] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+        logger.info("Client connected (%d total)", len(self.clients))
+
+    def _on_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            self._woken = False
+            ready = [client for client in self.clients.values() if client.out and not client.writing]
+        for client in ready:
+            self._flush(client)
+
+    def _flush(self, client: _Client):
+        """Write what the socket takes; wait for EVENT_WRITE if anything is left"""
+        out = client.out
+        with self._lock:
+            chunks = list(islice(out, _MAX_IOV))
+        sent = 0
+        if chunks:
+            try:
+                sent = client.sock.sendmsg(chunks)
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._drop(client)
+                return
+        with self._lock:
+            client.pending -= sent
+            while sent:
+                head = out[0]
+                if len(head) <= sent:
+                    out.popleft()
+                    sent -= len(head)
+                else:
+                    out[0] = memoryview(head)[sent:]
+                    sent = 0
+            more = bool(out)
+        if more != client.writing:
+            client.writing = more
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE if more else selectors.EVENT_READ
+            self._selector.modify(client.sock, events, client)
+
+    def _read(self, client: _Client) -> bool:
+        """Handle a client's requests; False if it disconnected"""
+        try:
+            data = client.sock.recv(READ_SIZE)
+        except BlockingIOError:
+            return True
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return False
+        buf = client.inbuf
+        buf += data
+        offset = 0
+        while len(buf) - offset >= _HEADER.size:
+            kind, length = _HEADER.unpack_from(buf, offset)
+            end = offset + _HEADER.size + length
+            if len(buf) < end:
+                break
+            payload = bytes(buf[offset + _HEADER.size:end])
+            offset = end
+            try:
+                self._request(client, kind, payload)
+            except Exception:
+                logger.exception("Bad request from client, disconnecting it")
+                self._drop(client)
+                return False
+        del buf[:offset]
+        return True
+
+    def _request(self, client: _Client, kind: int, payload: bytes):
+        if kind == SEND:
+            _check_frames(payload)
+            try:
+                self.can._write(payload, 0)
+            except TimeoutError:
+                # Transmit queue full
+                if not client.sends_dropped:
+                    logger.warning("Transmit queue full, dropping client SENDs")
+                client.sends_dropped += 1
+                self.sends_dropped += 1
+            except OSError as e:
+                # The adapter's writer failed (or it is closed): the client's fault is none
+                if not client.sends_failed:
+                    logger.warning("Adapter failed a client SEND: %s", e)
+                    self._queue(client, ERROR, str(e).encode())
+                client.sends_failed += 1
+                self.sends_failed += 1
+        elif kind == FILTERS:
+            filters = FilterEngine(json.loads(payload) or None)
+            with self._lock:
+                client.filters = filters
+        else:
+            raise ValueError(f"Unknown message kind 0x{kind:02X}")
+
+    def _queue(self, client: _Client, kind: int, payload: bytes):
+        """Queue a message for `client` and have the server thread write it"""
+        with self._lock:
+            client.out.append(_HEADER.pack(kind, len(payload)) + payload)
+            client.pending += _HEADER.size + len(payload)
+            if not self._woken:
+                self._woken = True
+                self._wake()
+
+    def _drop(self, client: _Client):
+        with self._lock:
+            if self.clients.pop(client.sock.fileno(), None) is None:
+                return
+        try:
+            self._selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        logger.info("Client disconnected (%d left, %d frames and %d SENDs dropped, %d SENDs failed)",
+                    len(self.clients), client.dropped, client.sends_dropped, client.sends_failed)
+
+
+def _check_frames(payload: bytes):
+    """Raise ValueError unless `payload` is a run of whole encoded frames"""
+    decoder = FrameStreamDecoder()
+    size = sum(len(frame) for frame in decoder.feed_bytes(payload))
+    # Frames are disjoint slices of the payload: their sizes only add up if nothing is left over
+    if size != len(payload) or decoder.resyncs:
+        raise ValueError(f"SEND of {len(payload)} bytes isn't whole encoded frames")
+
+
+class QuickCANClient:
+    """
+    Subscriber of a QuickCANServer, standing in for QuickCAN: received
+    frames arrive decoded (with the server's timestamps) through the same
+    callbacks, and sends are forwarded to the server's adapter. Commands
+    that wait for a reply (wait_ack, ping(), config_get(), ...) need the
+    adapter itself and aren't available. An error the adapter reported
+    for a send (its port went away, say) is kept in `send_error` and
+    raised by every later send, once the receive thread (start()) has
+    read it.
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET, protocol_version: int = PROTOCOL_VERSION):
+        self.path = path
+        self.protocol_version = protocol_version
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.callback: Optional[Callable[[Command, CANFrame], None]] = None
+        self.batch_callback: Optional[Callable[[List[Tuple[Command, CANFrame]]], None]] = None
+        self.filters = FilterEngine()
+        self.on_change: Optional[ChangeFilter] = None
+        self.server_dropped = 0  # Frames the server dropped because this client fell behind
+        self.frames_received = 0
+        self.send_error: Optional[OSError] = None
+        self._send_lock = threading.Lock()
+        self._scheduler: Optional[PeriodicScheduler] = None
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        logger.info("QuickCAN client connected to %s", path)
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.server_dropped
+
+    def set_receive_callback(self, callback: Callable[[Command, CANFrame], None]):
+        self.callback = callback
+
+    def set_receive_batch_callback(self, callback: Callable[[List[Tuple[Command, CANFrame]]], None]):
+        self.batch_callback = callback
+
+    def set_filters(self, filters: Optional[Iterable[Mapping]] = None, device_filters: int = 8):
+        """
+        Only receive CAN frames matching python-can style filters; the
+        server applies them before sending. The adapter's own filters
+        belong to the server, so `device_filters` is ignored.
+        """
+        filters = list(filters or [])
+        self.filters = FilterEngine(filters)
+        self._send(FILTERS, json.dumps(filters).encode())
+
+    def set_on_change(self, enabled: bool = True, min_interval: float = 0.0,
+                      intervals: Optional[Mapping[int, float]] = None) -> Optional[ChangeFilter]:
+        """See QuickCAN.set_on_change; frames arrive decoded, so repeats are compared after decoding"""
+        self.on_change = ChangeFilter(min_interval, intervals) if enabled else None
+        return self.on_change
+
+    def snapshot(self) -> Dict[int, CANFrame]:
+        if self.on_change is None:
+            raise RuntimeError("snapshot() needs on-change delivery, see set_on_change()")
+        return self.on_change.snapshot()
+
+    def start(self, buffer_size: int = 4096, overflow: str = None, batch_size: int = None):
+        """Start the receive thread; the socket and the server's per-client buffer do the buffering"""
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._receive_loop, name="quickcan-client", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _receive_loop(self):
+        sock = self.sock
+        sock.settimeout(0.1)
+        buf = bytearray()
+        header_size = _HEADER.size
+        while self._running.is_set():
+            try:
+                data = sock.recv(READ_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not data:
+                logger.warning("Server at %s closed the connection", self.path)
+                break
+            buf += data
+            offset = 0
+            view = memoryview(buf)
+            while len(buf) - offset >= header_size:
+                kind, length = _HEADER.unpack_from(buf, offset)
+                end = offset + header_size + length
+                if len(buf) < end:
+                    break
+                if kind == FRAMES:
+                    self.server_dropped = _DROPPED.unpack_from(buf, offset + header_size)[0]
+                    self._dispatch(decode_records(view[offset + header_size + _DROPPED.size:end]))
+                elif kind == ERROR:
+                    message = bytes(view[offset + header_size:end]).decode(errors="replace")
+                    logger.warning("Server's adapter failed a send: %s", message)
+                    self.send_error = OSError(message)
+                offset = end
+            view.release()
+            del buf[:offset]
+        self._running.clear()
+
+    def _dispatch(self, batch: List[Tuple[Command, CANFrame]]):
+        self.frames_received += len(batch)
+        if self.on_change is not None:
+            batch = self.on_change.filter(batch)
+            if not batch:
+                return
+        try:
+            if self.batch_callback:
+                self.batch_callback(batch)
+            if self.callback:
+                for cmd, frame in batch:
+                    self.callback(cmd, frame)
+        except Exception:
+            logger.exception("Receive callback failed")
+
+    def _send(self, kind: int, payload: bytes):
+        with self._send_lock:
+            self.sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+    def _write(self, packet: bytes, timeout: Optional[float] = None, ack: Optional[Future] = None):
+        """Forward a packet to the server (see QuickCAN._write); there are no ACKs to wait for"""
+        if ack is not None:
+            raise ValueError("wait_ack needs the adapter itself, not a QuickCAN server client")
+        if self.send_error is not None:
+            raise self.send_error.with_traceback(None)
+        self._send(SEND, packet)
+
+    def send(self, can_id: int, data: list[int], extended: bool = False, timeout: Optional[float] = None,
+             wait_ack: bool = False, fd: bool = False, bitrate_switch: bool = False) -> Optional[bool]:
+        """Send a CAN frame through the server's adapter (see QuickCAN.send)"""
+        if wait_ack:
+            raise ValueError("wait_ack needs the adapter itself, not a QuickCAN server client")
+        flags = (FLAG_FD if fd else 0) | (FLAG_BRS if bitrate_switch else 0)
+        frame = CANFrame(can_id=can_id, data=data, extended=extended, flags=flags)
+        self._write(encode_frame(frame, cmd=Command.CAN_SEND, version=self.protocol_version))
+        return None
+
+    def send_many(self, frames: Iterable[CANFrame], timeout: Optional[float] = None) -> int:
+        packet = encode_frames(frames, cmd=Command.CAN_SEND, version=self.protocol_version)
+        if packet:
+            self._write(packet)
+        return len(packet)
+
+    @property
+    def scheduler(self) -> PeriodicScheduler:
+        if self._scheduler is None:
+            self._scheduler = PeriodicScheduler(self._write, self.protocol_version)
+        return self._scheduler
+
+    def send_periodic(self, frames: Union[CANFrame, Sequence[CANFrame]], period: float,
+                      duration: Optional[float] = None,
+                      modifier: Optional[Callable[[CANFrame], Optional[CANFrame]]] = None,
+                      start: bool = True) -> PeriodicTask:
+        """See QuickCAN.send_periodic; the periodic writes go to the server"""
+        return self.scheduler.add(frames, period, Command.CAN_SEND, duration, modifier, start)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return True  # Sends are written to the socket before they return
+
+    def close(self):
+        if self._scheduler is not None:
+            self._scheduler.close()
+        self.stop()
+        self.sock.close()
+        logger.info("QuickCAN client disconnected from %s", self.path)
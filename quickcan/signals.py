@@ -0,0 +1,315 @@
+# quickcan/signals.py
+#
+# Physical signal values of received frames. A SignalDatabase holds the
+# messages of a DBC file (or JSON/YAML with the same fields). Each message
+# is compiled once, on first use, into a function that builds one integer
+# from the frame data and takes every signal out of it with a shift and a
+# mask; the functions are cached by CAN ID. decode_batch() decodes a whole
+# FrameBatch into NumPy columns, one vectorized pass per signal.
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from quickcan.batch import FrameBatch
+from quickcan.protocol import CANFrame, Command
+
+__all__ = ["Signal", "Message", "SignalDatabase", "load_database", "parse_dbc"]
+
+# Lookup keys carry the extended flag above the 32-bit CAN ID field (as in filters.py)
+_EXTENDED_KEY = 1 << 32
+# DBC files mark extended IDs with bit 31
+_DBC_EXTENDED = 0x80000000
+
+Values = Dict[str, Union[int, float]]
+
+
+@dataclass(frozen=True)
+class Signal:
+    """
+    A signal in DBC terms: `start` is the bit number of the LSB of a
+    little-endian (Intel) signal, or of the MSB of a big-endian (Motorola)
+    one, counting from bit 0 of byte 0. The physical value is
+    `raw * scale + offset`; unscaled signals stay integers.
+    """
+    name: str
+    start: int
+    length: int
+    little_endian: bool = True
+    signed: bool = False
+    scale: float = 1.0
+    offset: float = 0.0
+    unit: str = ""
+
+    def shift(self, size: int) -> int:
+        """Bit position of the LSB in the integer of `size` data bytes, read in the signal's byte order"""
+        if self.little_endian:
+            return self.start
+        msb = (size - 1 - self.start // 8) * 8 + self.start % 8
+        return msb - self.length + 1
+
+    @property
+    def scaled(self) -> bool:
+        return self.scale != 1 or self.offset != 0
+
+
+@dataclass(frozen=True)
+class Message:
+    """A CAN ID's layout: `length` data bytes holding `signals`"""
+    frame_id: int
+    name: str
+    length: int
+    signals: Tuple[Signal, ...] = ()
+    extended: bool = False
+
+    def __post_init__(self):
+        object.__setattr__(self, "signals", tuple(self.signals))
+        for signal in self.signals:
+            shift = signal.shift(self.length)
+            if signal.length < 1 or shift < 0 or shift + signal.length > self.length * 8:
+                raise ValueError(f"Signal {signal.name} doesn't fit the {self.length} bytes of {self.name}")
+
+    @property
+    def key(self) -> int:
+        return self.frame_id | _EXTENDED_KEY if self.extended else self.frame_id
+
+
+def _compile(message: Message) -> Callable[[bytes], Values]:
+    """Function decoding every signal of `message` from its data bytes, compiled from generated source"""
+    size = message.length
+    lines = [
+        "def decode(data):",
+        f"    if len(data) != {size}:",
+        f"        data = bytes(data[:{size}]).ljust({size}, b'\\0')",
+    ]
+    if any(signal.little_endian for signal in message.signals):
+        lines.append("    le = int.from_bytes(data, 'little')")
+    if not all(signal.little_endian for signal in message.signals):
+        lines.append("    be = int.from_bytes(data, 'big')")
+    values = []
+    for i, signal in enumerate(message.signals):
+        shift = signal.shift(size)
+        expr = "le" if signal.little_endian else "be"
+        if shift:
+            expr = f"({expr} >> {shift})"
+        if shift + signal.length < size * 8:
+            expr = f"{expr} & {(1 << signal.length) - 1:#x}"
+        if signal.signed:
+            lines.append(f"    v{i} = {expr}")
+            lines.append(f"    if v{i} & {1 << signal.length - 1:#x}:")
+            lines.append(f"        v{i} -= {1 << signal.length:#x}")
+            expr = f"v{i}"
+        if signal.scaled:
+            expr = f"({expr}) * {float(signal.scale)!r} + {float(signal.offset)!r}"
+        values.append(f"{signal.name!r}: {expr}")
+    lines.append("    return {" + ", ".join(values) + "}")
+    namespace = {}
+    exec(compile("\n".join(lines), f"<quickcan.signals {message.name}>", "exec"), namespace)
+    return namespace["decode"]
+
+
+def _extract(np, data, signal: Signal, size: int):
+    """Column of `signal` from the rows of data bytes of its message"""
+    shift = signal.shift(size)
+    mask = (1 << signal.length) - 1
+    if signal.little_endian:
+        first, last = shift // 8, (shift + signal.length - 1) // 8
+    else:
+        first, last = size - 1 - (shift + signal.length - 1) // 8, size - 1 - shift // 8
+    if last - first < 8:
+        # OR the bytes the signal spans into one uint64, then shift and mask
+        raw = np.zeros(len(data), dtype=np.uint64)
+        for byte in range(first, last + 1):
+            weight = 8 * (byte - first if signal.little_endian else last - byte)
+            raw |= data[:, byte].astype(np.uint64) << np.uint64(weight)
+        raw = (raw >> np.uint64(shift % 8)) & np.uint64(mask)
+        if signal.signed:
+            raw = raw.astype(np.int64)
+            if signal.length < 64:
+                raw -= (raw & (1 << signal.length - 1)) << 1
+    else:
+        # Long signals off a byte boundary span 9 bytes: Python integers
+        order = "little" if signal.little_endian else "big"
+        raw = np.array([int.from_bytes(row[:size].tobytes(), order) >> shift & mask for row in data],
+                       dtype=object)
+        if signal.signed:
+            raw = np.where(raw & (1 << signal.length - 1), raw - (1 << signal.length), raw)
+    if signal.scaled:
+        return raw.astype(np.float64) * signal.scale + signal.offset
+    return raw
+
+
+class SignalDatabase:
+    """
+    Messages by CAN ID, decoded into {signal name: value} dicts.
+
+    `decode(frame)` (or `decode_data(can_id, data)`) runs the message's
+    compiled decoder, built the first time its ID comes up and None for
+    IDs the database doesn't know; data shorter than the message is zero
+    padded. Pass `batch_callback(callback)` to
+    QuickCAN.set_receive_batch_callback() to get
+    `callback(message, values, frame)` for every known frame.
+    """
+
+    def __init__(self, messages: Iterable[Message] = ()):
+        self.messages: Dict[int, Message] = {}
+        self._by_name: Dict[str, Message] = {}
+        self._decoders: Dict[int, Optional[Callable[[bytes], Values]]] = {}
+        for message in messages:
+            self.add(message)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.messages.values())
+
+    def add(self, message: Message):
+        self.messages[message.key] = message
+        self._by_name[message.name] = message
+        self._decoders.pop(message.key, None)
+
+    def message(self, name: str) -> Message:
+        return self._by_name[name]
+
+    def get(self, can_id: int, extended: bool = False) -> Optional[Message]:
+        return self.messages.get(can_id | _EXTENDED_KEY if extended else can_id)
+
+    def decoder(self, can_id: int, extended: bool = False) -> Optional[Callable[[bytes], Values]]:
+        """Compiled decoder of a CAN ID's data bytes, None if the ID isn't in the database"""
+        key = can_id | _EXTENDED_KEY if extended else can_id
+        try:
+            return self._decoders[key]
+        except KeyError:
+            message = self.messages.get(key)
+            decoder = self._decoders[key] = _compile(message) if message is not None else None
+            return decoder
+
+    def decode(self, frame: CANFrame) -> Optional[Values]:
+        key = frame.can_id | _EXTENDED_KEY if frame.extended else frame.can_id
+        decoder = self._decoders.get(key, False)
+        if decoder is False:
+            decoder = self.decoder(frame.can_id, frame.extended)
+        return None if decoder is None else decoder(frame.data)
+
+    def decode_data(self, can_id: int, data: bytes, extended: bool = False) -> Optional[Values]:
+        decoder = self.decoder(can_id, extended)
+        return None if decoder is None else decoder(data)
+
+    def batch_callback(self, callback: Callable[[Message, Values, CANFrame], None]
+                       ) -> Callable[[List[Tuple[Command, CANFrame]]], None]:
+        """Receive batch callback decoding the CAN frames of known IDs for `callback`"""
+        decoders = self._decoders
+        messages = self.messages
+
+        def on_batch(batch: List[Tuple[Command, CANFrame]]):
+            for cmd, frame in batch:
+                if cmd is not Command.CAN_SEND:
+                    continue
+                key = frame.can_id | _EXTENDED_KEY if frame.extended else frame.can_id
+                decoder = decoders.get(key, False)
+                if decoder is False:
+                    decoder = self.decoder(frame.can_id, frame.extended)
+                if decoder is not None:
+                    callback(messages[key], decoder(frame.data), frame)
+
+        return on_batch
+
+    def decode_batch(self, batch: FrameBatch) -> Dict[str, Dict[str, "numpy.ndarray"]]:
+        """
+        Decode the CAN frames of a FrameBatch into NumPy columns (requires
+        numpy): {message name: {"timestamp": ..., signal name: ...}}, each
+        in batch order. Frames of unknown IDs are skipped.
+        """
+        import numpy as np
+
+        keys = np.frombuffer(batch.can_ids, dtype=np.uint32).astype(np.uint64)
+        extended = (np.frombuffer(batch.flags, dtype=np.uint16) & 0x80) != 0
+        keys |= extended.astype(np.uint64) << np.uint64(32)
+        # Other commands sort last and are never looked up
+        keys[np.frombuffer(batch.commands, dtype=np.uint8) != Command.CAN_SEND] = np.uint64(1 << 40)
+        rows = np.frombuffer(batch.payloads, dtype=np.uint8).reshape(-1, batch.payload_size)
+        timestamps = np.frombuffer(batch.timestamps, dtype=np.float64)
+
+        # One stable sort groups the frames of each ID, still in batch order
+        order = np.argsort(keys, kind="stable")
+        ids, starts = np.unique(keys[order], return_index=True)
+        columns = {}
+        for key, index in zip(ids.tolist(), np.split(order, starts[1:])):
+            message = self.messages.get(key)
+            if message is None:
+                continue
+            data = rows[index]
+            if data.shape[1] < message.length:
+                data = np.pad(data, ((0, 0), (0, message.length - data.shape[1])))
+            decoded = {"timestamp": timestamps[index]}
+            for signal in message.signals:
+                decoded[signal.name] = _extract(np, data, signal, message.length)
+            columns[message.name] = decoded
+        return columns
+
+    @classmethod
+    def from_dict(cls, spec: Mapping) -> "SignalDatabase":
+        """
+        Database from {"messages": [{"frame_id", "name", "length",
+        "extended", "signals": [{Signal fields}]}]}; IDs may be strings
+        such as "0x100".
+        """
+        messages = []
+        for entry in spec["messages"]:
+            entry = dict(entry)
+            frame_id = entry.pop("frame_id")
+            signals = tuple(Signal(**s) for s in entry.pop("signals", ()))
+            messages.append(Message(int(frame_id, 0) if isinstance(frame_id, str) else frame_id,
+                                    signals=signals, **entry))
+        return cls(messages)
+
+
+_BO = re.compile(r"^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)")
+_SG = re.compile(r"^SG_\s+(\w+)\s*(?:\w+\s*)?:\s*(\d+)\|(\d+)@([01])([+-])\s*"
+                 r"\(\s*([^,\s]+)\s*,\s*([^)\s]+)\s*\)\s*\[[^\]]*\]\s*\"([^\"]*)\"")
+
+
+def parse_dbc(text: str) -> SignalDatabase:
+    """
+    Messages and signals (BO_/SG_ lines) of a DBC file. Other sections
+    are ignored; multiplexed signals are all decoded, whatever the
+    multiplexer's value.
+    """
+    messages = []
+    current: Optional[dict] = None
+    for line in text.splitlines():
+        line = line.strip()
+        match = _BO.match(line)
+        if match:
+            frame_id = int(match.group(1))
+            current = {"frame_id": frame_id & ~_DBC_EXTENDED, "name": match.group(2),
+                       "length": int(match.group(3)), "extended": bool(frame_id & _DBC_EXTENDED), "signals": []}
+            messages.append(current)
+            continue
+        if line.startswith("SG_"):
+            match = _SG.match(line)
+            if match and current is not None:
+                name, start, length, order, sign, scale, offset, unit = match.groups()
+                current["signals"].append(Signal(name, int(start), int(length), order == "1", sign == "-",
+                                                 float(scale), float(offset), unit))
+        elif line:
+            current = None  # Signals follow their BO_ line
+    return SignalDatabase(Message(**m) for m in messages)
+
+
+def load_database(path: str) -> SignalDatabase:
+    """Load a .dbc, .json or .yaml/.yml (requires PyYAML) signal database"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if ext == ".dbc":
+            return parse_dbc(f.read())
+        if ext == ".json":
+            return SignalDatabase.from_dict(json.load(f))
+        if ext in (".yaml", ".yml"):
+            import yaml
+
+            return SignalDatabase.from_dict(yaml.safe_load(f))
+    raise ValueError(f"Unknown signal database format: {path}")
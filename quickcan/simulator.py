@@ -0,0 +1,388 @@
+# quickcan/simulator.py
+#
+# Hardware-independent QuickCAN device for tests and benchmarks.
+#
+#   python -m quickcan.simulator --rate 10000 --ids 0x100,0x200 --timestamps
+#
+# prints the pty path to open with QuickCAN / QuickCANBus / quickcan-cli.
+
+import argparse
+import os
+import random
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from quickcan.protocol import (
+    encode_frame, encode_frames, decode_fields, CANFrame, Command, ESCAPE_BYTE, START_BYTE,
+    PROTOCOL_VERSION, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD, CONFIG_PROTOCOL,
+)
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+__all__ = ["SimulatedDevice", "TrafficGenerator", "LoopbackSerial", "PtySimulator", "frame_latency_ns"]
+
+# Timestamped traffic carries time.monotonic_ns() at emission in its data
+TIMESTAMP = struct.Struct(">Q")
+
+
+class SimulatedDevice:
+    """
+    Protocol side of a QuickCAN adapter.
+
+    Answers PING (echo), DEVICE_INFO, CONFIG_GET/CONFIG_SET (echoing the key,
+    then the value), SET_FILTER/CLEAR_FILTER and RESET (ACK/NACK). CAN_SEND
+    frames are counted, acknowledged with an ACK when `ack_sends` is set and,
+    with `loopback`, received back as bus traffic. Responses use the
+    protocol version of the request.
+
+    SET_FILTER carries the filter ID as can_id (with the extended flag) and
+    a 4-byte big-endian mask as data. Generated traffic honours filters.
+    With `device_timestamps`, traffic carries the device's microsecond
+    counter, running `drift_ppm` fast relative to the host clock.
+
+    The CONFIG_PROTOCOL key lists the supported protocol versions (3, CAN
+    FD, only with `fd`); setting it selects `traffic_version`, the version
+    of bus traffic, and the reply echoes the version now in use.
+    """
+
+    def __init__(self, device_info: bytes = b"QCSIM\x01", config: Optional[Dict[int, bytes]] = None,
+                 loopback: bool = False, max_filters: int = 8, device_timestamps: bool = False,
+                 drift_ppm: float = 0.0, ack_sends: bool = False, fd: bool = False):
+        self.device_info = bytes(device_info)
+        self.versions = (PROTOCOL_VERSION, PROTOCOL_VERSION_2) + ((PROTOCOL_VERSION_FD,) if fd else ())
+        self.traffic_version = PROTOCOL_VERSION
+        self.ack_sends = ack_sends
+        self.device_timestamps = device_timestamps
+        self.drift_ppm = drift_ppm
+        self.config: Dict[int, bytes] = dict(config or {})
+        self.loopback = loopback
+        self.max_filters = max_filters
+        self.filters: List[Tuple[int, int, bool]] = []
+        self.transmitted = 0
+        self.decoder = FrameStreamDecoder()
+        self._lock = threading.Lock()
+
+    def process(self, data: bytes) -> bytes:
+        """Consume bytes written by the host and return the device's replies"""
+        replies = []
+        with self._lock:
+            for raw in self.decoder.feed_bytes(data):
+                fields = decode_fields(raw)
+                if fields is None:
+                    continue
+                version = raw[1]  # Version bytes are never escaped
+                for cmd, frame in self.handle(*fields[:4]):
+                    replies.append(encode_frame(frame, cmd=cmd, version=version))
+        return b"".join(replies)
+
+    def handle(self, cmd: Command, can_id: int, flags: int, data: bytes) -> List[Tuple[Command, CANFrame]]:
+        extended = bool(flags & 0x80)
+        if cmd == Command.CAN_SEND:
+            self.transmitted += 1
+            replies = [(Command.ACK, CANFrame(0x00, []))] if self.ack_sends else []
+            if self.loopback and self.accepts(can_id, extended):
+                replies.append((Command.CAN_SEND, CANFrame(can_id, data, extended, flags & ~0xFF)))
+            return replies
+        if cmd == Command.PING:
+            return [(Command.PING, CANFrame(0x00, data))]
+        if cmd == Command.DEVICE_INFO:
+            return [(Command.DEVICE_INFO, CANFrame(0x00, self.device_info))]
+        if cmd == Command.CONFIG_GET:
+            key = data[0] if data else 0
+            if key == CONFIG_PROTOCOL:
+                return [(Command.CONFIG_GET, CANFrame(0x00, bytes([key]) + bytes(self.versions)))]
+            return [(Command.CONFIG_GET, CANFrame(0x00, bytes([key]) + self.config.get(key, b"")))]
+        if cmd == Command.CONFIG_SET:
+            if not data:
+                return [(Command.NACK, CANFrame(0x00, []))]
+            if data[0] == CONFIG_PROTOCOL:
+                if len(data) > 1 and data[1] in self.versions:
+                    self.traffic_version = data[1]
+                return [(Command.CONFIG_SET, CANFrame(0x00, bytes([CONFIG_PROTOCOL, self.traffic_version])))]
+            self.config[data[0]] = bytes(data[1:])
+            return [(Command.CONFIG_SET, CANFrame(0x00, data))]
+        if cmd == Command.SET_FILTER:
+            if len(self.filters) >= self.max_filters or len(data) != 4:
+                return [(Command.NACK, CANFrame(0x00, []))]
+            self.filters.append((can_id, int.from_bytes(data, "big"), extended))
+            return [(Command.ACK, CANFrame(0x00, []))]
+        if cmd == Command.CLEAR_FILTER:
+            self.filters.clear()
+            return [(Command.ACK, CANFrame(0x00, []))]
+        if cmd == Command.RESET:
+            self.config.clear()
+            self.filters.clear()
+            return [(Command.ACK, CANFrame(0x00, []))]
+        return []
+
+    def accepts(self, can_id: int, extended: bool) -> bool:
+        if not self.filters:
+            return True
+        return any(
+            (can_id & mask) == (fid & mask) and ext == extended
+            for fid, mask, ext in self.filters
+        )
+
+    def device_time(self) -> int:
+        """Current value of the device's wrapping 32-bit microsecond counter"""
+        return int(time.monotonic_ns() / 1000 * (1 + self.drift_ppm * 1e-6)) & 0xFFFFFFFF
+
+    def traffic(self, frames: Sequence[CANFrame], version: Optional[int] = None) -> bytes:
+        """Encode bus traffic received by the device (in `traffic_version` by default), after its filters"""
+        if version is None:
+            version = self.traffic_version
+        if self.filters:
+            frames = [f for f in frames if self.accepts(f.can_id, f.extended)]
+        device_time = self.device_time() if self.device_timestamps else None
+        return encode_frames(frames, cmd=Command.CAN_SEND, version=version, device_time=device_time)
+
+
+class TrafficGenerator:
+    """
+    Synthetic bus traffic.
+
+    `ids` is a sequence of CAN IDs or a mapping of ID to relative weight,
+    `dlc_weights` maps DLC to relative weight, and `escape_density` is the
+    probability of each data byte being START_BYTE/ESCAPE_BYTE. With
+    `timestamps`, every frame has DLC 8 and carries time.monotonic_ns() at
+    emission (see `frame_latency_ns`). Data lengths over 8 make CAN FD
+    frames, which need protocol version 3.
+    """
+
+    def __init__(self, rate: float = 1000.0, ids: Union[Sequence[int], Mapping[int, float]] = (0x100,),
+                 dlc_weights: Optional[Mapping[int, float]] = None, escape_density: float = 0.0,
+                 extended: bool = False, timestamps: bool = False, seed: Optional[int] = None):
+        self.rate = rate
+        if isinstance(ids, Mapping):
+            self.ids, self.id_weights = list(ids), list(ids.values())
+        else:
+            self.ids, self.id_weights = list(ids), None
+        dlc_weights = dlc_weights or {8: 1.0}
+        self.dlcs, self.dlc_weights = list(dlc_weights), list(dlc_weights.values())
+        self.escape_density = escape_density
+        self.extended = extended
+        self.timestamps = timestamps
+        self.rng = random.Random(seed)
+
+    def frames(self, count: int) -> List[CANFrame]:
+        rng = self.rng
+        ids = rng.choices(self.ids, self.id_weights, k=count)
+        if self.timestamps:
+            stamp = TIMESTAMP.pack(time.monotonic_ns())
+            return [CANFrame(can_id, stamp, self.extended) for can_id in ids]
+
+        dlcs = rng.choices(self.dlcs, self.dlc_weights, k=count)
+        data = rng.randbytes(sum(dlcs))
+        if self.escape_density:
+            data = bytearray(data)
+            for i in range(len(data)):
+                if rng.random() < self.escape_density:
+                    data[i] = rng.choice((START_BYTE, ESCAPE_BYTE))
+            data = bytes(data)
+        frames = []
+        pos = 0
+        for can_id, dlc in zip(ids, dlcs):
+            frames.append(CANFrame(can_id, data[pos:pos + dlc], self.extended))
+            pos += dlc
+        return frames
+
+    def run(self, emit: Callable[[List[CANFrame]], None], stop: threading.Event,
+            count: Optional[int] = None, tick: float = 0.001):
+        """Call `emit` with the frames due every `tick` seconds until stopped"""
+        start = time.monotonic()
+        sent = 0
+        while not stop.is_set() and (count is None or sent < count):
+            due = int((time.monotonic() - start) * self.rate) - sent
+            if count is not None:
+                due = min(due, count - sent)
+            if due > 0:
+                emit(self.frames(due))
+                sent += due
+            stop.wait(tick)
+        return sent
+
+
+def frame_latency_ns(frame: CANFrame, now_ns: Optional[int] = None) -> int:
+    """Emission-to-now latency of a frame from a timestamping TrafficGenerator"""
+    if now_ns is None:
+        now_ns = time.monotonic_ns()
+    return now_ns - TIMESTAMP.unpack_from(frame.data)[0]
+
+
+class LoopbackSerial:
+    """In-process serial-like port wired straight to a SimulatedDevice"""
+
+    def __init__(self, device: Optional[SimulatedDevice] = None, timeout: Optional[float] = 0.1):
+        self.device = device or SimulatedDevice()
+        self.timeout = timeout
+        self.is_open = True
+        self._rx = bytearray()
+        self._cond = threading.Condition()
+        self._traffic: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._rx)
+
+    def read(self, size: int = 1) -> bytes:
+        with self._cond:
+            if not self._rx and self.is_open:
+                self._cond.wait(self.timeout)
+            data = bytes(self._rx[:size])
+            del self._rx[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            raise OSError("port is closed")
+        reply = self.device.process(data)
+        if reply:
+            self.feed(reply)
+        return len(data)
+
+    def feed(self, data: bytes):
+        """Make bytes available to the host, as if sent by the device"""
+        with self._cond:
+            self._rx += data
+            self._cond.notify_all()
+
+    def start_traffic(self, generator: TrafficGenerator, count: Optional[int] = None):
+        emit = lambda frames: self.feed(self.device.traffic(frames))
+        self._stop.clear()
+        self._traffic = threading.Thread(target=generator.run, args=(emit, self._stop, count),
+                                         name="quickcan-sim-traffic", daemon=True)
+        self._traffic.start()
+
+    def stop_traffic(self):
+        self._stop.set()
+        if self._traffic is not None:
+            self._traffic.join()
+            self._traffic = None
+
+    def close(self):
+        self.stop_traffic()
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+
+class PtySimulator:
+    """
+    SimulatedDevice behind a pseudo-terminal (POSIX only).
+
+    `port` is the pty path to open like a real adapter; a single thread
+    answers host requests and emits generated traffic (in `version`, or
+    the device's negotiated traffic version).
+    """
+
+    def __init__(self, device: Optional[SimulatedDevice] = None, version: Optional[int] = None):
+        import tty
+
+        self.device = device or SimulatedDevice()
+        self.version = version
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # No echo or line editing before the host opens it
+        self.port = os.ttyname(self._slave)
+        self.emitted = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, generator: Optional[TrafficGenerator] = None, count: Optional[int] = None,
+              tick: float = 0.001, delay: float = 0.0):
+        """Serve the host, emitting generated traffic after `delay` seconds"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(generator, count, tick, delay),
+                                        name="quickcan-pty-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def _write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.write(self._master, view)
+            view = view[written:]
+
+    def _run(self, generator: Optional[TrafficGenerator], count: Optional[int], tick: float,
+             delay: float):
+        start = time.monotonic() + delay
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._master], [], [], tick)
+            if readable:
+                try:
+                    data = os.read(self._master, 65536)
+                except OSError:
+                    break
+                reply = self.device.process(data)
+                if reply:
+                    self._write(reply)
+            if generator is not None and (count is None or self.emitted < count):
+                due = int((time.monotonic() - start) * generator.rate) - self.emitted
+                if count is not None:
+                    due = min(due, count - self.emitted)
+                if due > 0:
+                    self._write(self.device.traffic(generator.frames(due), self.version))
+                    self.emitted += due
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated QuickCAN adapter on a pty")
+    parser.add_argument('--rate', type=float, default=0.0, help="Generated frames per second")
+    parser.add_argument('--count', type=int, help="Stop generating after COUNT frames")
+    parser.add_argument('--ids', default="0x100", help="Comma separated CAN IDs")
+    parser.add_argument('--dlc', default="8", help="Comma separated DLCs to pick from")
+    parser.add_argument('--escape-density', type=float, default=0.0, help="Share of 0xAA/0xAB data bytes")
+    parser.add_argument('--extended', action='store_true', help="Generate extended IDs")
+    parser.add_argument('--timestamps', action='store_true', help="Embed emission time in the data")
+    parser.add_argument('--loopback', action='store_true', help="Echo CAN_SEND frames back")
+    parser.add_argument('--ack-sends', action='store_true', help="ACK every CAN_SEND frame")
+    parser.add_argument('--device-timestamps', action='store_true', help="Stamp traffic with the device clock")
+    parser.add_argument('--drift-ppm', type=float, default=0.0, help="Device clock drift against the host")
+    parser.add_argument('--fd', action='store_true', help="Support CAN FD (protocol version 3)")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds before traffic starts")
+    args = parser.parse_args()
+
+    generator = None
+    if args.rate > 0:
+        generator = TrafficGenerator(
+            rate=args.rate,
+            ids=[int(i, 0) for i in args.ids.split(",")],
+            dlc_weights={int(d): 1.0 for d in args.dlc.split(",")},
+            escape_density=args.escape_density,
+            extended=args.extended,
+            timestamps=args.timestamps,
+        )
+
+    device = SimulatedDevice(loopback=args.loopback, device_timestamps=args.device_timestamps,
+                             drift_ppm=args.drift_ppm, ack_sends=args.ack_sends, fd=args.fd)
+    with PtySimulator(device) as sim:
+        sim.start(generator, count=args.count, delay=args.delay)
+        print(sim.port, flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
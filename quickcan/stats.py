@@ -0,0 +1,122 @@
+# quickcan/stats.py
+
+import time
+from array import array
+from typing import Callable, Dict, Optional
+
+__all__ = ["ReceiveStats"]
+
+# Callback time histogram: bucket i counts durations of [2**(i-1), 2**i) microseconds
+HISTOGRAM_BUCKETS = 32
+
+
+class ReceiveStats:
+    """
+    Receive path counters of a QuickCAN adapter.
+
+    Everything is a plain integer update on the reader/dispatcher threads,
+    once per read, per batch or per rejected frame, so the counters can stay
+    on in production. Callback time is histogrammed per dispatched batch
+    (batch callback plus the per-frame callbacks); `callback_errors` counts
+    the exceptions they raised, each skipping only its own frame. Set
+    `stage_hook` to `hook(stage, duration_ns)` to also time the "decode"
+    (per read) and "dispatch" (per batch) stages.
+    """
+
+    __slots__ = ("reads", "bytes_read", "frames_decoded", "frames_filtered", "frames_unchanged", "rejects",
+                 "callback_batches", "callback_ns", "callback_histogram", "callback_errors", "max_queue_depth",
+                 "stage_hook", "started", "_decoder", "_rx_buffer")
+
+    def __init__(self):
+        self.stage_hook: Optional[Callable[[str, int], None]] = None
+        self._decoder = None
+        self._rx_buffer = None
+        self.reset()
+
+    def reset(self):
+        self.reads = 0
+        self.bytes_read = 0
+        self.frames_decoded = 0
+        self.frames_filtered = 0
+        self.frames_unchanged = 0  # Held back by on-change delivery (QuickCAN.set_on_change)
+        self.rejects: Dict[str, int] = {}
+        self.callback_batches = 0
+        self.callback_ns = 0
+        self.callback_histogram = array("Q", bytes(8 * HISTOGRAM_BUCKETS))
+        self.callback_errors = 0
+        self.max_queue_depth = 0
+        self.started = time.monotonic()
+        if self._decoder is not None:
+            self._decoder.reset_counts()
+
+    def reject(self, reason: str):
+        self.rejects[reason] = self.rejects.get(reason, 0) + 1
+
+    def record_callback(self, duration_ns: int):
+        self.callback_batches += 1
+        self.callback_ns += duration_ns
+        bucket = (duration_ns // 1000).bit_length()
+        self.callback_histogram[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+
+    def callback_percentile(self, pct: float) -> float:
+        """Upper bound, in microseconds, of the pct-th percentile batch callback time"""
+        total = sum(self.callback_histogram)
+        if not total:
+            return 0.0
+        target = total * pct / 100
+        seen = 0
+        for bucket, count in enumerate(self.callback_histogram):
+            seen += count
+            if seen >= target:
+                return float(1 << bucket)
+        return float(1 << (HISTOGRAM_BUCKETS - 1))
+
+    # --- Values owned by the decoder and ring buffer ---
+
+    @property
+    def resyncs(self) -> int:
+        return self._decoder.resyncs if self._decoder is not None else 0
+
+    @property
+    def dropped_frames(self) -> int:
+        return self._rx_buffer.dropped if self._rx_buffer is not None else 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._rx_buffer) if self._rx_buffer is not None else 0
+
+    def snapshot(self) -> dict:
+        return {
+            "elapsed": time.monotonic() - self.started,
+            "reads": self.reads,
+            "bytes_read": self.bytes_read,
+            "frames_decoded": self.frames_decoded,
+            "frames_filtered": self.frames_filtered,
+            "frames_unchanged": self.frames_unchanged,
+            "rejects": dict(self.rejects),
+            "resyncs": self.resyncs,
+            "dropped_frames": self.dropped_frames,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "callback_batches": self.callback_batches,
+            "callback_p50_us": self.callback_percentile(50),
+            "callback_p99_us": self.callback_percentile(99),
+            "callback_errors": self.callback_errors,
+        }
+
+    def summary(self, previous: Optional[dict] = None) -> str:
+        """One-line view; rates are since the `previous` snapshot, or since reset"""
+        now = self.snapshot()
+        base = previous or {"elapsed": 0.0, "bytes_read": 0, "frames_decoded": 0}
+        interval = max(now["elapsed"] - base["elapsed"], 1e-9)
+        rejects = ", ".join(f"{reason}={count}" for reason, count in sorted(now["rejects"].items())) or "0"
+        return (
+            f"{(now['frames_decoded'] - base['frames_decoded']) / interval:,.0f} frames/s "
+            f"{(now['bytes_read'] - base['bytes_read']) / interval / 1000:,.1f} kB/s | "
+            f"decoded {now['frames_decoded']:,} filtered {now['frames_filtered']:,} "
+            f"unchanged {now['frames_unchanged']:,} "
+            f"rejects {rejects} resyncs {now['resyncs']} dropped {now['dropped_frames']} | "
+            f"queue {now['queue_depth']} (max {now['max_queue_depth']}) | "
+            f"callback p50 <{now['callback_p50_us']:.0f}us p99 <{now['callback_p99_us']:.0f}us "
+            f"errors {now['callback_errors']}"
+        )
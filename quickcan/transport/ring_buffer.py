@@ -0,0 +1,89 @@
+# quickcan/transport/ring_buffer.py
+import threading
+import time
+from collections import deque
+from typing import Any, List, Optional
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+BLOCK = "block"
+
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class FrameRingBuffer:
+    """
+    Bounded single-producer/single-consumer buffer between the reader and
+    dispatcher threads.
+
+    Items go through a deque, whose append/popleft are atomic, so the
+    producer never takes a lock; events only wake the other side up.
+    When full, `overflow` decides what happens to a new item:
+
+    - "drop-oldest": the oldest buffered item is discarded
+    - "drop-newest": the new item is discarded
+    - "block": the producer waits for room (up to `put`'s timeout)
+    """
+
+    def __init__(self, capacity: int = 4096, overflow: str = DROP_OLDEST):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, not {overflow!r}")
+        self.capacity = capacity
+        self.overflow = overflow
+        self.dropped = 0
+        self._items = deque(maxlen=capacity if overflow == DROP_OLDEST else None)
+        self._not_empty = threading.Event()
+        self._not_full = threading.Event()
+        self._not_full.set()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item: Any, timeout: Optional[float] = None) -> bool:
+        """Add an item; returns False if it was dropped"""
+        items = self._items
+        if len(items) >= self.capacity:
+            if self.overflow == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            if self.overflow == DROP_OLDEST:
+                # The deque's maxlen discards the oldest item on append
+                self.dropped += 1
+            elif not self._wait_not_full(timeout):
+                self.dropped += 1
+                return False
+        items.append(item)
+        self._not_empty.set()
+        return True
+
+    def _wait_not_full(self, timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self._items) >= self.capacity:
+            self._not_full.clear()
+            # Short slices: the consumer may drain everything before clear()
+            wait = 0.01 if deadline is None else min(0.01, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+            self._not_full.wait(wait)
+        return True
+
+    def get_batch(self, max_items: int = 64, timeout: Optional[float] = None) -> List[Any]:
+        """Wait up to `timeout` for items and return at most `max_items` of them"""
+        items = self._items
+        if not items and not self._not_empty.wait(timeout):
+            return []
+        # Clear before draining, so an item appended meanwhile re-sets the event
+        self._not_empty.clear()
+        batch = []
+        pop = items.popleft
+        try:
+            for _ in range(max_items):
+                batch.append(pop())
+        except IndexError:
+            pass
+        if items:
+            self._not_empty.set()
+        self._not_full.set()
+        return batch
@@ -1,24 +1,189 @@
 # Transport: Serial/USB abstraction
 # quickcan/transport/stream_decoder.py
+from typing import Callable, Dict, Iterator, Optional
+
+from quickcan.protocol import (
+    START_BYTE, ESCAPE_BYTE, HEADER_V2, DEVICE_TIME, PROTOCOL_VERSION, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD,
+    payload_size
+)
+from quickcan.utils.helpers import unescape_data
+
+# Every payload starts with its (never escaped) protocol version
+_VERSIONS = (PROTOCOL_VERSION, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD)
+# Longest legal frame after START_BYTE: a version 2 header, 255 data bytes,
+# device time and checksum, every byte escaped (CAN FD frames are shorter)
+MAX_FRAME_SIZE = 2 * (HEADER_V2.size + 255 + DEVICE_TIME.size + 1)
+
+
+def _frame_end(buf, start: int, stop: int) -> Optional[int]:
+    """
+    Index just past the last escaped byte of the frame whose payload starts
+    at `buf[start]`, or None if its length is unknown or it is incomplete
+    within `buf[start:stop]`.
+    """
+    # An escaped header spans at most twice its unescaped size
+    header = buf[start:min(stop, start + 2 * HEADER_V2.size)]
+    if ESCAPE_BYTE in header:
+        header = unescape_data(header)
+    size = payload_size(header)
+    if size is None:
+        return None
+
+    pos, count = start, 0
+    while count < size:
+        esc = buf.find(ESCAPE_BYTE, pos, pos + size - count)
+        if esc < 0:
+            pos += size - count
+            break
+        # Bytes before the escape plus the escaped pair itself
+        count += esc - pos + 1
+        pos = esc + 2
+    return pos if pos <= stop else None
+
+
 class FrameStreamDecoder:
+    """
+    Reassembles raw frames from the serial byte stream.
+
+    A frame is complete as soon as the length announced by its header
+    (DLC for version 1, explicit length for version 2) has arrived. Escaped
+    data never contains START_BYTE, so after a corrupted or lost byte the
+    next START_BYTE always begins a frame again and one error costs one
+    frame:
+      - "truncated": a START_BYTE arrived before the announced length; the
+        frame is yielded as it is (and fails to decode) and the new one starts
+      - "header": the byte after START_BYTE is no protocol version; the
+        bytes up to the next START_BYTE are dropped right away, unbuffered
+      - "overflow": more than MAX_FRAME_SIZE bytes buffered without
+        completing a frame; they are dropped
+    `resyncs` counts these events, `resync_reasons` by reason and
+    `resync_bytes` the bytes of the frames lost; `resync_hook(reason,
+    size)` is called for each. The buffer never holds more than
+    MAX_FRAME_SIZE bytes.
+    """
+
     def __init__(self):
         self.buffer = bytearray()
         self.in_frame = False
+        self.resync_hook: Optional[Callable[[str, int], None]] = None
+        self.reset_counts()
+
+    def reset_counts(self):
+        self.resyncs = 0
+        self.resync_reasons: Dict[str, int] = {}
+        self.resync_bytes = 0
+
+    def _resync(self, reason: str, size: int):
+        self.resyncs += 1
+        self.resync_reasons[reason] = self.resync_reasons.get(reason, 0) + 1
+        self.resync_bytes += size
+        if self.resync_hook is not None:
+            self.resync_hook(reason, size)
 
     def feed(self, byte_in: int):
-        if byte_in == 0xAA:
+        if byte_in == START_BYTE:
             if self.in_frame and self.buffer:
-                full_frame = bytes([0xAA] + list(self.buffer))
+                # Length unknown or frame truncated: START_BYTE ends it
+                full_frame = bytes([START_BYTE]) + self.buffer
                 self.buffer.clear()
+                self._resync("truncated", len(full_frame))
                 return full_frame
             self.in_frame = True
             self.buffer.clear()
             return None
         elif self.in_frame:
+            if not self.buffer and byte_in not in _VERSIONS:
+                self.in_frame = False
+                self._resync("header", 2)
+                return None
             self.buffer.append(byte_in)
+            end = _frame_end(self.buffer, 0, len(self.buffer))
+            if end is not None:
+                full_frame = bytes([START_BYTE]) + self.buffer
+                self.buffer.clear()
+                self.in_frame = False
+                return full_frame
+            if len(self.buffer) > MAX_FRAME_SIZE:
+                self._drop_buffer()
         return None
 
+    def _drop_buffer(self):
+        self._resync("overflow", len(self.buffer) + 1)
+        self.buffer.clear()
+        self.in_frame = False
+
+    def feed_bytes(self, chunk: bytes) -> Iterator[bytes]:
+        """
+        Feed a whole chunk of received bytes and yield every complete frame.
+
+        The chunk is scanned with `find()` for START_BYTE boundaries so the
+        per-byte Python work of `feed()` is avoided. Decoder state is updated
+        as frames are yielded, so the iterator must be fully consumed.
+        """
+        pos = 0
+        size = len(chunk)
+        while pos < size:
+            if not self.in_frame:
+                pos = chunk.find(START_BYTE, pos)
+                if pos < 0:
+                    return
+                self.in_frame = True
+                pos += 1
+                continue
+
+            next_start = chunk.find(START_BYTE, pos)
+            stop = size if next_start < 0 else next_start
+
+            if self.buffer:
+                # Frame started in an earlier chunk
+                buffered = len(self.buffer)
+                self.buffer += chunk[pos:stop]
+                end = _frame_end(self.buffer, 0, len(self.buffer))
+                if end is not None:
+                    full_frame = bytes([START_BYTE]) + self.buffer[:end]
+                    self.buffer.clear()
+                    self.in_frame = False
+                    pos += end - buffered
+                    yield full_frame
+                    continue
+                if next_start < 0:
+                    if len(self.buffer) > MAX_FRAME_SIZE:
+                        self._drop_buffer()
+                    return
+                full_frame = bytes([START_BYTE]) + self.buffer
+                self.buffer.clear()
+                self._resync("truncated", len(full_frame))
+                pos = next_start + 1
+                yield full_frame
+                continue
+
+            if pos < stop and chunk[pos] not in _VERSIONS:
+                # Not a frame (typically a START_BYTE made by a corrupted byte): skip it unbuffered
+                self.in_frame = False
+                self._resync("header", stop - pos + 1)
+                pos = stop
+                continue
+            end = _frame_end(chunk, pos, stop)
+            if end is not None:
+                # Frame lies entirely within this chunk: one slice, no buffering
+                full_frame = chunk[pos - 1:end] if pos else bytes([START_BYTE]) + chunk[:end]
+                self.in_frame = False
+                pos = end
+                yield full_frame
+                continue
+            if next_start < 0:
+                self.buffer += chunk[pos:]
+                if len(self.buffer) > MAX_FRAME_SIZE:
+                    self._drop_buffer()
+                return
+            if stop > pos:
+                # Cut short by the next START_BYTE
+                full_frame = chunk[pos - 1:stop] if pos else bytes([START_BYTE]) + chunk[:stop]
+                self._resync("truncated", len(full_frame))
+                yield full_frame
+            pos = next_start + 1
+
     def flush(self):
         if self.buffer:
-            return bytes([0xAA] + list(self.buffer))
-        return None
\ No newline at end of file
+            return bytes([START_BYTE]) + self.buffer
+        return None
@@ -0,0 +1,136 @@
+# quickcan/transport/tx_queue.py
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TransmitQueue:
+    """
+    Bounded queue of encoded packets drained by a single writer thread.
+
+    Senders on any thread only append under a lock; the writer joins
+    everything pending (up to `coalesce_bytes`) into one write. With
+    `coalesce_latency` > 0 it also waits up to that long for a write to
+    fill before issuing it. Writes block while the serial link is
+    saturated, so queued bytes pile up to `capacity` and then `put` blocks
+    the senders (backpressure) up to its timeout.
+
+    A failed write is logged and counted, and the first failure (e.g. the
+    port went away) is kept in `error` and raised again by every later
+    put(), flush() and close(), so senders learn about it.
+
+    The writer thread starts on the first put.
+    """
+
+    def __init__(self, write: Callable[[bytes], Optional[int]], capacity: int = 65536,
+                 coalesce_bytes: int = 4096, coalesce_latency: float = 0.0):
+        if capacity < 1 or coalesce_bytes < 1:
+            raise ValueError("capacity and coalesce_bytes must be at least 1")
+        self.capacity = capacity
+        self.coalesce_bytes = coalesce_bytes
+        self.coalesce_latency = coalesce_latency
+        self.pending_bytes = 0  # Queued or being written
+        self.writes = 0
+        self.packets = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.error: Optional[BaseException] = None
+        self._write = write
+        self._packets = deque()
+        self._queued_bytes = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self._packets)
+
+    def put(self, packet: bytes, timeout: Optional[float] = None) -> bool:
+        """Queue a packet; returns False if there was no room within `timeout`"""
+        size = len(packet)
+        with self._cond:
+            self._raise_error()
+            if self._closed:
+                raise OSError("transmit queue is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quickcan-writer", daemon=True)
+                self._thread.start()
+            # An oversized packet still goes out once everything before it has
+            if self.pending_bytes and self.pending_bytes + size > self.capacity:
+                if not self._cond.wait_for(self._has_room(size), timeout):
+                    return False
+                self._raise_error()
+                if self._closed:
+                    raise OSError("transmit queue is closed")
+            self._packets.append(packet)
+            self._queued_bytes += size
+            self.pending_bytes += size
+            self._cond.notify_all()
+        return True
+
+    def _has_room(self, size: int) -> Callable[[], bool]:
+        return lambda: (self._closed or self.error is not None or not self.pending_bytes
+                        or self.pending_bytes + size <= self.capacity)
+
+    def _raise_error(self):
+        error = self.error
+        if error is not None:
+            # The original traceback was logged when the write failed
+            raise error.with_traceback(None)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued packet has been written"""
+        with self._cond:
+            self._raise_error()
+            flushed = self._cond.wait_for(lambda: not self.pending_bytes, timeout)
+            self._raise_error()
+        return flushed
+
+    def close(self, timeout: float = 1.0):
+        """Write what is queued (within `timeout`) and stop the writer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._cond:
+            self._raise_error()
+
+    def _run(self):
+        cond = self._cond
+        packets = self._packets
+        while True:
+            with cond:
+                cond.wait_for(lambda: packets or self._closed)
+                if not packets:
+                    return  # Closed and drained
+                if self.coalesce_latency > 0 and not self._closed:
+                    cond.wait_for(lambda: self._queued_bytes >= self.coalesce_bytes or self._closed,
+                                  self.coalesce_latency)
+                parts = [packets.popleft()]
+                size = len(parts[0])
+                while packets and size + len(packets[0]) <= self.coalesce_bytes:
+                    packet = packets.popleft()
+                    parts.append(packet)
+                    size += len(packet)
+                self._queued_bytes -= size
+            try:
+                self._write(parts[0] if len(parts) == 1 else b"".join(parts))
+                error = None
+            except Exception as e:
+                error = e
+                logger.exception("Serial write of %d packets failed", len(parts))
+            with cond:
+                self.pending_bytes -= size
+                if error is None:
+                    self.writes += 1
+                    self.packets += len(parts)
+                    self.bytes_written += size
+                else:
+                    self.errors += 1
+                    if self.error is None:
+                        self.error = error
+                cond.notify_all()
@@ -0,0 +1,93 @@
+# quickcan/utils/clock.py
+
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+__all__ = ["ClockSync"]
+
+
+class ClockSync:
+    """
+    Maps a wrapping device tick counter onto the host clock.
+
+    The host always sees a frame after the device stamped it, so each
+    (device time, host receive time) pair bounds the clock offset from
+    above. The smallest host - device difference in every `window`
+    seconds of device time (the sample with the least transport delay) is
+    kept, and a least-squares line through the last `windows` minima gives
+    the offset and drift. Until the first window closes, the running
+    minimum is used as a plain offset.
+    """
+
+    def __init__(self, tick: float = 1e-6, bits: int = 32, window: float = 1.0, windows: int = 16):
+        self.tick = tick
+        self.window = window
+        self.offset = 0.0  # host - device at device time `reference`
+        self.drift = 0.0   # host seconds gained per device second
+        self.reference = 0.0
+        self.samples = 0
+        self.wrap = 1 << bits  # Device counter period in ticks
+        self._half_wrap = self.wrap >> 1
+        self._wraps = 0
+        self._last_ticks: Optional[int] = None
+        self._points: Deque[Tuple[float, float]] = deque(maxlen=windows)
+        self._window_end: Optional[float] = None
+        self._window_min: Optional[Tuple[float, float]] = None
+
+    def device_seconds(self, ticks: int) -> float:
+        """Device time of a tick count, unwrapping counter overflows"""
+        last = self._last_ticks
+        wraps = self._wraps
+        if last is not None:
+            if last - ticks > self._half_wrap:
+                wraps += self.wrap
+                self._wraps = wraps
+            elif ticks - last > self._half_wrap:
+                # Late sample from before the last overflow
+                return (wraps - self.wrap + ticks) * self.tick
+        self._last_ticks = ticks
+        return (wraps + ticks) * self.tick
+
+    def update(self, ticks: int, host_time: float) -> float:
+        """Add a sample received at `host_time`; returns when the device stamped it, in host time"""
+        last = self._last_ticks
+        if last is not None and 0 <= ticks - last < self._half_wrap:
+            # Common case: counter moved forward without overflowing
+            self._last_ticks = ticks
+            device = (self._wraps + ticks) * self.tick
+        else:
+            device = self.device_seconds(ticks)
+        diff = host_time - device
+        self.samples += 1
+        current = self._window_min
+        if current is None or diff < current[1]:
+            self._window_min = (device, diff)
+            if self._window_end is None:
+                self._window_end = device + self.window
+            if not self._points:
+                self.offset, self.reference = diff, device
+        if device >= self._window_end:
+            self._close_window(device)
+        estimate = device + self.offset + self.drift * (device - self.reference)
+        return estimate if estimate < host_time else host_time
+
+    def to_host(self, ticks: int) -> float:
+        """Host time of a device tick count, without adding a sample"""
+        device = self.device_seconds(ticks)
+        return device + self.offset + self.drift * (device - self.reference)
+
+    def _close_window(self, device: float):
+        self._points.append(self._window_min)
+        self._window_min = None
+        self._window_end = device + self.window
+        points = self._points
+        n = len(points)
+        # Fit relative to the first point, the absolute offsets are large
+        x0, y0 = points[0]
+        mean_x = sum(x - x0 for x, _ in points) / n
+        mean_y = sum(y - y0 for _, y in points) / n
+        var = sum((x - x0 - mean_x) ** 2 for x, _ in points)
+        if var > 0:
+            self.drift = sum((x - x0 - mean_x) * (y - y0 - mean_y) for x, y in points) / var
+        self.reference = x0 + mean_x
+        self.offset = y0 + mean_y
@@ -1,28 +1,158 @@
 # Utils: Checksums, timestamps, etc.
 # quickcan/utils/helpers.py
+#
+# Every function accepts any bytes-like object (bytes, bytearray,
+# memoryview) and does its per-byte work inside C-level bytes methods.
 
-def checksum(data: bytes) -> int:
-    return sum(data) % 256
+import zlib
+
+__all__ = ["checksum", "escape_data", "unescape_data", "escape_into", "unescape_into"]
+
+ESCAPE = b"\xab"
+# Escape pairs produced by escape_data, and the bytes they stand for
+_ESCAPED_START = b"\xab\x8a"
+_ESCAPED_ESCAPE = b"\xab\x8b"
+
+# adler32's low half is 1 + sum(bytes) mod 65521: exact while 255 * len < 65520
+_ADLER_CHUNK = 256
+
+
+def checksum(data) -> int:
+    """Sum of the bytes modulo 256"""
+    if len(data) <= _ADLER_CHUNK:
+        return ((zlib.adler32(data) & 0xFFFF) - 1) & 0xFF
+    view = memoryview(data).cast("B")
+    total = 0
+    for i in range(0, len(view), _ADLER_CHUNK):
+        total += (zlib.adler32(view[i:i + _ADLER_CHUNK]) & 0xFFFF) - 1
+    return total & 0xFF
+
+
+def escape_data(data) -> bytes:
+    # ESCAPE_BYTE first, so escapes inserted for START_BYTE aren't escaped again
+    return bytes(data).replace(b"\xab", _ESCAPED_ESCAPE).replace(b"\xaa", _ESCAPED_START)
+
+
+def unescape_data(data) -> bytes:
+    """
+    Undo escaping: every ESCAPE_BYTE is dropped and the byte after it
+    XORed with 0x20; a trailing ESCAPE_BYTE is dropped.
+    """
+    data = bytes(data)
+    escapes = data.count(ESCAPE)
+    if not escapes:
+        return data
+    # START pairs first, as their result can't start another pair. Each
+    # replacement consumes one ESCAPE_BYTE, so if all of them went, every
+    # escape was a pair escape_data produces and the result is exact.
+    result = data.replace(_ESCAPED_START, b"\xaa").replace(_ESCAPED_ESCAPE, ESCAPE)
+    if len(result) + escapes == len(data):
+        return result
+    return _unescape_any(data)
 
-def escape_data(data: bytes) -> bytes:
-    escaped = bytearray()
-    for b in data:
-        if b in (0xAA, 0xAB):
-            escaped.append(0xAB)
-            escaped.append(b ^ 0x20)
-        else:
-            escaped.append(b)
-    return bytes(escaped)
 
-def unescape_data(data: bytes) -> bytes:
+def _unescape_any(data: bytes) -> bytes:
+    """Unescape arbitrary input, one escape at a time"""
     result = bytearray()
-    it = iter(data)
-    for b in it:
-        if b == 0xAB:
-            next_byte = next(it, None)
-            if next_byte is None:
-                break
-            result.append(next_byte ^ 0x20)
-        else:
-            result.append(b)
+    find = data.find
+    size = len(data)
+    start = 0
+    while True:
+        pos = find(ESCAPE, start)
+        if pos < 0:
+            result += data[start:]
+            break
+        result += data[start:pos]
+        if pos + 1 == size:
+            break
+        result.append(data[pos + 1] ^ 0x20)
+        start = pos + 2
     return bytes(result)
+
+
+def _source(data):
+    """`data` as a byte view, and something with C-level find/count over it"""
+    src = memoryview(data)
+    if src.format != "B":
+        src = src.cast("B")
+    return src, (data if isinstance(data, (bytes, bytearray)) else src.tobytes())
+
+
+def _target(out, offset: int, size: int) -> memoryview:
+    view = memoryview(out)
+    if view.format != "B":
+        view = view.cast("B")
+    if offset < 0 or offset + size > len(view):
+        raise ValueError(f"{size} bytes don't fit at offset {offset} of a {len(view)} byte buffer")
+    return view
+
+
+def escape_into(data, out, offset: int = 0) -> int:
+    """
+    Write the escaped form of `data` into the writable buffer `out` at
+    `offset`; returns the number of bytes written (len(data) plus one per
+    escape). Runs between escapes are copied slice to slice, without an
+    intermediate bytes object, so it pays off for the usual payloads with
+    few bytes to escape; `out` is untouched if it is too small.
+    """
+    src, buf = _source(data)
+    find = buf.find
+    if find(b"\xaa") < 0 and find(ESCAPE) < 0:  # find() is memchr, much faster than count()
+        view = _target(out, offset, len(src))
+        view[offset:offset + len(src)] = src
+        return len(src)
+    size = len(src) + buf.count(b"\xaa") + buf.count(ESCAPE)
+    view = _target(out, offset, size)
+    pos = offset
+    start = 0
+    # Next 0xAA and next 0xAB; only the one just consumed is searched again
+    a = find(b"\xaa")
+    b = find(ESCAPE)
+    while a >= 0 or b >= 0:
+        if b < 0 or 0 <= a < b:
+            i = a
+            a = find(b"\xaa", i + 1)
+        else:
+            i = b
+            b = find(ESCAPE, i + 1)
+        view[pos:pos + i - start] = src[start:i]
+        pos += i - start
+        view[pos] = 0xAB
+        view[pos + 1] = buf[i] ^ 0x20
+        pos += 2
+        start = i + 1
+    view[pos:offset + size] = src[start:]
+    return size
+
+
+def unescape_into(data, out, offset: int = 0) -> int:
+    """
+    Write the unescaped form of `data` (as unescape_data) into the
+    writable buffer `out` at `offset`; returns the number of bytes written
+    (len(data) minus one per escape). `out` is untouched if it is too small.
+    """
+    src, buf = _source(data)
+    if ESCAPE not in buf:
+        view = _target(out, offset, len(src))
+        view[offset:offset + len(src)] = src
+        return len(src)
+    # Escape positions first, so the size is known before anything is written
+    find = buf.find
+    escapes = []
+    i = find(ESCAPE)
+    while i >= 0:
+        escapes.append(i)
+        i = find(ESCAPE, i + 2)
+    size = len(src) - len(escapes)
+    view = _target(out, offset, size)
+    pos = offset
+    start = 0
+    for i in escapes:
+        view[pos:pos + i - start] = src[start:i]
+        pos += i - start
+        if i + 1 < len(src):  # A trailing ESCAPE_BYTE is dropped
+            view[pos] = buf[i + 1] ^ 0x20
+            pos += 1
+        start = i + 2
+    view[pos:offset + size] = src[start:]
+    return size
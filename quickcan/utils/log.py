@@ -0,0 +1,85 @@
+# quickcan/utils/log.py
+#
+# quickcan logs through the "quickcan" logger hierarchy and configures
+# nothing on import: applications route it with their own logging setup,
+# scripts can call configure_logging(). Individual frames are only logged
+# by a FrameTracer, at DEBUG on "quickcan.trace", sampled and rate-limited
+# so that enabling it can't swamp the send and receive paths.
+
+import logging
+import time
+from typing import Optional
+
+__all__ = ["configure_logging", "FrameTracer", "TRACE_LOGGER"]
+
+TRACE_LOGGER = "quickcan.trace"
+LOG_FORMAT = "🔹 [%(asctime)s] [%(levelname)s] %(name)s: %(message)s"
+LOG_DATEFMT = "%H:%M:%S"
+
+_handler: Optional[logging.Handler] = None
+
+
+def configure_logging(level: int = logging.INFO, trace: bool = False,
+                      handler: Optional[logging.Handler] = None) -> logging.Logger:
+    """
+    Print quickcan's log records (to stderr unless `handler` is given);
+    `trace` also logs individual frames through the FrameTracers.
+    Calling it again replaces the previous handler.
+    """
+    global _handler
+    logger = logging.getLogger("quickcan")
+    if _handler is not None:
+        logger.removeHandler(_handler)
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATEFMT))
+    _handler = handler
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logging.getLogger(TRACE_LOGGER).setLevel(logging.DEBUG if trace else max(level, logging.INFO))
+    return logger
+
+
+class FrameTracer:
+    """
+    DEBUG log of individual frames: every `sample_every`-th frame is
+    logged, at most `max_per_second` a second, with a count of the ones
+    left out when the rate limit kicked in. Check `enabled` before
+    tracing on a hot path; it is False unless "quickcan.trace" logs DEBUG.
+    """
+    __slots__ = ("logger", "sample_every", "max_per_second", "seen", "suppressed", "_window", "_logged")
+
+    def __init__(self, logger: Optional[logging.Logger] = None, sample_every: int = 1,
+                 max_per_second: float = 100):
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.logger = logger or logging.getLogger(TRACE_LOGGER)
+        self.sample_every = sample_every
+        self.max_per_second = max_per_second
+        self.seen = 0
+        self.suppressed = 0
+        self._window = 0.0
+        self._logged = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    def trace(self, direction: str, cmd, frame):
+        """Log one frame ("TX"/"RX") if it is sampled and within the rate limit"""
+        self.seen += 1
+        if self.seen % self.sample_every:
+            return
+        now = time.monotonic()
+        if now - self._window >= 1.0:
+            if self.suppressed:
+                self.logger.debug("%d frames not traced (rate limit)", self.suppressed)
+                self.suppressed = 0
+            self._window = now
+            self._logged = 0
+        if self._logged >= self.max_per_second:
+            self.suppressed += 1
+            return
+        self._logged += 1
+        self.logger.debug("%s %s ID=0x%X%s Data=%s", direction, cmd.name, frame.can_id,
+                          " (ext)" if frame.extended else "", frame.data.hex(" "))
@@ -6,6 +6,7 @@ setup(
     description='QuickCAN - USB to CAN Python interface',
     author='Alok Mishra',
     packages=find_packages(),
+    python_requires='>=3.10',
     install_requires=['pyserial', 'python-can'],
     entry_points={
         'console_scripts': [
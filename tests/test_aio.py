@@ -0,0 +1,122 @@
+# Test: asyncio transport
+import asyncio
+import os
+import sys
+
+import pytest
+
+from quickcan.aio import AsyncQuickCAN
+from quickcan.protocol import CANFrame, Command, encode_frame, decode_frame
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+
+class DeviceTransport(asyncio.Transport):
+    """In-memory transport answering requests like a QuickCAN device"""
+
+    def __init__(self, protocol, config=None):
+        super().__init__()
+        self.protocol = protocol
+        self.config = config or {}
+        self.decoder = FrameStreamDecoder()
+        self.closed = False
+        protocol.connection_made(self)
+
+    def write(self, data):
+        loop = asyncio.get_running_loop()
+        for raw in self.decoder.feed_bytes(data):
+            cmd, frame = decode_frame(raw)
+            if cmd == Command.CONFIG_GET:
+                key = frame.data[0]
+                reply = CANFrame(0, [key] + self.config.get(key, []))
+            elif cmd in (Command.PING, Command.DEVICE_INFO):
+                reply = CANFrame(0, [0x01])
+            else:
+                continue
+            loop.call_soon(self.protocol.data_received, encode_frame(reply, cmd=cmd))
+
+    def inject(self, packet: bytes):
+        self.protocol.data_received(packet)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.protocol.connection_lost(None)
+
+    def is_closing(self):
+        return self.closed
+
+
+def test_request_responses_resolve():
+    async def main():
+        can = AsyncQuickCAN()
+        DeviceTransport(can.protocol, config={1: [0x10], 2: [0x20, 0x21]})
+
+        assert (await can.ping()).data == b"\x01"
+        assert (await can.device_info()).data == b"\x01"
+        # Pipelined requests resolve by config key, not arrival order
+        values = await asyncio.gather(can.config_get(2), can.config_get(1))
+        assert values == [b"\x20\x21", b"\x10"]
+        can.close()
+
+    asyncio.run(main())
+
+
+def test_request_timeout_and_close():
+    async def main():
+        can = AsyncQuickCAN()
+        transport = DeviceTransport(can.protocol)
+        with pytest.raises(asyncio.TimeoutError):
+            await can.request(Command.RESET, timeout=0.01)
+        assert not any(can._pending.values())
+
+        pending = asyncio.ensure_future(can.request(Command.RESET, timeout=1.0))
+        await asyncio.sleep(0)
+        transport.close()
+        with pytest.raises(ConnectionError):
+            await pending
+
+    asyncio.run(main())
+
+
+def test_frames_iterator_until_close():
+    async def main():
+        can = AsyncQuickCAN()
+        transport = DeviceTransport(can.protocol)
+        commands = []
+        can.command_callback = lambda cmd, f: commands.append(cmd)
+
+        transport.inject(b"".join(encode_frame(CANFrame(i, [i])) for i in range(3)))
+        transport.inject(encode_frame(CANFrame(0, []), cmd=Command.HEARTBEAT))
+        asyncio.get_running_loop().call_later(0.01, transport.close)
+
+        ids = [frame.can_id async for frame in can.frames()]
+        assert ids == [0, 1, 2]
+        assert commands == [Command.HEARTBEAT]
+
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a pty pair")
+def test_serial_pty_ping():
+    async def main():
+        master, slave = os.openpty()
+        loop = asyncio.get_running_loop()
+        decoder = FrameStreamDecoder()
+
+        def device_ready():
+            for raw in decoder.feed_bytes(os.read(master, 1024)):
+                cmd, frame = decode_frame(raw)
+                os.write(master, encode_frame(CANFrame(0, [0x2A]), cmd=cmd))
+
+        loop.add_reader(master, device_ready)
+        can = await AsyncQuickCAN.open(os.ttyname(slave))
+        try:
+            response = await can.ping(timeout=2.0)
+            assert response.data == b"\x2A"
+        finally:
+            loop.remove_reader(master)
+            can.close()
+            os.close(master)
+            os.close(slave)
+
+    asyncio.run(main())
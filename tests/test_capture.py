@@ -0,0 +1,96 @@
+# Test: Capture log and replay
+import time
+
+import pytest
+
+from quickcan.capture import CaptureWriter, CaptureReader, replay, FILE_HEADER, RECORD
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, FLAG_FD, FLAG_BRS
+from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+
+def write_capture(path, frames):
+    with CaptureWriter(str(path), block_records=3) as writer:
+        for frame in frames:
+            writer.write_frame(frame)
+    return str(path)
+
+
+def test_capture_round_trip(tmp_path):
+    frames = [CANFrame(0x100 + i, bytes(range(i % 9)), extended=i % 2 == 1, timestamp=100.0 + i)
+              for i in range(10)]
+    path = write_capture(tmp_path / "log.qcap", frames)
+
+    with CaptureReader(path) as reader:
+        assert len(reader) == 10
+        assert [(f.can_id, f.data, f.extended, f.timestamp) for f in reader] == \
+               [(f.can_id, f.data, f.extended, f.timestamp) for f in frames]
+        batch = reader.to_batch()
+        assert list(batch.can_ids) == [f.can_id for f in frames]
+        assert batch.data(8) == bytes(range(8))
+
+
+def test_capture_ignores_truncated_record(tmp_path):
+    path = write_capture(tmp_path / "log.qcap", [CANFrame(1, b"\x01"), CANFrame(2, b"\x02")])
+    with open(path, "r+b") as f:
+        f.truncate(FILE_HEADER.size + RECORD.size + 5)
+    with CaptureReader(path) as reader:
+        assert [f.can_id for f in reader] == [1]
+
+    (tmp_path / "bad.qcap").write_bytes(b"not a capture")
+    with pytest.raises(ValueError):
+        CaptureReader(str(tmp_path / "bad.qcap"))
+
+
+def test_fd_capture_round_trip(tmp_path):
+    frames = [CANFrame(0x100, bytes(range(64)), flags=FLAG_FD | FLAG_BRS, timestamp=1.0),
+              CANFrame(0x101, b"\x01\x02", extended=True, timestamp=2.0)]
+    with CaptureWriter(str(tmp_path / "fd.qcap"), fd=True) as writer:
+        writer.write_batch([(Command.CAN_SEND, frame) for frame in frames])
+
+    with CaptureReader(writer.path) as reader:
+        assert reader.fd
+        assert [(f.can_id, f.data, f.extended, f.is_fd, f.bitrate_switch) for f in reader] == \
+               [(0x100, bytes(range(64)), False, True, True), (0x101, b"\x01\x02", True, False, False)]
+        assert reader.to_batch().data(0) == bytes(range(64))
+
+    # Classic captures refuse FD frames instead of failing on the record layout
+    with CaptureWriter(str(tmp_path / "classic.qcap")) as writer:
+        for frame in frames[:1] + [CANFrame(0x102, b"\x01", flags=FLAG_FD)]:
+            with pytest.raises(ValueError):
+                writer.write_batch([(Command.CAN_SEND, frame)])
+    assert writer.count == 0
+
+
+def test_record_from_receive_path(tmp_path):
+    port = LoopbackSerial(SimulatedDevice())
+    can = QuickCAN(port)
+    writer = CaptureWriter(str(tmp_path / "rx.qcap"))
+    can.set_receive_batch_callback(writer.write_batch)
+    can.start()
+    can.send_ping()  # The response isn't CAN traffic and isn't recorded
+    port.feed(SimulatedDevice().traffic([CANFrame(0x123, b"\x01\x02"), CANFrame(0x456, b"")]))
+    deadline = time.monotonic() + 2.0
+    while writer.count < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    can.close()
+    writer.close()
+
+    with CaptureReader(writer.path) as reader:
+        assert [(f.can_id, f.data) for f in reader] == [(0x123, b"\x01\x02"), (0x456, b"")]
+
+
+def test_replay_timing_and_max_speed(tmp_path):
+    frames = [CANFrame(0x100 + i, [i], timestamp=50.0 + i * 0.02) for i in range(5)]
+    path = write_capture(tmp_path / "log.qcap", frames)
+
+    device = SimulatedDevice(loopback=True)
+    can = QuickCAN(LoopbackSerial(device))
+    start = time.perf_counter()
+    assert replay(can, path) == 5
+    assert time.perf_counter() - start >= 0.075
+    assert device.transmitted == 5
+
+    assert replay(can, path, speed=None, chunk=2) == 5
+    assert device.transmitted == 10
+    can.close()
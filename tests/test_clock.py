@@ -0,0 +1,31 @@
+# Test: Device/host clock correlation
+import random
+
+from quickcan.utils.clock import ClockSync
+
+
+def test_clock_sync_tracks_offset_and_drift_across_wrap():
+    rng = random.Random(1)
+    clock = ClockSync(window=0.5)
+    start_ticks = 0xFFFFFFFF - 3_000_000  # Counter wraps 3 s in
+    drift = 80e-6
+    errors = []
+    for i in range(100_000):
+        device = i * 100e-6
+        stamped = 1_700_000_000.0 + device * (1 + drift)
+        received = stamped + 0.0005 + rng.expovariate(1 / 0.002)
+        estimate = clock.update((start_ticks + int(device * 1e6)) & 0xFFFFFFFF, received)
+        assert estimate <= received
+        if i > 20_000:
+            errors.append(estimate - stamped)
+
+    assert abs(clock.drift - drift) < 2e-6
+    # Only the fixed minimum transport delay remains, with little jitter
+    assert 0.0004 < min(errors) and max(errors) < 0.0006
+
+
+def test_clock_sync_late_sample_before_wrap():
+    clock = ClockSync()
+    clock.update(0xFFFFFF00, 100.0)
+    clock.update(0x00000010, 100.0003)
+    assert clock.device_seconds(0xFFFFFF80) < clock.device_seconds(0x00000010)
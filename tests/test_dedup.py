@@ -0,0 +1,54 @@
+# Test: on-change delivery
+from quickcan.dedup import ChangeFilter
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, encode_frame
+from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+
+def test_change_filter_throttle_and_snapshot():
+    changes = ChangeFilter(min_interval=0.1, intervals={0x200: 0.0})
+    a, b = CANFrame(0x100, [1], timestamp=0.0), CANFrame(0x100, [2], timestamp=0.05)
+    raw_a, raw_b = encode_frame(a), encode_frame(b)
+    assert changes.accept(Command.CAN_SEND, a, raw_a)
+    assert changes.repeated_raw(raw_a, 0.01)
+    # Changed, but within min_interval: held back, though already in the snapshot
+    assert not changes.accept(Command.CAN_SEND, b, raw_b)
+    assert changes.snapshot()[0x100].data == b"\x02"
+    assert not changes.repeated_raw(raw_b, 0.08)
+    assert changes.accept(Command.CAN_SEND, CANFrame(0x100, [2], timestamp=0.12), raw_b)
+    assert changes.repeated_raw(raw_b, 0.5) and changes.snapshot()[0x100].timestamp == 0.5
+    # Per-ID interval, extended IDs kept apart, other commands never held back
+    assert changes.accept(Command.CAN_SEND, CANFrame(0x200, [1], timestamp=0.0))
+    assert changes.accept(Command.CAN_SEND, CANFrame(0x200, [2], timestamp=0.001))
+    assert changes.accept(Command.CAN_SEND, CANFrame(0x100, [1], extended=True, timestamp=0.5))
+    assert changes.accept(Command.PING, a) and changes.accept(Command.PING, a)
+    assert (changes.delivered, changes.unchanged, changes.throttled) == (5, 2, 1)
+    assert len(changes) == 3
+
+
+def test_quickcan_delivers_changes_only():
+    port = LoopbackSerial(SimulatedDevice())
+    driver = QuickCAN(port)
+    received = []
+    driver.set_receive_callback(lambda cmd, frame: received.append((frame.can_id, frame.data)))
+    driver.set_on_change()
+    # 0x1AA has an escaped header; 0x101 changes every 5th cycle
+    for cycle in range(20):
+        frames = [CANFrame(0x100, [1, 2]), CANFrame(0x101, [cycle // 5]), CANFrame(0x1AA, [0xAA])]
+        port.feed(b"".join(encode_frame(frame) for frame in frames))
+        driver.receive()
+    assert received == [(0x100, b"\x01\x02"), (0x101, b"\x00"), (0x1AA, b"\xaa"),
+                        (0x101, b"\x01"), (0x101, b"\x02"), (0x101, b"\x03")]
+    assert driver.stats.frames_unchanged == 60 - 6
+    # Only the first frame of each ID was decoded; later repeats matched on raw bytes
+    assert driver.stats.frames_decoded <= 6 + 3
+    snapshot = driver.snapshot()
+    assert {can_id: frame.data for can_id, frame in snapshot.items()} == {
+        0x100: b"\x01\x02", 0x101: b"\x03", 0x1AA: b"\xaa"}
+    # Responses still reach their requests
+    assert driver.ping() > 0
+    driver.set_on_change(False)
+    port.feed(encode_frame(CANFrame(0x100, [1, 2])))
+    driver.receive()
+    assert received[-1] == (0x100, b"\x01\x02")
+    driver.close()
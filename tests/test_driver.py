@@ -1,8 +1,14 @@
 # Test: Driver interactions
+import threading
+import time
 import pytest
 from unittest.mock import MagicMock, patch
 from quickcan.driver import QuickCAN
-from quickcan.protocol import CANFrame, Command, encode_frame
+from quickcan.protocol import (
+    CANFrame, Command, encode_frame, encode_frames, PROTOCOL_VERSION, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD
+)
+from quickcan.transport.ring_buffer import FrameRingBuffer, DROP_OLDEST, DROP_NEWEST, BLOCK
+from quickcan.transport.tx_queue import TransmitQueue
 
 @pytest.fixture
 def mock_serial():
@@ -14,9 +20,18 @@ def mock_serial():
 def test_send_can_frame(mock_serial):
     driver = QuickCAN(port="COM1")
     driver.send(0x123, [0x01, 0x02, 0x03])
+    assert driver.flush(1.0)
     assert mock_serial.write.called
     driver.close()
 
+def test_send_many_single_write(mock_serial):
+    driver = QuickCAN(port="COM1")
+    frames = [CANFrame(0x100 + i, [i]) for i in range(10)]
+    driver.send_many(frames)
+    assert driver.flush(1.0)
+    mock_serial.write.assert_called_once_with(b"".join(encode_frame(f) for f in frames))
+    driver.close()
+
 def test_send_all_commands(mock_serial):
     driver = QuickCAN(port="COM1")
 
@@ -27,8 +42,10 @@ def test_send_all_commands(mock_serial):
     driver.send_ping()
     driver.send_config_get(0x01)
     driver.send_config_set(0x02, [0x10, 0x20])
+    assert driver.flush(1.0)
 
-    assert mock_serial.write.call_count == 7
+    written = b"".join(call.args[0] for call in mock_serial.write.call_args_list)
+    assert written.count(bytes([0xAA])) == 7
     driver.close()
 
 @patch("quickcan.driver.serial.Serial")
@@ -40,14 +57,7 @@ def test_receive_valid_frame(mock_serial_cls):
 
     mock_serial = MagicMock()
     mock_serial.in_waiting = len(raw_bytes)
-
-    def fake_read():
-        for b in raw_bytes:
-            yield bytes([b])
-        while True:
-            yield b''
-
-    mock_serial.read = MagicMock(side_effect=fake_read())
+    mock_serial.read = MagicMock(return_value=raw_bytes)
     mock_serial_cls.return_value = mock_serial
 
     received = []
@@ -62,4 +72,486 @@ def test_receive_valid_frame(mock_serial_cls):
     assert len(received) == 1
     assert received[0][0] == Command.CAN_SEND
     assert received[0][1].can_id == 0x123
-    assert received[0][1].data == [0x01, 0x02]
\ No newline at end of file
+    assert received[0][1].data == bytes([0x01, 0x02])
+    mock_serial.read.assert_called_once_with(len(raw_bytes))
+
+
+class FakeSerial:
+    """Simulated serial port: bytes queued by the device side are readable"""
+
+    def __init__(self, timeout=0.01):
+        self.rx = bytearray()
+        self.written = bytearray()
+        self.timeout = timeout
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def read(self, size=1):
+        if not self.rx:
+            time.sleep(self.timeout)  # Like a real port blocking until timeout
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def close(self):
+        pass
+
+@pytest.mark.parametrize("version", [0x01, PROTOCOL_VERSION_2])
+def test_single_response_delivered_without_trailing_frame(version):
+    port = FakeSerial()
+    received = []
+    driver = QuickCAN(port, protocol_version=version)
+    driver.set_receive_callback(lambda cmd, f: received.append((cmd, f)))
+
+    driver.send_ping()
+    assert driver.flush(1.0)
+    assert port.written == encode_frame(CANFrame(0x00, []), cmd=Command.PING, version=version)
+
+    port.rx += encode_frame(CANFrame(0x00, [0x01]), cmd=Command.PING, version=version)
+    driver.receive()
+
+    # Delivered on the very first poll, nothing left waiting in the decoder
+    assert [cmd for cmd, _ in received] == [Command.PING]
+    assert driver.decoder.flush() is None
+
+def test_response_split_across_polls_delivered_on_last_byte():
+    port = FakeSerial()
+    received = []
+    driver = QuickCAN(port)
+    driver.set_receive_callback(lambda cmd, f: received.append(f))
+
+    raw = encode_frame(CANFrame(0x00, [0x05, 0xAA]), cmd=Command.CONFIG_GET)
+    for b in raw[:-1]:
+        port.rx.append(b)
+        driver.receive()
+    assert received == []
+
+    port.rx.append(raw[-1])
+    driver.receive()
+    assert received[0].data == bytes([0x05, 0xAA])
+
+def test_background_receive_dispatches_batches():
+    port = FakeSerial()
+    batches = []
+    received = []
+    done = threading.Event()
+
+    def callback(cmd, f):
+        received.append(f.can_id)
+        if len(received) == 20:
+            done.set()
+
+    driver = QuickCAN(port)
+    driver.set_receive_callback(callback)
+    driver.set_receive_batch_callback(batches.append)
+    driver.start(batch_size=8)
+    port.rx += b"".join(encode_frame(CANFrame(i, [i])) for i in range(20))
+
+    assert done.wait(2.0)
+    driver.close()
+    assert not driver.running
+    assert received == list(range(20))
+    assert all(len(batch) <= 8 for batch in batches)
+    assert driver.dropped_frames == 0
+
+def test_background_receive_survives_callback_error():
+    port = FakeSerial()
+    received = []
+    driver = QuickCAN(port)
+
+    def callback(cmd, f):
+        received.append(f.can_id)
+        raise RuntimeError("bad callback")
+
+    driver.set_receive_callback(callback)
+    driver.start(batch_size=1)
+    port.rx += encode_frame(CANFrame(1, []))
+    port.rx += encode_frame(CANFrame(2, []))
+    deadline = time.monotonic() + 2.0
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    driver.close()
+    assert received == [1, 2]
+
+def test_callback_error_skips_only_its_frame():
+    port = FakeSerial()
+    received = []
+    batches = []
+    driver = QuickCAN(port)
+
+    def callback(cmd, f):
+        if f.can_id % 3 == 0:
+            raise RuntimeError("bad frame")
+        received.append(f.can_id)
+
+    def batch_callback(batch):
+        batches.append(len(batch))
+        raise RuntimeError("bad batch")
+
+    driver.set_receive_callback(callback)
+    driver.set_receive_batch_callback(batch_callback)
+    port.rx += encode_frames([CANFrame(i, []) for i in range(12)])
+    driver.start(batch_size=16)
+    deadline = time.monotonic() + 2.0
+    while sum(batches) < 12 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    driver.close()
+    assert received == [i for i in range(12) if i % 3]
+    assert driver.stats.callback_errors == 4 + len(batches)
+
+@pytest.mark.parametrize("overflow, expected", [
+    (DROP_OLDEST, [2, 3, 4]),
+    (DROP_NEWEST, [0, 1, 2]),
+])
+def test_ring_buffer_drop_policies(overflow, expected):
+    ring = FrameRingBuffer(capacity=3, overflow=overflow)
+    for i in range(5):
+        ring.put(i)
+    assert ring.dropped == 2
+    assert ring.get_batch(10, timeout=0) == expected
+    assert ring.get_batch(10, timeout=0) == []
+
+def test_ring_buffer_block_policy():
+    ring = FrameRingBuffer(capacity=2, overflow=BLOCK)
+    ring.put(0)
+    ring.put(1)
+    assert not ring.put(2, timeout=0.02)
+    assert ring.dropped == 1
+
+    threading.Timer(0.05, ring.get_batch, args=(1,)).start()
+    assert ring.put(3, timeout=2.0)
+    assert ring.get_batch(10, timeout=0) == [1, 3]
+
+def test_ring_buffer_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        FrameRingBuffer(overflow="drop-all")
+
+def test_receive_timestamps_spread_over_chunk():
+    port = FakeSerial()
+    received = []
+    driver = QuickCAN(port, baudrate=1_000_000)
+    driver.set_receive_callback(lambda cmd, f: received.append(f.timestamp))
+
+    time.sleep(0.01)
+    port.rx += b"".join(encode_frame(CANFrame(i, [i] * 8)) for i in range(10))
+    wire_time = len(port.rx) * 10e-6  # 10 us per byte
+    before = time.time()
+    driver.receive()
+    after = time.time()
+
+    assert len(received) == 10
+    assert received == sorted(received) and len(set(received)) == 10
+    # Frames arrived over the chunk's time on the wire, ending by the read
+    assert before - wire_time <= received[0] and received[-1] <= after
+    assert received[-1] - received[0] == pytest.approx(wire_time * 9 / 10, rel=0.01)
+
+def test_receive_device_timestamps():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    device = SimulatedDevice(device_timestamps=True)
+    port = LoopbackSerial(device, timeout=0)
+    received = []
+    sent = []
+    driver = QuickCAN(port)
+    driver.set_receive_callback(lambda cmd, f: received.append(f.timestamp))
+
+    for _ in range(5):
+        sent.append(time.time())
+        port.feed(device.traffic([CANFrame(0x100, [1])]))
+        driver.receive()
+        time.sleep(0.002)
+
+    assert driver.clock_sync.samples == 5
+    # Device stamps map onto the host clock; the offset comes from the least delayed sample
+    host_steps = [b - a for a, b in zip(sent, sent[1:])]
+    device_steps = [b - a for a, b in zip(received, received[1:])]
+    assert all(abs(d - h) < 0.002 for d, h in zip(device_steps, host_steps))
+    assert abs(received[-1] - time.time()) < 0.01
+
+def test_receive_stats_count_rejects_and_resyncs():
+    port = FakeSerial()
+    driver = QuickCAN(port)
+    stages = []
+    driver.set_stage_hook(lambda stage, ns: stages.append(stage))
+
+    good = encode_frame(CANFrame(0x100, [1, 2]))
+    bad_checksum = good[:-1] + bytes([good[-1] ^ 0x01])
+    truncated = good[:5]
+    port.rx += good + bad_checksum + truncated + good
+    driver.receive()
+
+    stats = driver.stats
+    assert stats.reads == 1
+    assert stats.bytes_read == len(good) * 3 + 5
+    assert stats.frames_decoded == 2
+    assert stats.rejects == {"checksum": 1, "short": 1}
+    assert stats.resyncs == 1
+    assert stages == ["decode"]
+    assert "rejects checksum=1, short=1" in stats.summary()
+
+    stats.reset()
+    assert stats.frames_decoded == 0 and stats.resyncs == 0
+
+def test_background_receive_stats():
+    port = FakeSerial()
+    received = []
+    done = threading.Event()
+
+    def callback(batch):
+        received.extend(batch)
+        if len(received) == 10:
+            done.set()
+
+    driver = QuickCAN(port)
+    driver.set_filters([{"can_id": 0x100, "can_mask": 0x7FF}], device_filters=0)
+    driver.set_receive_batch_callback(callback)
+    driver.start(batch_size=8)
+    port.rx += b"".join(encode_frame(CANFrame(0x100 + i % 2, [i])) for i in range(20))
+
+    assert done.wait(2.0)
+    driver.close()
+    stats = driver.stats
+    assert stats.frames_decoded == 10 and stats.frames_filtered == 10
+    assert sum(stats.callback_histogram) == stats.callback_batches >= 2
+    assert stats.callback_percentile(99) >= stats.callback_percentile(50) > 0
+    assert 0 < stats.max_queue_depth <= 10
+    assert stats.dropped_frames == 0 and stats.queue_depth == 0
+
+def test_transmit_queue_coalesces_while_writing():
+    writes = []
+    release = threading.Event()
+
+    def write(data):
+        writes.append(data)
+        release.wait(2.0)
+
+    tx = TransmitQueue(write, coalesce_bytes=64)
+    tx.put(b"first")
+    while not writes:
+        time.sleep(0.001)
+    for i in range(20):
+        tx.put(bytes([i]) * 10)
+    release.set()
+    assert tx.flush(2.0)
+    tx.close()
+
+    assert writes[0] == b"first"
+    # Queued packets went out joined, never splitting one or exceeding coalesce_bytes
+    assert b"".join(writes[1:]) == b"".join(bytes([i]) * 10 for i in range(20))
+    assert len(writes) == 1 + 4 and all(len(w) <= 64 for w in writes)
+    assert tx.packets == 21 and tx.writes == 5
+
+def test_transmit_queue_backpressure():
+    release = threading.Event()
+    tx = TransmitQueue(lambda data: release.wait(2.0), capacity=30)
+    assert tx.put(b"x" * 20)
+    assert tx.put(b"y" * 10)
+    # Full until the blocked write completes
+    assert not tx.put(b"z", timeout=0.02)
+    threading.Timer(0.05, release.set).start()
+    assert tx.put(b"z" * 10, timeout=2.0)
+    assert tx.flush(2.0)
+    tx.close()
+    with pytest.raises(OSError):
+        tx.put(b"late")
+
+def test_transmit_queue_raises_write_errors():
+    def write(data):
+        if data == b"bad":
+            raise OSError("port gone")
+
+    tx = TransmitQueue(write)
+    assert tx.put(b"ok") and tx.flush(2.0)
+    tx.put(b"bad")
+    with pytest.raises(OSError, match="port gone"):
+        tx.flush(2.0)
+    # Every later call reports it, nothing more is queued
+    with pytest.raises(OSError, match="port gone"):
+        tx.put(b"ok")
+    with pytest.raises(OSError, match="port gone"):
+        tx.close()
+    assert tx.errors == 1 and tx.packets == 1
+
+def test_concurrent_senders():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    device = SimulatedDevice()
+    driver = QuickCAN(LoopbackSerial(device))
+    senders = [
+        threading.Thread(target=lambda n=n: [driver.send(0x100 + n, [i & 0xFF]) for i in range(200)])
+        for n in range(4)
+    ]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+    assert driver.flush(2.0)
+    driver.close()
+    assert device.transmitted == 800
+    assert driver.tx_queue.packets == 800 and driver.tx_queue.errors == 0
+
+def test_send_waits_for_ack():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    device = SimulatedDevice(ack_sends=True)
+    port = LoopbackSerial(device)
+    driver = QuickCAN(port, ack_sends=True)
+    driver.start()
+    driver.set_filters([{"can_id": 0x100, "can_mask": 0x700}])
+    # The filter commands' ACKs are not taken for the frame's
+    assert driver.send(0x123, [1], wait_ack=True, timeout=2.0) is True
+
+    device.ack_sends = False
+    with pytest.raises(TimeoutError):
+        driver.send(0x124, [1], wait_ack=True, timeout=0.05)
+    # A NACK arriving late still belongs to the timed out frame
+    nack = encode_frame(CANFrame(0x00, []), cmd=Command.NACK)
+    port.feed(nack)
+    threading.Timer(0.05, port.feed, args=(nack,)).start()
+    assert driver.send(0x125, [1], wait_ack=True, timeout=2.0) is False
+    driver.close()
+
+def test_ack_waiters_queued_before_the_packet_is_written():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    driver = QuickCAN(LoopbackSerial(SimulatedDevice(ack_sends=True)), ack_sends=True)
+    driver.start()
+    put = driver.tx_queue.put
+
+    def slow_put(packet, timeout=None):
+        # The ACK is read while put() is still returning
+        queued = put(packet, timeout)
+        time.sleep(0.05)
+        return queued
+
+    driver.tx_queue.put = slow_put
+    try:
+        for can_id in (0x100, 0x101, 0x102):
+            assert driver.send(can_id, [1], wait_ack=True, timeout=2.0) is True
+        assert not driver._acks
+        # A packet that wasn't queued takes its waiter back out
+        driver.tx_queue.put = lambda packet, timeout=None: False
+        with pytest.raises(TimeoutError):
+            driver.send(0x103, [1], wait_ack=True, timeout=0.01)
+        assert not driver._acks
+    finally:
+        driver.close()
+
+def test_acks_of_unwaited_sends_keep_their_place():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    class Device(SimulatedDevice):
+        # NACKs frames to 0x7FF, and never answers filter commands
+        def handle(self, cmd, can_id, flags, data):
+            if cmd == Command.CAN_SEND and can_id == 0x7FF:
+                self.transmitted += 1
+                return [(Command.NACK, CANFrame(0x00, []))]
+            if cmd in (Command.SET_FILTER, Command.CLEAR_FILTER):
+                return []
+            return super().handle(cmd, can_id, flags, data)
+
+    with pytest.raises(ValueError):
+        QuickCAN(LoopbackSerial(SimulatedDevice())).send(0x123, [1], wait_ack=True)
+
+    device = Device(ack_sends=True)
+    driver = QuickCAN(LoopbackSerial(device), ack_sends=True, ack_filters=False)
+    received = []
+    driver.set_receive_callback(lambda cmd, f: received.append(cmd))
+    driver.start()
+    driver.set_filters([{"can_id": 0x100, "can_mask": 0x700}])
+    driver.send(0x7FF, [1])
+    driver.send_many([CANFrame(0x7FF, [2]), CANFrame(0x123, [3])])
+    task = driver.send_periodic(CANFrame(0x7FF, [4]), 0.001, duration=0.02)
+    assert driver.send(0x123, [5], wait_ack=True, timeout=2.0) is True
+    assert driver.send(0x7FF, [6], wait_ack=True, timeout=2.0) is False
+    task.stop()
+    driver.flush()
+    deadline = time.monotonic() + 2.0
+    while driver._acks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not driver._acks
+    assert driver.send(0x123, [7], wait_ack=True, timeout=2.0) is True
+    driver.close()
+    # Every reply was taken as an ACK/NACK, none reached the callback
+    assert received == []
+
+def test_requests_resolve_with_matching_responses():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    device = SimulatedDevice(device_info=b"SIM", config={k: bytes([k, k]) for k in range(100)})
+    driver = QuickCAN(LoopbackSerial(device))
+    unsolicited = []
+    driver.set_receive_callback(lambda cmd, f: unsolicited.append(cmd))
+
+    # Without background threads the caller polls the port itself
+    assert driver.ping() > 0
+    assert driver.device_info() == b"SIM"
+    driver.send_ping()
+    assert driver.config_get(5) == b"\x05\x05"
+
+    driver.start()
+    assert driver.config_get_many(range(100), max_in_flight=16) == {k: bytes([k, k]) for k in range(100)}
+    driver.config_set(7, [1, 2])
+    assert driver.config_get(7) == b"\x01\x02"
+    driver.close()
+    # Only the fire-and-forget PING's response reached the callback
+    assert unsolicited == [Command.PING]
+
+def test_negotiate_protocol_version():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    # Devices without CAN FD keep their traffic in the version asked for
+    classic = SimulatedDevice()
+    driver = QuickCAN(LoopbackSerial(classic))
+    assert driver.negotiate_protocol() == PROTOCOL_VERSION_2
+    assert classic.traffic_version == PROTOCOL_VERSION_2
+    driver.close()
+
+    device = SimulatedDevice(fd=True, loopback=True)
+    driver = QuickCAN(LoopbackSerial(device))
+    received = []
+    driver.set_receive_callback(lambda cmd, frame: received.append(frame))
+    driver.start()
+    assert driver.negotiate_protocol(max_version=PROTOCOL_VERSION) == PROTOCOL_VERSION
+    assert driver.negotiate_protocol() == PROTOCOL_VERSION_FD == device.traffic_version
+    driver.send(0x123, list(range(21)), bitrate_switch=True)
+    driver.send(0x124, [1], fd=True)
+    deadline = time.monotonic() + 1.0
+    while len(received) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    driver.close()
+    assert received[0].data == bytes(range(21)) + bytes(3)
+    assert received[0].is_fd and received[0].bitrate_switch
+    assert received[1].data == b"\x01" and received[1].is_fd and not received[1].bitrate_switch
+
+def test_request_timeout_and_retries():
+    from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+    class LossyDevice(SimulatedDevice):
+        dropped = 0
+
+        def handle(self, cmd, can_id, flags, data):
+            if cmd == Command.PING and self.dropped < 2:
+                self.dropped += 1
+                return []
+            return super().handle(cmd, can_id, flags, data)
+
+    device = LossyDevice()
+    driver = QuickCAN(LoopbackSerial(device))
+    driver.start()
+    with pytest.raises(TimeoutError):
+        driver.ping(timeout=0.05)
+    assert driver.ping(timeout=0.05, retries=2) > 0
+    assert device.dropped == 2
+
+    # The simulator never answers HEARTBEAT: closing fails the request
+    pending = driver.submit(Command.HEARTBEAT, timeout=5.0)
+    driver.close()
+    with pytest.raises(ConnectionError):
+        pending.result(1.0)
@@ -0,0 +1,108 @@
+# Test: Host-side CAN ID filters
+import random
+import threading
+
+from quickcan.driver import QuickCAN
+from quickcan.filters import FilterEngine
+from quickcan.protocol import CANFrame, Command, encode_frame, PROTOCOL_VERSION_2
+from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+
+def reference_match(filters, can_id, extended):
+    """python-can's BusABC._matches_filters"""
+    if not filters:
+        return True
+    for f in filters:
+        if "extended" in f and f["extended"] != extended:
+            continue
+        if (f["can_id"] ^ can_id) & f["can_mask"] == 0:
+            return True
+    return False
+
+
+def test_engine_matches_python_can_semantics():
+    rng = random.Random(1)
+    for _ in range(50):
+        filters = []
+        for _ in range(rng.randint(0, 6)):
+            f = {"can_id": rng.randint(0, 0x1FFFFFFF),
+                 "can_mask": rng.choice([0x7FF, 0x1FFFFFFF, 0x700, 0x0F0, rng.randint(0, 0x1FFFFFFF)])}
+            if rng.random() < 0.5:
+                f["extended"] = rng.random() < 0.5
+            filters.append(f)
+        engine = FilterEngine(filters)
+        for _ in range(200):
+            extended = rng.random() < 0.5
+            can_id = rng.randint(0, 0x1FFFFFFF if extended else 0x7FF)
+            assert engine.matches(can_id, extended) == reference_match(filters, can_id, extended)
+
+
+def test_accepts_raw_header():
+    engine = FilterEngine([{"can_id": 0x1AA, "can_mask": 0x7FF, "extended": False}])
+    assert engine.accepts_raw(encode_frame(CANFrame(0x1AA, [1])))  # Escaped ID byte
+    assert engine.accepts_raw(encode_frame(CANFrame(0x1AA, [1]), version=PROTOCOL_VERSION_2))
+    assert not engine.accepts_raw(encode_frame(CANFrame(0x1AB, [1])))
+    assert not engine.accepts_raw(encode_frame(CANFrame(0x1AA, [1], extended=True)))
+    assert engine.accepts_raw(encode_frame(CANFrame(0x00, []), cmd=Command.PING))
+
+
+def test_device_filters_cover_host_filters():
+    filters = [{"can_id": 0x100 + i, "can_mask": 0x7FF, "extended": False} for i in range(4)]
+    engine = FilterEngine(filters)
+    assert len(engine.device_filters(8)) == 4
+
+    merged = engine.device_filters(1)
+    assert merged == [(0x100, 0x7FC, False)]
+    device = SimulatedDevice()
+    device.filters = merged
+    assert all(device.accepts(0x100 + i, False) for i in range(4))
+
+    assert engine.device_filters(0) == []
+    assert FilterEngine().device_filters(8) == []
+
+
+def test_quickcan_filters_host_and_device():
+    device = SimulatedDevice(max_filters=2)
+    port = LoopbackSerial(device)
+    received = []
+    done = threading.Event()
+
+    def callback(cmd, frame):
+        received.append((cmd, frame.can_id))
+        if cmd == Command.PING:
+            done.set()
+
+    can = QuickCAN(port)
+    can.set_receive_callback(callback)
+    can.set_filters([{"can_id": 0x120, "can_mask": 0x7F0, "extended": False},
+                     {"can_id": 0x300, "can_mask": 0x7FF}])
+    assert len(device.filters) == 2
+
+    can.start()
+    # Traffic the device let through anyway is still dropped on the host
+    port.feed(b"".join(encode_frame(CANFrame(can_id, [1])) for can_id in (0x123, 0x200, 0x300, 0x12F)))
+    port.feed(device.traffic([CANFrame(0x125, []), CANFrame(0x400, [])]))
+    can.send_ping()
+    assert done.wait(2.0)
+    can.close()
+
+    frames = [can_id for cmd, can_id in received if cmd == Command.CAN_SEND]
+    assert frames == [0x123, 0x300, 0x12F, 0x125]
+
+
+def test_quickcanbus_applies_filters():
+    from backend.quickcan_bus import QuickCANBus
+
+    device = SimulatedDevice()
+    port = LoopbackSerial(device)
+    bus = QuickCANBus(port, can_filters=[{"can_id": 0x300, "can_mask": 0x7FF, "extended": False}])
+    try:
+        assert device.filters == [(0x300, 0x7FF, False)]
+        port.feed(b"".join(encode_frame(CANFrame(can_id, [1])) for can_id in (0x200, 0x300)))
+        assert bus.recv(timeout=1.0).arbitration_id == 0x300
+        assert bus.recv(timeout=0.1) is None
+
+        bus.set_filters(None)
+        assert device.filters == []
+    finally:
+        bus.shutdown()
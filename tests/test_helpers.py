@@ -0,0 +1,90 @@
+# Test: Checksum and escaping helpers, against the original per-byte versions
+import random
+
+import pytest
+
+from quickcan.utils.helpers import checksum, escape_data, unescape_data, escape_into, unescape_into
+
+
+def reference_checksum(data):
+    return sum(data) % 256
+
+
+def reference_escape(data):
+    result = bytearray()
+    for b in data:
+        if b in (0xAA, 0xAB):
+            result += bytes([0xAB, b ^ 0x20])
+        else:
+            result.append(b)
+    return bytes(result)
+
+
+def reference_unescape(data):
+    result = bytearray()
+    it = iter(data)
+    for b in it:
+        if b == 0xAB:
+            next_byte = next(it, None)
+            if next_byte is None:
+                break
+            result.append(next_byte ^ 0x20)
+        else:
+            result.append(b)
+    return bytes(result)
+
+
+def fuzz_inputs(count=3000, seed=7):
+    """Random buffers, from plain to dense in 0xAA/0xAB/0x8A/0x8B runs"""
+    rng = random.Random(seed)
+    special = (0xAA, 0xAB, 0x8A, 0x8B)
+    for _ in range(count):
+        size = rng.choice((0, 1, 2, 3, 8, 13, 64, 255, 256, 257, 600))
+        density = rng.choice((0.0, 0.02, 0.2, 0.8, 1.0))
+        yield bytes(rng.choice(special) if rng.random() < density else rng.randrange(256) for _ in range(size))
+
+
+@pytest.mark.parametrize("kind", [bytes, bytearray, memoryview])
+def test_equivalent_to_reference(kind):
+    for data in fuzz_inputs(1000 if kind is bytes else 200):
+        buf = kind(data)
+        assert checksum(buf) == reference_checksum(data)
+        assert escape_data(buf) == reference_escape(data)
+        # Arbitrary input, including malformed escapes and a trailing ESCAPE_BYTE
+        assert unescape_data(buf) == reference_unescape(data)
+        assert unescape_data(kind(escape_data(data))) == data
+
+
+def test_checksum_large_buffers():
+    data = bytes([0xFF]) * 100_000
+    assert checksum(data) == reference_checksum(data)
+    assert checksum(memoryview(data)[3:-5]) == reference_checksum(data[3:-5])
+
+
+def test_into_caller_buffers():
+    rng = random.Random(3)
+    for data in fuzz_inputs(300, seed=11):
+        out = bytearray(2 * len(data) + 4)
+        offset = rng.randrange(5)
+        n = escape_into(data, out, offset)
+        assert bytes(out[offset:offset + n]) == reference_escape(data)
+
+        escaped = memoryview(bytes(out))[offset:offset + n]
+        target = memoryview(bytearray(len(data) + 4))
+        m = unescape_into(escaped, target[2:])
+        assert m == len(data) and bytes(target[2:2 + m]) == data
+
+        # Arbitrary input, including malformed escapes and a trailing ESCAPE_BYTE
+        expected = reference_unescape(data)
+        out = bytearray(len(data) + 1)
+        n = unescape_into(memoryview(data), out, 1)
+        assert bytes(out[1:1 + n]) == expected
+
+
+def test_into_rejects_small_buffers():
+    out = bytearray(3)
+    with pytest.raises(ValueError):
+        escape_into(b"\xaa\xaa", out)
+    with pytest.raises(ValueError):
+        unescape_into(b"\x01\x02", out, offset=2)
+    assert out == bytearray(3)
@@ -0,0 +1,58 @@
+# Test: Library logging setup and the sampled frame tracer
+import logging
+import subprocess
+import sys
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command
+from quickcan.utils.log import FrameTracer, TRACE_LOGGER, configure_logging
+
+
+class NullSerial:
+    in_waiting = 0
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+def test_import_leaves_root_logger_alone():
+    code = "import logging, quickcan.driver; print(len(logging.getLogger().handlers), logging.getLogger().level)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.split() == ["0", str(logging.WARNING)]
+
+
+def test_tracer_samples_and_rate_limits(caplog):
+    tracer = FrameTracer(sample_every=3, max_per_second=2)
+    frame = CANFrame(0x123, [1, 2])
+    assert not tracer.enabled
+    with caplog.at_level(logging.DEBUG, logger=TRACE_LOGGER):
+        assert tracer.enabled
+        for _ in range(12):
+            tracer.trace("TX", Command.CAN_SEND, frame)
+    # Frames 3, 6, 9 and 12 are sampled; the limit lets two of them through
+    assert [r.getMessage() for r in caplog.records] == ["TX CAN_SEND ID=0x123 Data=01 02"] * 2
+    assert tracer.seen == 12 and tracer.suppressed == 2
+
+
+def test_send_traces_only_when_enabled(caplog):
+    handler = logging.NullHandler()
+    can = QuickCAN(NullSerial())
+    try:
+        with caplog.at_level(logging.DEBUG, logger="quickcan.driver"):
+            can.send(0x100, [1])
+        assert not caplog.records  # Per-frame records only come from the tracer
+
+        configure_logging(logging.WARNING, trace=True, handler=handler)
+        with caplog.at_level(logging.DEBUG, logger=TRACE_LOGGER):
+            can.send(0x101, [2], extended=True)
+            can.send_many([CANFrame(0x102, [3])])
+        assert [r.getMessage() for r in caplog.records] == [
+            "TX CAN_SEND ID=0x101 (ext) Data=02", "TX CAN_SEND ID=0x102 Data=03"]
+    finally:
+        can.close()
+        logging.getLogger("quickcan").removeHandler(handler)
+        logging.getLogger("quickcan").setLevel(logging.NOTSET)
+        logging.getLogger(TRACE_LOGGER).setLevel(logging.NOTSET)
@@ -0,0 +1,78 @@
+# Test: Offline dump decoding
+import random
+from array import array
+
+from quickcan.offline import split_points, decode_dump, decode_dump_to_batch, write_columns
+from quickcan.protocol import CANFrame, Command, START_BYTE, FD_LENGTHS, FLAG_FD, PROTOCOL_VERSION_FD, encode_frame, encode_frames, decode_frame
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+
+def make_dump(path, count=3000, seed=1):
+    rng = random.Random(seed)
+    parts = [b"\x00\x13"]  # Line noise before the first frame
+    for i in range(count):
+        data = bytes(rng.choice([0xAA, 0xAB, rng.randint(0, 255)]) for _ in range(rng.randint(0, 8)))
+        raw = bytearray(encode_frame(CANFrame(rng.randint(0, 0x7FF), data), cmd=Command.CAN_SEND))
+        if i % 100 == 7:
+            raw[-1] ^= 0x01  # Checksum (or escaped byte) corrupted
+        parts.append(bytes(raw))
+    parts.append(bytes([START_BYTE, 0x01, 0x01]))  # Truncated by the end of the dump
+    path.write_bytes(b"".join(parts))
+    return str(path)
+
+
+def sequential(path):
+    decoder = FrameStreamDecoder()
+    with open(path, "rb") as f:
+        raws = list(decoder.feed_bytes(f.read()))
+    return [decoded[1] for decoded in map(decode_frame, raws) if decoded]
+
+
+def test_split_points_at_frame_starts(tmp_path):
+    path = make_dump(tmp_path / "dump.bin")
+    buf = open(path, "rb").read()
+    points = split_points(buf, 1000)
+    assert points[0] == 0 and points[-1] == len(buf)
+    assert all(buf[p] == START_BYTE for p in points[1:-1])
+    assert all(b - a >= 1000 for a, b in zip(points[1:-2], points[2:-1]))
+
+
+def test_parallel_decode_matches_sequential(tmp_path):
+    path = make_dump(tmp_path / "dump.bin")
+    expected = sequential(path)
+
+    results = list(decode_dump(path, workers=2, chunk_size=4096))
+    assert [r.index for r in results] == list(range(len(results)))
+    assert len(results) > 5
+    frames = [f for r in results for f in r.batch]
+    assert [(f.can_id, f.data) for f in frames] == [(f.can_id, f.data) for f in expected]
+    assert sum(r.corrupt for r in results) == 30 + 1
+    assert sum(r.malformed for r in results) >= 1
+
+    batch = decode_dump_to_batch(path, workers=1, chunk_size=4096)
+    assert list(batch.can_ids) == [f.can_id for f in expected]
+
+
+def test_write_columns(tmp_path):
+    path = make_dump(tmp_path / "dump.bin", count=500)
+    expected = sequential(path)
+    totals = write_columns(path, str(tmp_path / "out"), workers=1, chunk_size=2048)
+    assert totals["frames"] == len(expected)
+
+    can_ids = array("I")
+    with open(tmp_path / "out.can_id.u32", "rb") as f:
+        can_ids.frombytes(f.read())
+    assert list(can_ids) == [f.can_id for f in expected]
+    assert (tmp_path / "out.data.u8").stat().st_size == 8 * len(expected)
+
+
+def test_fd_dump_payload_size(tmp_path):
+    frames = [CANFrame(0x100 + i, bytes(range(size)), flags=FLAG_FD) for i, size in enumerate(FD_LENGTHS[7:])]
+    path = tmp_path / "fd.bin"
+    path.write_bytes(encode_frames(frames, version=PROTOCOL_VERSION_FD))
+
+    batch = decode_dump_to_batch(str(path), workers=1, payload_size=64)
+    assert [batch.data(i) for i in range(len(batch))] == [f.data for f in frames]
+    # Frames too long for classic rows are rejected, not raised
+    results = list(decode_dump(str(path), workers=1))
+    assert len(results[0].batch) == 2 and results[0].malformed == 7
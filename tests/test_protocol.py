@@ -1,9 +1,14 @@
+import dataclasses
+import random
 import unittest
+from unittest.mock import patch
+from quickcan.batch import FrameBatch, decode_batch
 from quickcan.protocol import (
-    CANFrame, encode_frame, decode_frame, Command,
-    START_BYTE, ESCAPE_BYTE
+    CANFrame, encode_frame, encode_frames, decode_frame, decode_fields, Command,
+    START_BYTE, ESCAPE_BYTE, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD, FLAG_DEVICE_TIMESTAMP, FLAG_FD, FLAG_BRS,
+    FLAG_ESI, FD_LENGTHS, len_to_dlc, reject_reason
 )
-from quickcan.transport.stream_decoder import FrameStreamDecoder
+from quickcan.transport.stream_decoder import FrameStreamDecoder, MAX_FRAME_SIZE
 from quickcan.utils.helpers import escape_data, unescape_data
 
 class TestProtocol(unittest.TestCase):
@@ -41,13 +46,31 @@ class TestProtocol(unittest.TestCase):
         unescaped = unescape_data(escaped)
         self.assertEqual(original, unescaped)
 
+    def test_escape_all_byte_values(self):
+        original = bytes(range(256))
+        escaped = escape_data(original)
+        self.assertNotIn(START_BYTE, escaped)
+        self.assertEqual(len(escaped), 258)
+        self.assertEqual(escaped[0xAA:0xAE], bytes([ESCAPE_BYTE, 0x8A, ESCAPE_BYTE, 0x8B]))
+        self.assertEqual(unescape_data(escaped), original)
+
+    def test_encode_frames_matches_encode_frame(self):
+        frames = [
+            CANFrame(0x123, [0x11, 0x22]),
+            CANFrame(0x1ABCDEAA, [START_BYTE, ESCAPE_BYTE], extended=True),
+            CANFrame(0x7FF, []),
+        ]
+        batch = encode_frames(frames, cmd=Command.CONFIG_SET)
+        self.assertEqual(batch, b"".join(encode_frame(f, cmd=Command.CONFIG_SET) for f in frames))
+        self.assertEqual(encode_frames([]), b"")
+
     def test_empty_data(self):
         frame = CANFrame(0x321, [])
         raw = encode_frame(frame)
         result = decode_frame(raw)
         self.assertIsNotNone(result)
         cmd, decoded = result
-        self.assertEqual(decoded.data, [])
+        self.assertEqual(decoded.data, b"")
 
     def test_invalid_start_byte(self):
         self.assertIsNone(decode_frame(bytes([0x00, 0x01, 0x02])))
@@ -60,17 +83,44 @@ class TestProtocol(unittest.TestCase):
         result = decode_frame(corrupted)
         self.assertIsNone(result)
 
+    def test_decode_skips_unescape_without_escape_byte(self):
+        raw = encode_frame(CANFrame(0x123, [0x01, 0x02]))
+        self.assertNotIn(ESCAPE_BYTE, raw)
+        with patch("quickcan.protocol.unescape_data") as unescape:
+            cmd, decoded = decode_frame(raw)
+        unescape.assert_not_called()
+        self.assertEqual(decoded.data, bytes([0x01, 0x02]))
+
+    def test_decode_escaped_payload(self):
+        frame = CANFrame(0xAAAB, [START_BYTE, ESCAPE_BYTE, 0x8A])
+        raw = encode_frame(frame)
+        self.assertIn(ESCAPE_BYTE, raw)
+        cmd, decoded = decode_frame(raw)
+        self.assertEqual(decoded.can_id, 0xAAAB)
+        self.assertEqual(decoded.data, frame.data)
+
+    def test_decode_from_bytearray(self):
+        raw = bytearray(encode_frame(CANFrame(0x7FF, [0x10])))
+        cmd, decoded = decode_frame(raw)
+        self.assertEqual(decoded.can_id, 0x7FF)
+
+    def test_unknown_command(self):
+        raw = bytearray(encode_frame(CANFrame(0x100, [0x01])))
+        raw[2] = 0x7E   # cmd
+        raw[-1] = (raw[-1] + 0x7E - 0x01) & 0xFF  # keep checksum valid
+        self.assertIsNone(decode_frame(bytes(raw)))
+
     def test_stream_decoder_single_frame(self):
         decoder = FrameStreamDecoder()
         frame = CANFrame(0x123, [0x01, 0x02])
         raw = encode_frame(frame)
 
-        for b in raw:
-            decoder.feed(b)
+        results = [decoder.feed(b) for b in raw]
 
-        result = decoder.flush()
-        self.assertIsNotNone(result)
-        cmd, decoded = decode_frame(result)
+        # Completed by its DLC on the last byte, no trailing START_BYTE needed
+        self.assertIsNone(decoder.flush())
+        self.assertTrue(all(r is None for r in results[:-1]))
+        cmd, decoded = decode_frame(results[-1])
         self.assertEqual(decoded.can_id, 0x123)
 
     def test_stream_decoder_multiple_frames(self):
@@ -91,6 +141,202 @@ class TestProtocol(unittest.TestCase):
         self.assertIn(0x100, decoded_ids)
         self.assertIn(0x200, decoded_ids)
 
+    def test_stream_decoder_feed_bytes_matches_feed(self):
+        frames = [CANFrame(0x100 + i, [i, START_BYTE, ESCAPE_BYTE][:i % 4]) for i in range(20)]
+        raw_stream = b"\x00\x01" + b"".join(encode_frame(f) for f in frames)
+
+        per_byte = FrameStreamDecoder()
+        expected = [res for res in map(per_byte.feed, raw_stream) if res]
+
+        for chunk_size in (1, 3, 7, 64, len(raw_stream)):
+            decoder = FrameStreamDecoder()
+            found = []
+            for i in range(0, len(raw_stream), chunk_size):
+                found.extend(decoder.feed_bytes(raw_stream[i:i + chunk_size]))
+            self.assertEqual(found, expected)
+            self.assertEqual(decoder.flush(), per_byte.flush())
+
+    def test_stream_decoder_feed_bytes_decodes_all_frames(self):
+        decoder = FrameStreamDecoder()
+        raw_stream = b"".join(encode_frame(CANFrame(i, [i])) for i in range(1, 6))
+
+        found = list(decoder.feed_bytes(raw_stream))
+        self.assertIsNone(decoder.flush())
+        decoded_ids = [decode_frame(f)[1].can_id for f in found]
+        self.assertEqual(decoded_ids, [1, 2, 3, 4, 5])
+
+    def test_stream_decoder_escaped_frames_split_anywhere(self):
+        frames = [
+            encode_frame(CANFrame(0xAAAA, [START_BYTE, ESCAPE_BYTE, 0x00]), cmd=Command.PING),
+            encode_frame(CANFrame(0x1AB, [ESCAPE_BYTE] * 8)),
+            encode_frame(CANFrame(0x10, [0x01]), version=PROTOCOL_VERSION_2),
+        ]
+        raw_stream = b"".join(frames)
+        for split in range(len(raw_stream) + 1):
+            decoder = FrameStreamDecoder()
+            found = list(decoder.feed_bytes(raw_stream[:split]))
+            found += decoder.feed_bytes(raw_stream[split:])
+            self.assertEqual(found, frames)
+
+    def test_stream_decoder_ignores_bytes_after_complete_frame(self):
+        decoder = FrameStreamDecoder()
+        raw = encode_frame(CANFrame(0x123, [0x01]))
+        found = list(decoder.feed_bytes(raw + b"\x00\x01\x02" + raw))
+        self.assertEqual(found, [raw, raw])
+
+    def test_stream_decoder_drops_unknown_version_up_to_next_start(self):
+        unknown = bytes([START_BYTE, 0x7F, 0x01, 0x02])
+        raw = encode_frame(CANFrame(0x123, [0x01]))
+        for feed_all in (lambda d, data: list(d.feed_bytes(data)),
+                         lambda d, data: [r for r in map(d.feed, data) if r]):
+            decoder = FrameStreamDecoder()
+            events = []
+            decoder.resync_hook = lambda reason, size: events.append(reason)
+            self.assertEqual(feed_all(decoder, unknown + raw), [raw])
+            self.assertEqual(events, ["header"])
+            self.assertEqual(decoder.resync_reasons, {"header": 1})
+            self.assertFalse(decoder.buffer)
+
+    def test_stream_decoder_fault_costs_one_frame(self):
+        rng = random.Random(5)
+        for _ in range(500):
+            frames = [CANFrame(rng.randrange(0x800), bytes(rng.choice((START_BYTE, ESCAPE_BYTE, rng.randrange(256)))
+                                                           for _ in range(rng.randrange(9))))
+                      for _ in range(5)]
+            packets = [encode_frame(f, version=rng.choice((0x01, PROTOCOL_VERSION_2))) for f in frames]
+            stream = bytearray(b"".join(packets))
+            k = rng.randrange(len(stream))
+            fault = rng.choice(("flip", "drop", "escape"))
+            if fault == "flip":
+                stream[k] ^= 1 << rng.randrange(8)
+            elif fault == "drop":
+                del stream[k]
+            else:
+                stream[k] = ESCAPE_BYTE
+            ends = [len(b"".join(packets[:i + 1])) for i in range(len(packets))]
+            hit = next(i for i, end in enumerate(ends) if k < end)
+
+            decoder = FrameStreamDecoder()
+            chunk = rng.choice((1, 5, 4096))
+            decoded = set()
+            for i in range(0, len(stream), chunk):
+                for raw in decoder.feed_bytes(bytes(stream[i:i + chunk])):
+                    fields = decode_fields(raw)
+                    if fields:
+                        decoded.add((fields[1], fields[3]))
+            lost = [i for i, f in enumerate(frames) if (f.can_id, f.data) not in decoded]
+            self.assertIn(lost, ([], [hit]), (fault, k, bytes(stream).hex()))
+
+    def test_stream_decoder_buffer_is_bounded(self):
+        rng = random.Random(9)
+        decoder = FrameStreamDecoder()
+        # A valid version 2 start, then garbage that never completes a frame or starts another
+        garbage = bytes([START_BYTE, PROTOCOL_VERSION_2]) + bytes(rng.choice((ESCAPE_BYTE, 0x01)) for _ in range(5000))
+        for i in range(0, len(garbage), 100):
+            list(decoder.feed_bytes(garbage[i:i + 100]))
+            self.assertLessEqual(len(decoder.buffer), MAX_FRAME_SIZE)
+        raw = encode_frame(CANFrame(0x1, [1]))
+        self.assertEqual(list(decoder.feed_bytes(raw)), [raw])
+
+    def test_protocol_v2_roundtrip(self):
+        frame = CANFrame(0x42, list(range(20)))
+        raw = encode_frame(frame, cmd=Command.CONFIG_SET, version=PROTOCOL_VERSION_2)
+        cmd, decoded = decode_frame(raw)
+        self.assertEqual(cmd, Command.CONFIG_SET)
+        self.assertEqual(decoded.data, frame.data)
+
+        truncated = bytearray(raw[:-2])
+        truncated.append(sum(truncated[1:]) & 0xFF)
+        self.assertIsNone(decode_frame(bytes(truncated)))
+
+    def test_fd_dlc_mapping(self):
+        self.assertEqual([len_to_dlc(n) for n in FD_LENGTHS], list(range(16)))
+        self.assertEqual([len_to_dlc(n) for n in (9, 12, 13, 33, 49)], [9, 9, 10, 14, 15])
+        with self.assertRaises(ValueError):
+            len_to_dlc(65)
+
+    def test_fd_roundtrip(self):
+        for length in range(65):
+            frame = CANFrame(0x1ABCDEF, bytes([0xAA] * length), extended=True, flags=FLAG_BRS)
+            raw = encode_frame(frame, version=PROTOCOL_VERSION_FD, device_time=7)
+            self.assertEqual(list(FrameStreamDecoder().feed_bytes(raw)), [raw])
+            cmd, decoded = decode_frame(raw)
+            # Padded to the next FD length; FD is implied above 8 bytes
+            size = FD_LENGTHS[len_to_dlc(length)]
+            self.assertEqual(decoded.data, frame.data + bytes(size - length))
+            self.assertEqual((decoded.is_fd, decoded.bitrate_switch, decoded.extended), (length > 8, True, True))
+            self.assertIsNone(reject_reason(raw))
+
+        _, decoded = decode_frame(encode_frame(CANFrame(0x1, [1], flags=FLAG_FD | FLAG_ESI), version=PROTOCOL_VERSION_FD))
+        self.assertTrue(decoded.is_fd and decoded.error_state_indicator and not decoded.bitrate_switch)
+        # FD frames don't fit the older versions
+        with self.assertRaises(ValueError):
+            encode_frame(CANFrame(0x1, [1], flags=FLAG_FD), version=PROTOCOL_VERSION_2)
+        with self.assertRaises(ValueError):
+            encode_frame(CANFrame(0x1, bytes(16)))
+        with self.assertRaises(ValueError):
+            encode_frame(CANFrame(0x1, bytes(65)), version=PROTOCOL_VERSION_FD)
+
+        truncated = bytearray(encode_frame(CANFrame(0x1, bytes(12)), version=PROTOCOL_VERSION_FD)[:-2])
+        truncated.append(sum(truncated[1:]) & 0xFF)
+        self.assertIsNone(decode_frame(bytes(truncated)))
+        self.assertEqual(reject_reason(bytes(truncated)), "length")
+
+    def test_device_timestamp_field(self):
+        for version in (0x01, PROTOCOL_VERSION_2, PROTOCOL_VERSION_FD):
+            # Timestamp bytes that need escaping, frame split across chunks
+            raw = encode_frame(CANFrame(0x123, [0x01, 0x02]), version=version, device_time=0xAAAB0102)
+            decoder = FrameStreamDecoder()
+            self.assertEqual(list(decoder.feed_bytes(raw[:5])), [])
+            self.assertEqual(list(decoder.feed_bytes(raw[5:])), [raw])
+
+            cmd, can_id, flags, data, device_time = decode_fields(raw)
+            self.assertTrue(flags & FLAG_DEVICE_TIMESTAMP)
+            self.assertEqual((can_id, data, device_time), (0x123, b"\x01\x02", 0xAAAB0102))
+            self.assertIsNone(decode_fields(encode_frame(CANFrame(0x123, [1]), version=version))[4])
+
+        _, frame = decode_frame(encode_frame(CANFrame(0x1, [])), timestamp=12.5)
+        self.assertEqual(frame.timestamp, 12.5)
+
+    def test_canframe_immutable_bytes(self):
+        frame = CANFrame(0x123, [0x01, 0x02])
+        self.assertEqual(frame.data, b"\x01\x02")
+        self.assertFalse(hasattr(frame, "__dict__"))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            frame.can_id = 0x124
+        self.assertEqual(decode_frame(encode_frame(frame))[1], CANFrame(0x123, b"\x01\x02", flags=2))
+
+    def test_frame_batch_columns(self):
+        frames = [
+            CANFrame(0x100, [0x01]),
+            CANFrame(0x1ABCDE, [START_BYTE] * 8, extended=True),
+            CANFrame(0x7FF, []),
+        ]
+        raws = [encode_frame(f) for f in frames] + [b"\x00garbage"]
+        batch = decode_batch(raws)
+
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(list(batch.can_ids), [0x100, 0x1ABCDE, 0x7FF])
+        self.assertEqual(list(batch.dlcs), [1, 8, 0])
+        self.assertEqual(len(batch.payloads), 3 * 8)
+        self.assertEqual([f.data for f in batch], [f.data for f in frames])
+        self.assertTrue(batch[1].extended)
+        self.assertEqual(batch[-1].can_id, 0x7FF)
+
+        copy = FrameBatch()
+        copy.extend(batch)
+        self.assertEqual(list(copy), list(batch))
+        with self.assertRaises(ValueError):
+            copy.append(0x1, bytes(9))
+        copy.clear()
+        self.assertEqual(len(copy), 0)
+
+    def test_frame_batch_append_raw_command(self):
+        batch = FrameBatch()
+        self.assertEqual(batch.append_raw(encode_frame(CANFrame(0, []), cmd=Command.PING)), Command.PING)
+        self.assertIsNone(batch.append_raw(b""))
+        self.assertEqual(list(batch.commands), [Command.PING])
+
     def test_invalid_version(self):
         frame = CANFrame(0x100, [0x01])
         raw = bytearray(encode_frame(frame))
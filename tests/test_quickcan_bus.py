@@ -0,0 +1,143 @@
+# Test: python-can backend
+import time
+
+import can
+import pytest
+
+from backend.quickcan_bus import QuickCANBus
+from quickcan.protocol import CANFrame, Command, encode_frame, FLAG_BRS, PROTOCOL_VERSION_FD
+from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+
+def test_recv_builds_messages():
+    port = LoopbackSerial(SimulatedDevice())
+    bus = QuickCANBus(port)
+    try:
+        port.feed(encode_frame(CANFrame(0x123, [1, 2, 3])) + encode_frame(CANFrame(0x1ABCDE, [], extended=True)))
+        msg = bus.recv(timeout=1.0)
+        assert msg.arbitration_id == 0x123 and not msg.is_extended_id
+        assert msg.data == bytearray([1, 2, 3]) and msg.dlc == 3
+        assert msg.is_rx and not msg.is_fd and not msg.is_remote_frame
+        assert msg.timestamp > 0
+        assert msg.equals(can.Message(timestamp=msg.timestamp, arbitration_id=0x123, is_extended_id=False,
+                                      data=[1, 2, 3]))
+        msg = bus.recv(timeout=1.0)
+        assert msg.arbitration_id == 0x1ABCDE and msg.is_extended_id and msg.dlc == 0
+        assert bus.recv(timeout=0.05) is None
+    finally:
+        bus.shutdown()
+
+
+def test_control_commands_kept_apart():
+    port = LoopbackSerial(SimulatedDevice())
+    bus = QuickCANBus(port)
+    control = []
+    bus.control_callback = lambda cmd, frame: control.append(cmd)
+    try:
+        port.feed(encode_frame(CANFrame(0, []), cmd=Command.HEARTBEAT) + encode_frame(CANFrame(0x100, [1])))
+        assert bus.recv(timeout=1.0).arbitration_id == 0x100
+        cmd, frame = bus.recv_control(timeout=1.0)
+        assert cmd == Command.HEARTBEAT and control == [Command.HEARTBEAT]
+        assert bus.recv(timeout=0.05) is None
+        # Requested replies go to their caller instead
+        assert bus.interface.ping() > 0
+        assert bus.recv_control(timeout=0.05) is None
+    finally:
+        bus.shutdown()
+
+
+def test_notifier_and_recv_batch():
+    device = SimulatedDevice(loopback=True)
+    port = LoopbackSerial(device)
+    bus = QuickCANBus(port)
+    try:
+        reader = can.BufferedReader()
+        notifier = can.Notifier(bus, [reader], timeout=0.05)
+        for i in range(50):
+            bus.send(can.Message(arbitration_id=0x200 + i, data=[i], is_extended_id=False))
+        received = []
+        while len(received) < 50:
+            msg = reader.get_message(timeout=1.0)
+            assert msg is not None
+            received.append(msg.arbitration_id)
+        notifier.stop()
+        assert received == [0x200 + i for i in range(50)]
+
+        port.feed(b"".join(encode_frame(CANFrame(0x300 + i, [i])) for i in range(10)))
+        batch = bus.recv_batch(max_frames=100, timeout=1.0)
+        while len(batch) < 10:
+            batch.extend(bus.recv_batch(max_frames=100, timeout=1.0))
+        assert list(batch.can_ids) == [0x300 + i for i in range(10)]
+    finally:
+        bus.shutdown()
+
+
+def test_send_periodic_on_shared_timer():
+    port = LoopbackSerial(SimulatedDevice(loopback=True))
+    bus = QuickCANBus(port)
+    try:
+        def bump(msg):
+            msg.data[0] += 1
+        task = bus.send_periodic(can.Message(arbitration_id=0x321, data=[0, 7], is_extended_id=False), 0.01,
+                                 modifier_callback=bump)
+        bus.send_periodic(can.Message(arbitration_id=0x322, data=[1]), 0.01, duration=0.02)
+        received = [bus.recv(timeout=1.0) for _ in range(5)]
+        ours = [msg for msg in received if msg.arbitration_id == 0x321]
+        assert [msg.data[0] for msg in ours[:2]] == [1, 2] and ours[0].data[1] == 7
+        # Both tasks run on QuickCAN's timer thread
+        assert len(bus.interface.scheduler) in (1, 2)
+        task.modify_data(can.Message(arbitration_id=0x321, data=[50]))
+        modified = [bus.recv(timeout=1.0) for _ in range(3)]
+        assert any(msg.data == bytearray([51]) for msg in modified)
+        task.stop()
+        time.sleep(0.02)
+        assert len(bus.interface.scheduler) == 0
+    finally:
+        bus.shutdown()
+
+
+def test_can_fd_frames():
+    with pytest.raises(can.CanInitializationError):
+        QuickCANBus(LoopbackSerial(SimulatedDevice()), fd=True)
+
+    class Silent(SimulatedDevice):
+        def handle(self, cmd, can_id, flags, data):
+            return []
+
+    # No answer to the protocol query: still an initialization error, and the port is closed
+    port = LoopbackSerial(Silent())
+    with pytest.raises(can.CanInitializationError):
+        QuickCANBus(port, fd=True)
+    assert not port.is_open
+
+    port = LoopbackSerial(SimulatedDevice(fd=True, loopback=True))
+    bus = QuickCANBus(port, fd=True)
+    try:
+        assert bus.protocol == can.CanProtocol.CAN_FD
+        bus.send(can.Message(arbitration_id=0x123, data=bytes(range(64)), is_fd=True, bitrate_switch=True,
+                             is_extended_id=False))
+        msg = bus.recv(timeout=1.0)
+        assert msg.is_fd and msg.bitrate_switch and not msg.error_state_indicator
+        assert msg.data == bytearray(range(64)) and msg.dlc == 64
+
+        port.feed(encode_frame(CANFrame(0x124, bytes(21), flags=FLAG_BRS), version=PROTOCOL_VERSION_FD))
+        batch = bus.recv_batch(timeout=1.0)
+        assert batch.payload_size == 64 and batch.dlcs[0] == 24 and batch[0].bitrate_switch
+    finally:
+        bus.shutdown()
+
+
+def test_on_change_and_snapshot():
+    port = LoopbackSerial(SimulatedDevice())
+    bus = QuickCANBus(port, on_change=True)
+    try:
+        port.feed(b"".join(encode_frame(CANFrame(0x100 + i % 2, [i // 4])) for i in range(8)))
+        received = [bus.recv(timeout=1.0) for _ in range(4)]
+        assert [(msg.arbitration_id, msg.data[0]) for msg in received] == [(0x100, 0), (0x101, 0), (0x100, 1),
+                                                                          (0x101, 1)]
+        assert bus.recv(timeout=0.05) is None
+        snapshot = bus.snapshot()
+        assert sorted(snapshot) == [0x100, 0x101] and snapshot[0x101].data == bytearray([1])
+        assert bus.interface.stats.frames_unchanged == 4
+    finally:
+        bus.shutdown()
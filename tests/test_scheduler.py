@@ -0,0 +1,87 @@
+# Test: Periodic transmit scheduler
+import time
+
+from quickcan.commands.heartbeat import heartbeat_task
+from quickcan.commands.scheduler import PeriodicScheduler
+from quickcan.protocol import decode_fields, CANFrame, Command
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+
+class Recorder:
+    """write() target keeping (time, [(cmd, can_id, data), ...]) per write"""
+
+    def __init__(self):
+        self.writes = []
+        self.decoder = FrameStreamDecoder()
+
+    def write(self, packet: bytes):
+        frames = [decode_fields(raw) for raw in self.decoder.feed_bytes(packet)]
+        self.writes.append((time.monotonic(), [(cmd, can_id, bytes(data)) for cmd, can_id, _, data, _ in frames]))
+
+    def frames(self, can_id=None):
+        return [frame for _, frames in self.writes for frame in frames if can_id is None or frame[1] == can_id]
+
+
+def test_tasks_due_together_share_a_write():
+    recorder = Recorder()
+    scheduler = PeriodicScheduler(recorder.write, resolution=0.005)
+    try:
+        tasks = [scheduler.add(CANFrame(0x100 + i, [i]), 0.02) for i in range(50)]
+        time.sleep(0.11)
+        for task in tasks:
+            task.stop()
+        assert len(scheduler) == 0
+        sent = sum(task.sent for task in tasks)
+        assert sent == len(recorder.frames()) >= 250
+        # One write per period, not one per frame
+        assert len(recorder.writes) < sent / 10
+        assert recorder.frames(0x105)[0] == (Command.CAN_SEND, 0x105, b"\x05")
+    finally:
+        scheduler.close()
+
+
+def test_period_duration_and_modifier():
+    recorder = Recorder()
+    scheduler = PeriodicScheduler(recorder.write)
+    try:
+        counter = lambda frame: CANFrame(frame.can_id, [frame.data[0] + 1])
+        task = scheduler.add([CANFrame(0x7E0, [0]), CANFrame(0x7E0, [100])], 0.01, duration=0.1, modifier=counter)
+        heartbeat = heartbeat_task(scheduler, 0.03)
+        time.sleep(0.2)
+        assert not task.running and heartbeat.running
+        # Frames alternate and each keeps counting from its own last value
+        data = [frame[2][0] for frame in recorder.frames(0x7E0)]
+        assert 9 <= len(data) <= 12 and data[:4] == [1, 101, 2, 102]
+        times = [t for t, frames in recorder.writes if any(f[1] == 0x7E0 for f in frames)]
+        assert abs((times[-1] - times[0]) / (len(times) - 1) - 0.01) < 0.003
+        beats = [frame for frame in recorder.frames(0) if frame[0] == Command.HEARTBEAT]
+        assert [frame[2] for frame in beats[:3]] == [b"\x00", b"\x01", b"\x02"]
+
+        task.modify(CANFrame(0x7E1, [9]))
+        task.start()
+        time.sleep(0.03)
+        assert recorder.frames(0x7E1)[0][2] == b"\x0a"
+    finally:
+        scheduler.close()
+    assert not heartbeat.running and len(scheduler) == 0
+
+
+
+def test_modify_between_reads_of_the_cycle():
+    recorder = Recorder()
+    scheduler = PeriodicScheduler(recorder.write)
+
+    def shrink(frame):
+        # Runs on the timer thread, in the middle of picking this send's frame
+        if frame.can_id == 0x302:
+            task.modify(CANFrame(0x400, [0]))
+        return frame
+
+    try:
+        task = scheduler.add([CANFrame(0x300 + i, [i]) for i in range(4)], 0.005, modifier=shrink)
+        time.sleep(0.05)
+        assert task.running and scheduler.errors == 0
+        assert [frame[1] for frame in recorder.frames()][:4] == [0x300, 0x301, 0x302, 0x400]
+        assert task.frames == [CANFrame(0x400, [0])]
+    finally:
+        scheduler.close()
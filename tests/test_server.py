@@ -0,0 +1,213 @@
+# Test: Shared-adapter server and its clients
+import os
+import socket
+import stat
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import can
+import pytest
+
+from backend.quickcan_bus import QuickCANBus
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, encode_frame, encode_frames
+from quickcan.server import QuickCANServer, QuickCANClient, SEND, decode_records, encode_records
+from quickcan.simulator import SimulatedDevice, LoopbackSerial
+
+
+@pytest.fixture
+def served(tmp_path):
+    port = LoopbackSerial(SimulatedDevice(loopback=True))
+    adapter = QuickCAN(port)
+    server = QuickCANServer(adapter, str(tmp_path / "quickcan.sock"), client_buffer=65536)
+    server.start()
+    yield port, server
+    server.close()
+    adapter.close()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_records_round_trip():
+    batch = [(Command.CAN_SEND, CANFrame(0x1ABCDE, bytes(range(8)), extended=True, timestamp=12.5)),
+             (Command.HEARTBEAT, CANFrame(0, [], flags=0x10, timestamp=13.0))]
+    decoded = decode_records(b"".join(encode_records(batch)))
+    assert [cmd for cmd, _ in decoded] == [Command.CAN_SEND, Command.HEARTBEAT]
+    frame = decoded[0][1]
+    assert (frame.can_id, frame.data, frame.extended, frame.timestamp) == (0x1ABCDE, bytes(range(8)), True, 12.5)
+    assert not decoded[1][1].extended and decoded[1][1].flags == 0x10
+
+
+def test_socket_permissions_and_takeover(served, tmp_path):
+    port, server = served
+    assert stat.S_IMODE(os.stat(server.path).st_mode) == 0o600
+    # A live server's socket is never taken over
+    with pytest.raises(OSError):
+        QuickCANServer(QuickCAN(LoopbackSerial()), server.path)
+
+    # A stale one, left by a server that is gone, is replaced
+    stale = str(tmp_path / "stale.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(stale)
+    sock.close()
+    adapter = QuickCAN(LoopbackSerial())
+    QuickCANServer(adapter, stale, mode=0o660).close()
+    adapter.close()
+
+    (tmp_path / "file").write_text("not a socket")
+    with pytest.raises(OSError):
+        QuickCANServer(QuickCAN(LoopbackSerial()), str(tmp_path / "file"))
+    assert (tmp_path / "file").exists()
+
+
+def test_fan_out_with_filters_and_sends(served):
+    port, server = served
+    received = [[], [], []]
+    clients = [QuickCANClient(server.path) for _ in received]
+    try:
+        for client, frames in zip(clients, received):
+            client.set_receive_batch_callback(frames.extend)
+            client.start()
+        clients[1].set_filters([{"can_id": 0x100, "can_mask": 0x7FF, "extended": False}])
+        assert wait_for(lambda: sum(not c.filters.accept_all for c in server.clients.values()) == 1)
+
+        port.feed(encode_frames([CANFrame(0x100 + i % 3, [i & 0xFF]) for i in range(300)]) +
+                  encode_frame(CANFrame(0, []), cmd=Command.HEARTBEAT))
+        assert wait_for(lambda: [len(frames) for frames in received] == [301, 101, 301])
+        # Commands other than CAN_SEND are never filtered
+        assert received[1][-1][0] == Command.HEARTBEAT
+        assert [frame.data[0] for _, frame in received[0][:4]] == [0, 1, 2, 3]
+
+        # Sends reach the adapter, which echoes them back to every client
+        clients[2].send(0x555, [1, 2])
+        assert wait_for(lambda: received[0][-1][1].can_id == 0x555)
+        # Same transmit path as QuickCAN._write, but there are no ACKs to wait for
+        with pytest.raises(ValueError):
+            clients[2]._write(encode_frame(CANFrame(0x555, [3])), 0, Future())
+    finally:
+        for client in clients:
+            client.close()
+    assert wait_for(lambda: not server.clients)
+
+
+def test_slow_client_does_not_stall_others(served):
+    port, server = served
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(server.path)
+    received = []
+    client = QuickCANClient(server.path)
+    try:
+        client.set_receive_batch_callback(received.extend)
+        client.start()
+        assert wait_for(lambda: len(server.clients) == 2)
+        # Well past what the stalled client's socket buffers and client_buffer hold
+        frames = [CANFrame(0x200, bytes(8)) for _ in range(400)]
+        for _ in range(60):
+            port.feed(encode_frames(frames))
+            time.sleep(0.01)
+        assert wait_for(lambda: len(received) == 24000)
+        assert client.dropped_frames == 0
+        # The stalled client's backlog stayed within client_buffer, the rest was dropped
+        slow = max(server.clients.values(), key=lambda c: c.dropped)
+        assert slow.pending <= server.client_buffer and slow.dropped > 0
+    finally:
+        client.close()
+        stalled.close()
+
+
+def test_sends_dropped_while_transmit_queue_full(tmp_path):
+    class StalledPort(LoopbackSerial):
+        def __init__(self):
+            super().__init__(SimulatedDevice(loopback=True))
+            self.release = threading.Event()
+
+        def write(self, data):
+            self.release.wait()
+            return super().write(data)
+
+    port = StalledPort()
+    adapter = QuickCAN(port, tx_buffer_size=64)
+    server = QuickCANServer(adapter, str(tmp_path / "quickcan.sock"))
+    server.start()
+    received = []
+    client = QuickCANClient(server.path)
+    try:
+        client.set_receive_batch_callback(received.extend)
+        client.start()
+        for i in range(20):
+            client.send(0x300, [i] * 8)
+        assert wait_for(lambda: server.sends_dropped > 0)
+        # The server thread kept serving while the adapter couldn't write
+        port.feed(encode_frame(CANFrame(0x123, [1])))
+        assert wait_for(lambda: any(frame.can_id == 0x123 for _, frame in received))
+        port.release.set()
+        assert wait_for(lambda: port.device.transmitted + server.sends_dropped == 20)
+    finally:
+        port.release.set()
+        client.close()
+        server.close()
+        adapter.close()
+
+
+def test_send_checks_frames_and_reports_write_errors(tmp_path):
+    class BrokenPort(LoopbackSerial):
+        def write(self, data):
+            raise OSError("port went away")
+
+    adapter = QuickCAN(BrokenPort(SimulatedDevice(loopback=True)))
+    server = QuickCANServer(adapter, str(tmp_path / "quickcan.sock"))
+    server.start()
+    client = QuickCANClient(server.path)
+    raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    raw.connect(server.path)
+    try:
+        client.start()
+        # A frame cut short is no SEND: its client is disconnected, the others stay
+        packet = encode_frame(CANFrame(0x300, [1, 2, 3]))[:-2]
+        raw.sendall(struct.pack("<BI", SEND, len(packet)) + packet)
+        raw.settimeout(2.0)
+        assert raw.recv(64) == b""
+
+        # Writer errors are reported to the client, which stays connected
+        # The first write fails in the writer thread, the next SEND gets its error
+        for _ in range(50):
+            if client.send_error is not None:
+                break
+            client.send(0x300, [1])
+            time.sleep(0.02)
+        assert server.sends_failed >= 1 and len(server.clients) == 1
+        with pytest.raises(OSError, match="port went away"):
+            client.send(0x300, [1])
+    finally:
+        raw.close()
+        client.close()
+        server.close()
+        try:
+            adapter.close()
+        except OSError:
+            pass  # The writer's error again
+
+
+def test_bus_on_unix_channel(served):
+    port, server = served
+    bus = QuickCANBus(f"unix:{server.path}", can_filters=[{"can_id": 0x123, "can_mask": 0x7FF, "extended": False}])
+    try:
+        assert isinstance(bus.interface, QuickCANClient)
+        assert wait_for(lambda: server.clients and not next(iter(server.clients.values())).filters.accept_all)
+        port.feed(encode_frames([CANFrame(0x100, [9]), CANFrame(0x123, [1, 2, 3])]))
+        msg = bus.recv(timeout=1.0)
+        assert msg.arbitration_id == 0x123 and msg.data == bytearray([1, 2, 3])
+        bus.send(can.Message(arbitration_id=0x123, data=[4], is_extended_id=False))
+        assert bus.recv(timeout=1.0).data == bytearray([4])
+        with pytest.raises(ValueError):
+            bus.interface.send(0x1, [], wait_ack=True)
+    finally:
+        bus.shutdown()
@@ -0,0 +1,93 @@
+# Test: signal database decoding
+import json
+import random
+
+import pytest
+
+from quickcan.batch import FrameBatch
+from quickcan.protocol import CANFrame, Command
+from quickcan.signals import Message, Signal, load_database, parse_dbc
+
+DBC = """
+VERSION ""
+
+BU_: ECU
+
+BO_ 256 Engine: 8 ECU
+ SG_ Speed : 0|16@1+ (0.25,0) [0|16383.75] "rpm" Vector__XXX
+ SG_ Temp : 16|8@1- (1,-40) [-168|87] "C" Vector__XXX
+ SG_ Gear : 24|4@1+ (1,0) [0|15] "" Vector__XXX
+ SG_ Torque : 39|12@0- (0.5,0) [-1024|1023.5] "Nm" Vector__XXX
+
+BO_ 2566844672 Cruise: 8 ECU
+ SG_ Wheel m0 : 7|16@0+ (1,0) [0|65535] "" Vector__XXX
+
+CM_ SG_ 256 Speed "Engine speed";
+"""
+
+
+def test_dbc_decode():
+    db = parse_dbc(DBC)
+    assert len(db) == 2 and db.message("Cruise").extended and db.message("Cruise").frame_id == 0x18FEF100
+    data = bytes([0x40, 0x1F, 0xF6, 0x53, 0xFF, 0x6A, 0, 0])
+    assert db.decode(CANFrame(0x100, data)) == {"Speed": 2000.0, "Temp": -50.0, "Gear": 3, "Torque": -5.0}
+    assert db.decode(CANFrame(0x18FEF100, [0x12, 0x34], extended=True)) == {"Wheel": 0x1234}
+    # Standard and extended IDs are told apart; unknown IDs decode to None
+    assert db.decode(CANFrame(0x100, data, extended=True)) is None
+    assert db.decode_data(0x101, data) is None
+    # Short data is zero padded, and the decoder compiled once
+    assert db.decode(CANFrame(0x100, [0x04]))["Speed"] == 1.0
+    assert db.decoder(0x100) is db.decoder(0x100)
+
+    received = []
+    on_batch = db.batch_callback(lambda message, values, frame: received.append((message.name, values)))
+    on_batch([(Command.CAN_SEND, CANFrame(0x100, data)), (Command.PING, CANFrame(0x100, data)),
+              (Command.CAN_SEND, CANFrame(0x7FF, data))])
+    assert received == [("Engine", db.decode(CANFrame(0x100, data)))]
+
+
+def test_json_database(tmp_path):
+    spec = {"messages": [{"frame_id": "0x100", "name": "Engine", "length": 8, "signals": [
+        {"name": "Speed", "start": 0, "length": 16, "scale": 0.25, "unit": "rpm"},
+        {"name": "Torque", "start": 39, "length": 12, "little_endian": False, "signed": True, "scale": 0.5},
+    ]}]}
+    path = tmp_path / "signals.json"
+    path.write_text(json.dumps(spec))
+    db = load_database(str(path))
+    data = bytes([0x40, 0x1F, 0xF6, 0x53, 0xFF, 0x6A, 0, 0])
+    assert db.decode(CANFrame(0x100, data)) == {"Speed": 2000.0, "Torque": -5.0}
+    with pytest.raises(ValueError):
+        Message(0x1, "Short", 2, (Signal("X", 12, 8),))
+
+
+def test_decode_batch_matches_scalar():
+    np = pytest.importorskip("numpy")
+
+    db = parse_dbc(DBC)
+    # CAN FD message: a 64-bit signal off a byte boundary spans 9 bytes
+    db.add(Message(0x200, "Wide", 64, (
+        Signal("Long", 3, 64, signed=True), Signal("Big", 100, 40, little_endian=False, scale=0.1),
+        Signal("Last", 504, 8),
+    )))
+    rng = random.Random(3)
+    batch = FrameBatch(payload_size=64)
+    for i in range(2000):
+        can_id, extended = rng.choice(((0x100, False), (0x18FEF100, True), (0x200, False), (0x300, False)))
+        length = 64 if can_id == 0x200 else rng.randint(1, 8)
+        cmd = Command.PING if i % 97 == 0 else Command.CAN_SEND
+        batch.append_frame(CANFrame(can_id, rng.randbytes(length), extended, timestamp=float(i)), cmd)
+
+    columns = db.decode_batch(batch)
+    expected = {}
+    for frame, cmd in zip(batch, batch.commands):
+        values = db.decode(frame) if cmd == Command.CAN_SEND else None
+        if values is not None:
+            name = db.get(frame.can_id, frame.extended).name
+            expected.setdefault(name, {"timestamp": []})["timestamp"].append(frame.timestamp)
+            for signal, value in values.items():
+                expected[name].setdefault(signal, []).append(value)
+    assert set(columns) == set(expected) == {"Engine", "Cruise", "Wide"}
+    for name, decoded in expected.items():
+        for signal, values in decoded.items():
+            assert np.allclose(columns[name][signal].astype(float), np.array(values, dtype=float)), (name, signal)
+    assert columns["Engine"]["Gear"].dtype == np.uint64 and columns["Engine"]["Temp"].dtype == np.float64
@@ -0,0 +1,100 @@
+# Test: Simulated adapter
+import sys
+import threading
+import time
+
+import pytest
+
+from quickcan.driver import QuickCAN
+from quickcan.protocol import CANFrame, Command, encode_frame, decode_frame, PROTOCOL_VERSION_2
+from quickcan.simulator import (
+    SimulatedDevice, TrafficGenerator, LoopbackSerial, PtySimulator, frame_latency_ns
+)
+from quickcan.transport.stream_decoder import FrameStreamDecoder
+
+
+def replies(device, cmd, data=(), can_id=0, extended=False, version=0x01):
+    raw = device.process(encode_frame(CANFrame(can_id, data, extended), cmd=cmd, version=version))
+    return [decode_frame(f) for f in FrameStreamDecoder().feed_bytes(raw)]
+
+
+def test_device_commands():
+    device = SimulatedDevice(device_info=b"SIM", config={1: b"\x10"})
+    assert replies(device, Command.PING, [7])[0][1].data == b"\x07"
+    assert replies(device, Command.DEVICE_INFO)[0][1].data == b"SIM"
+    assert replies(device, Command.CONFIG_GET, [1])[0][1].data == b"\x01\x10"
+
+    replies(device, Command.CONFIG_SET, [2, 0x20, 0x21])
+    assert replies(device, Command.CONFIG_GET, [2])[0][1].data == b"\x02\x20\x21"
+
+    cmd, _ = replies(device, Command.PING, version=PROTOCOL_VERSION_2)[0]
+    assert cmd == Command.PING
+
+
+def test_device_filters_and_loopback():
+    device = SimulatedDevice(loopback=True, max_filters=1)
+    assert replies(device, Command.SET_FILTER, (0x7F0).to_bytes(4, "big"), can_id=0x120)[0][0] == Command.ACK
+    assert replies(device, Command.SET_FILTER, bytes(4), can_id=0x200)[0][0] == Command.NACK
+
+    assert replies(device, Command.CAN_SEND, [1], can_id=0x123)[0][1].can_id == 0x123
+    assert replies(device, Command.CAN_SEND, [1], can_id=0x223) == []
+    assert device.transmitted == 2
+
+    traffic = device.traffic([CANFrame(0x125, []), CANFrame(0x300, [])])
+    assert [decode_frame(f)[1].can_id for f in FrameStreamDecoder().feed_bytes(traffic)] == [0x125]
+
+    assert replies(device, Command.CLEAR_FILTER)[0][0] == Command.ACK
+    assert device.accepts(0x300, False)
+
+
+def test_traffic_generator_mix():
+    gen = TrafficGenerator(ids={0x100: 1, 0x200: 3}, dlc_weights={0: 1, 8: 1},
+                           escape_density=0.5, seed=1)
+    frames = gen.frames(2000)
+    assert {f.can_id for f in frames} == {0x100, 0x200}
+    assert {len(f.data) for f in frames} == {0, 8}
+    data = b"".join(f.data for f in frames)
+    assert 0.4 < (data.count(0xAA) + data.count(0xAB)) / len(data) < 0.6
+
+    stamped = TrafficGenerator(timestamps=True).frames(1)[0]
+    assert 0 <= frame_latency_ns(stamped) < 1e9
+
+
+def test_quickcan_over_loopback_serial():
+    port = LoopbackSerial(SimulatedDevice(loopback=True))
+    received = []
+    done = threading.Event()
+
+    def callback(cmd, frame):
+        received.append((cmd, frame))
+        if len(received) == 101:
+            done.set()
+
+    can = QuickCAN(port)
+    can.set_receive_callback(callback)
+    can.start()
+    can.send_ping()
+    port.start_traffic(TrafficGenerator(rate=10000, seed=1), count=100)
+    assert done.wait(5.0)
+    can.close()
+    assert sum(1 for cmd, _ in received if cmd == Command.PING) == 1
+    assert sum(1 for cmd, _ in received if cmd == Command.CAN_SEND) == 100
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a pty pair")
+def test_quickcan_over_pty():
+    with PtySimulator(SimulatedDevice(config={3: b"\x33"})) as sim:
+        sim.start(TrafficGenerator(rate=5000, seed=1), count=50)
+        received = []
+        can = QuickCAN(sim.port)
+        can.set_receive_callback(lambda cmd, frame: received.append((cmd, frame)))
+        can.start()
+        can.send_config_get(3)
+        deadline = time.monotonic() + 5.0
+        while len(received) < 51 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        can.close()
+
+    config = [f for cmd, f in received if cmd == Command.CONFIG_GET]
+    assert [f.data for f in config] == [b"\x03\x33"]
+    assert sum(1 for cmd, _ in received if cmd == Command.CAN_SEND) == 50